@@ -0,0 +1,102 @@
+'''
+A cache of the analytics responses of MessageViewSet, in the shared Redis cache.
+
+Responses are keyed on their normalized query parameters and on a version number
+of their channel. Ingesting or deleting data of a channel bumps its version, so
+responses cached before are never served again, and simply expire.
+'''
+
+import functools
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from .common import parse_dates
+
+# Constants
+CACHE_PREFIX = "analytics/"
+VERSION_PREFIX = "analytics_version/"
+ANALYTICS_CACHE_TTL = 24 * 60 * 60
+DATE_PARAMS = ("start_date", "end_date")
+
+
+def get_version_key(channel_id) -> str:
+    """Return the cache key holding the version of a channel's analytics."""
+    return f"{VERSION_PREFIX}{channel_id}"
+
+
+def get_channel_version(channel_id) -> int:
+    """
+    Return the current version of a channel's analytics.
+
+    A missing version starts from the current time rather than 0, so a version
+    evicted from the cache can't come back to a value older responses were cached under.
+    """
+    key = get_version_key(channel_id)
+    cache.add(key, time.time_ns(), timeout=None)
+    return cache.get(key)
+
+
+def bump_channel_versions(channel_ids) -> None:
+    """
+    Invalidate the cached analytics of channels, after their data changed.
+
+    Args:
+        channel_ids (Iterable[int]): The ids of the Channels.
+    """
+    for channel_id in set(channel_ids):
+        key = get_version_key(channel_id)
+        cache.add(key, time.time_ns(), timeout=None)
+        cache.incr(key)
+
+
+def get_response_key(action: str, query_params) -> str | None:
+    """
+    Return the cache key of an analytics response, from its action and normalized
+    query parameters: blank parameters are dropped, the rest sorted, and dates
+    parsed so that equivalent spellings share an entry.
+
+    Returns:
+        str | None: The cache key, or None if the request names no valid channel or
+            dates, whose error response isn't worth caching.
+    """
+    params = {
+        name: value.strip() for name, value in query_params.items() if value.strip()
+    }
+    channel = params.get("channel", "")
+    if not channel.isdigit():
+        return None
+    try:
+        dates = parse_dates(params.get("start_date"), params.get("end_date"))
+    except (TypeError, ValueError):
+        return None
+    params.update(zip(DATE_PARAMS, (date.isoformat() for date in dates)))
+
+    digest = hashlib.sha256(urlencode(sorted(params.items())).encode()).hexdigest()
+    return f"{CACHE_PREFIX}{channel}/{get_channel_version(channel)}/{action}/{digest}"
+
+
+def cached_analytics(view_func):
+    """
+    Decorate an analytics action of MessageViewSet, to serve its successful
+    responses from the cache until its channel's data changes.
+    """
+
+    @functools.wraps(view_func)
+    def wrapper(self, request, *args, **kwargs):
+        key = get_response_key(view_func.__name__, request.query_params)
+        if key:
+            data = cache.get(key)
+            if data is not None:
+                return Response(data, status=status.HTTP_200_OK)
+
+        response = view_func(self, request, *args, **kwargs)
+        if key and response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, ANALYTICS_CACHE_TTL)
+        return response
+
+    return wrapper
@@ -0,0 +1,89 @@
+'''
+Maintenance of the message copy table (MessageCopy), which records the messages of
+a chat file skipped at ingest because an overlapping file had imported them first.
+
+Each message is stored once, under the file which imported it first. When that file
+is deleted, its messages held by another file of the channel are handed over to that
+file instead of being deleted, so overlapping logs don't lose each other's messages.
+'''
+
+from django.db import connection
+
+# Constants
+MESSAGE_COPY_TABLE = "api_messagecopy"
+
+
+def add_message_copies(file_id: int, fingerprints: list[int], timestamps: list) -> None:
+    """
+    Record the messages of a chat file which are stored under another file.
+
+    Args:
+        file_id (int): The id of the ChatFile.
+        fingerprints (list[int]): The fingerprints of the file's messages.
+        timestamps (list[datetime]): The timestamps of the file's messages.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {MESSAGE_COPY_TABLE} (chat_file_id, fingerprint, \"timestamp\") "
+            "SELECT %s, copy.fingerprint, copy.timestamp "
+            "FROM unnest(%s::bigint[], %s::timestamp[]) AS copy(fingerprint, timestamp) "
+            "JOIN api_message message ON message.fingerprint = copy.fingerprint "
+            "    AND message.timestamp = copy.timestamp "
+            "WHERE message.parent_log_id <> %s "
+            "ON CONFLICT DO NOTHING",
+            [file_id, fingerprints, timestamps, file_id],
+        )
+
+
+def hand_over_messages(file_ids: list[int]) -> int:
+    """
+    Move the messages of chat files about to be deleted which another file of the
+    same channel holds a copy of to that file, so they aren't deleted with them.
+    The messages stay in their channel, so rollups and sketches are unchanged.
+
+    Args:
+        file_ids (list[int]): The ids of the ChatFiles being deleted.
+
+    Returns:
+        int: The number of messages handed over.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "WITH heirs AS ("
+            "    SELECT DISTINCT ON (copy.fingerprint, copy.timestamp)"
+            "        copy.id, copy.fingerprint, copy.timestamp, copy.chat_file_id"
+            f"    FROM {MESSAGE_COPY_TABLE} copy"
+            "    JOIN api_message message ON message.fingerprint = copy.fingerprint"
+            "        AND message.timestamp = copy.timestamp"
+            "    JOIN api_chatfile file ON file.id = copy.chat_file_id"
+            "    WHERE message.parent_log_id = ANY(%s)"
+            "        AND copy.chat_file_id <> ALL(%s)"
+            "        AND file.channel_id = message.channel_id"
+            "    ORDER BY copy.fingerprint, copy.timestamp, copy.chat_file_id"
+            "), adopted AS ("
+            "    UPDATE api_message message SET parent_log_id = heirs.chat_file_id"
+            "    FROM heirs"
+            "    WHERE message.fingerprint = heirs.fingerprint"
+            "        AND message.timestamp = heirs.timestamp"
+            "    RETURNING heirs.id"
+            ") "
+            f"DELETE FROM {MESSAGE_COPY_TABLE} WHERE id IN (SELECT id FROM adopted)",
+            [list(file_ids), list(file_ids)],
+        )
+        return cursor.rowcount
+
+
+def delete_copies_between(start, end) -> None:
+    """
+    Delete the message copies within a time range, whose messages are being dropped.
+
+    Args:
+        start (date): The start of the range.
+        end (date): The end of the range (exclusive).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {MESSAGE_COPY_TABLE} "
+            "WHERE \"timestamp\" >= %s::timestamp AND \"timestamp\" < %s::timestamp",
+            [start, end],
+        )
@@ -0,0 +1,162 @@
+'''
+Streaming export of the messages of a channel and date range, as NDJSON, CSV or
+Parquet, for the export endpoint of MessageViewSet and the export_messages command.
+
+Messages are read through a server-side cursor, chunk by chunk, and each chunk is
+written out as it arrives, so memory stays constant however many are exported.
+'''
+
+import csv
+import io
+from itertools import islice
+
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.db.models.functions import Coalesce
+
+from .models import Message
+
+# Constants
+CHUNK_SIZE = 5000  # Messages fetched per round trip of the cursor
+PARQUET_ROW_GROUP_SIZE = 100_000  # Messages per Parquet row group, buffered in memory
+EXPORT_FIELDS = [
+    "id",
+    "timestamp",
+    "username",
+    "message",
+    "emote_ids",
+    "emote_counts",
+    "sentiment_score",
+]
+PARQUET_SCHEMA = pa.schema(
+    [
+        ("id", pa.int64()),
+        ("timestamp", pa.timestamp("us")),
+        ("username", pa.string()),
+        ("message", pa.string()),
+        ("emote_ids", pa.list_(pa.int32())),
+        ("emote_counts", pa.list_(pa.int16())),
+        ("sentiment_score", pa.float64()),
+    ]
+)
+
+
+def get_export_rows(channel_id: int, start_date, end_date):
+    """
+    Iterate over the messages of a channel within a date range, oldest first,
+    through a server-side cursor.
+
+    Returns:
+        Iterator[tuple]: The values of EXPORT_FIELDS of each message.
+    """
+    return (
+        Message.objects.filter(channel_id=channel_id, timestamp__range=[start_date, end_date])
+        .annotate(body=Coalesce("text__text", "message"))
+        .order_by("timestamp", "id")
+        .values_list(
+            "id", "timestamp", "chatter__name", "body", "emote_ids", "emote_counts",
+            "sentiment_score",
+        )
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def chunked(rows, size: int):
+    """Split an iterator of rows into lists of up to size rows."""
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def to_ndjson(rows):
+    """Write rows as newline-delimited JSON objects, a chunk at a time."""
+    for chunk in chunked(rows, CHUNK_SIZE):
+        yield b"".join(orjson.dumps(dict(zip(EXPORT_FIELDS, row))) + b"\n" for row in chunk)
+
+
+def to_csv(rows):
+    """
+    Write rows as CSV, with a header, a chunk at a time. Emote arrays are written as
+    JSON arrays.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for chunk in chunked(rows, CHUNK_SIZE):
+        writer.writerows(
+            (
+                pk,
+                timestamp.isoformat(),
+                username,
+                body,
+                orjson.dumps(emote_ids).decode() if emote_ids else "",
+                orjson.dumps(emote_counts).decode() if emote_counts else "",
+                sentiment_score,
+            )
+            for pk, timestamp, username, body, emote_ids, emote_counts, sentiment_score in chunk
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+class _ParquetSink:
+    # A write-only file keeping what the Parquet writer wrote since it was last drained
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def to_parquet(rows):
+    """Write rows as a Parquet file, a row group at a time."""
+    sink = _ParquetSink()
+    with pq.ParquetWriter(sink, PARQUET_SCHEMA) as writer:
+        for chunk in chunked(rows, PARQUET_ROW_GROUP_SIZE):
+            columns = [
+                pa.array(column, type=field.type)
+                for column, field in zip(zip(*chunk), PARQUET_SCHEMA)
+            ]
+            writer.write_table(pa.Table.from_arrays(columns, schema=PARQUET_SCHEMA))
+            yield sink.drain()
+    yield sink.drain()
+
+
+# Writer and media type of each export format
+EXPORT_FORMATS = {
+    "ndjson": (to_ndjson, "application/x-ndjson"),
+    "csv": (to_csv, "text/csv"),
+    "parquet": (to_parquet, "application/vnd.apache.parquet"),
+}
+
+
+def export_messages(channel_id: int, start_date, end_date, file_format: str):
+    """
+    Stream the messages of a channel within a date range, oldest first.
+
+    Args:
+        channel_id (int): The id of the Channel.
+        start_date (datetime): The start of the date range.
+        end_date (datetime): The end of the date range (inclusive).
+        file_format (str): The format, a key of EXPORT_FORMATS.
+
+    Returns:
+        Iterator[bytes]: The successive parts of the file.
+    """
+    writer, _ = EXPORT_FORMATS[file_format]
+    return writer(get_export_rows(channel_id, start_date, end_date))
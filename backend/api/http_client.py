@@ -0,0 +1,71 @@
+'''
+A shared client for outbound HTTP requests (7TV, Rustlog), with pooled
+connections and an optional TTL cache for JSON responses.
+'''
+
+import hashlib
+
+import requests
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+# Constants
+CACHE_PREFIX = "http_json/"
+POOL_SIZE = 10
+
+_SESSION: requests.Session | None = None
+
+
+def get_session() -> requests.Session:
+    """
+    Return the process-wide requests Session, creating it on first use.
+    The session is created lazily, so each forked worker gets its own pool.
+
+    Returns:
+        requests.Session: A session that keeps connections to each host alive.
+    """
+    global _SESSION  # pylint: disable=global-statement
+    if _SESSION is None:
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        _SESSION = requests.Session()
+        _SESSION.mount("http://", adapter)
+        _SESSION.mount("https://", adapter)
+    return _SESSION
+
+
+def get_cache_key(url: str) -> str:
+    """Return the cache key under which the JSON body of a URL is stored."""
+    return CACHE_PREFIX + hashlib.sha256(url.encode()).hexdigest()
+
+
+def fetch_json(url: str, ttl: int = None, timeout: int = 3):
+    """
+    Perform a GET request and return the decoded JSON body.
+
+    Args:
+        url (str): The URL to request.
+        ttl (int, optional): If provided, successful responses are cached for this
+            many seconds, and served from the cache while fresh.
+        timeout (int, optional): The request timeout in seconds. Defaults to 3.
+
+    Returns:
+        The decoded JSON body, or None if the response status was not 200.
+
+    Raises:
+        requests.RequestException: If the request could not be performed.
+        ValueError: If the response body is not valid JSON.
+    """
+    key = get_cache_key(url)
+    if ttl:
+        data = cache.get(key)
+        if data is not None:
+            return data
+
+    response = get_session().get(url, timeout=timeout)
+    if response.status_code != 200:
+        return None
+    data = response.json()
+
+    if ttl:
+        cache.set(key, data, ttl)
+    return data
@@ -0,0 +1,39 @@
+'''
+Management command to drop old chat data, one monthly partition at a time.
+'''
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...partitions import drop_month_partitions, is_partitioned, list_month_partitions
+
+
+class Command(BaseCommand):
+    '''
+    Drop every Message partition for months before a cutoff.
+    '''
+    help = "Drop the monthly message partitions of every month before --before (YYYY-MM)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", required=True, help="First month to keep, as YYYY-MM")
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only list the partitions to drop"
+        )
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError("Message partitions are only available on PostgreSQL.")
+        try:
+            cutoff = datetime.strptime(options["before"], "%Y-%m").date()
+        except ValueError as exc:
+            raise CommandError("Invalid month format. Use YYYY-MM.") from exc
+
+        for month in list_month_partitions():
+            if month >= cutoff:
+                continue
+            if options["dry_run"]:
+                self.stdout.write(f"Would drop {month:%Y-%m}")
+            else:
+                drop_month_partitions(month)
+                self.stdout.write(f"Dropped {month:%Y-%m}")
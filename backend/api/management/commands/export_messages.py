@@ -0,0 +1,59 @@
+'''
+Management command to export the messages of a channel to a file, streamed.
+'''
+
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...common import parse_dates
+from ...export import EXPORT_FORMATS, export_messages
+from ...models import Channel
+
+
+class Command(BaseCommand):
+    '''
+    Export the messages of a channel within a date range as NDJSON, CSV or Parquet.
+    '''
+    help = (
+        "Export the messages of a channel, oldest first, as NDJSON, CSV or Parquet, "
+        "to a file or standard output."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("channel", help="Name of the channel")
+        parser.add_argument("--start-date", help="First day to export, as YYYY-MM-DD")
+        parser.add_argument("--end-date", help="Last day to export, as YYYY-MM-DD")
+        parser.add_argument(
+            "--format", choices=list(EXPORT_FORMATS), default="ndjson", help="File format"
+        )
+        parser.add_argument(
+            "--output", default="-", help="File to write, or - for standard output"
+        )
+
+    def handle(self, *args, **options):
+        channel = Channel.objects.filter(name_lower=options["channel"].lower()).first()
+        if channel is None:
+            raise CommandError(f"Channel {options['channel']!r} not found.")
+        try:
+            start_date, end_date = parse_dates(options["start_date"], options["end_date"])
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+
+        parts = export_messages(channel.id, start_date, end_date, options["format"])
+        if options["output"] == "-":
+            for part in parts:
+                sys.stdout.buffer.write(part)
+            return
+
+        started = time.perf_counter()
+        size = 0
+        with open(options["output"], "wb") as output:
+            for part in parts:
+                output.write(part)
+                size += len(part)
+        self.stdout.write(
+            f"Exported {channel.name} to {options['output']}: "
+            f"{size / 1e6:.1f} MB in {time.perf_counter() - started:.1f}s"
+        )
@@ -0,0 +1,189 @@
+'''
+Management command to ingest an archive of chat logs from disk, in parallel.
+'''
+
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connections, transaction
+from tqdm import tqdm
+
+from ...models import Channel, ChatFile, get_default_channel
+from ...scripts import delete_chat_files, detect_log_format, preprocess_log
+from ...upload_handlers import get_sha256
+
+
+def find_log_files(pattern: str) -> list[tuple[str, str]]:
+    """
+    List the files under a directory, or matching a glob pattern.
+
+    Args:
+        pattern (str): A directory, walked recursively, or a glob pattern.
+
+    Returns:
+        list[tuple[str, str]]: Each file path, along with the directory relative
+            to which its channel is read (see get_channel_name).
+    """
+    if os.path.isdir(pattern):
+        return [
+            (os.path.join(directory, name), pattern)
+            for directory, _, names in os.walk(pattern)
+            for name in sorted(names)
+        ]
+    root = os.path.dirname(pattern.split("*")[0]) or "."
+    return [
+        (path, root)
+        for path in sorted(glob.glob(pattern, recursive=True))
+        if os.path.isfile(path)
+    ]
+
+
+def get_channel_name(path: str, root: str) -> str | None:
+    """
+    Return the channel of a log file from its path: the first directory below the
+    root, as in both Chatterino's (<channel>/<channel>-<date>.log) and Rustlog's
+    (<channel>/<year>/<month>/<day>.log) layouts.
+
+    Returns:
+        str | None: The channel name, or None for files directly in the root.
+    """
+    parts = os.path.relpath(path, root).split(os.sep)
+    return parts[0] if len(parts) > 1 else None
+
+
+def ingest_log_file(path: str, format_str: str, channel_id: int, options: dict) -> tuple:
+    """
+    Store a log file as a ChatFile and preprocess it, in a worker process.
+
+    Returns:
+        tuple: The path, the number of messages read (None if the file was already
+            stored), and the file size in bytes.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as log_file:
+        upload = File(log_file, name=os.path.basename(path))
+        sha256 = get_sha256(upload)
+        if ChatFile.objects.filter(sha256=sha256).exists():
+            return path, None, size
+        chat_file = ChatFile(file=upload, channel_id=channel_id, sha256=sha256)
+        try:
+            with transaction.atomic():
+                chat_file.save()
+        except IntegrityError:
+            # Another worker stored an identical file first. The copy saved to
+            # storage is removed by collect_orphaned_media.
+            return path, None, size
+
+    try:
+        count = preprocess_log(
+            chat_file.id,
+            chat_file.file.path,
+            format_str,
+            options["sentiment"],
+            bool(options["emote_set"]),
+            options["emote_set"],
+            options["filter_emotes"],
+            options["min_words"],
+        )
+    except BaseException:
+        # Remove the file and any messages stored so far, so the next run retries
+        # it instead of taking it for already stored
+        delete_chat_files([chat_file.id])
+        raise
+    chat_file.is_preprocessed = True
+    chat_file.save()
+    return path, count, size
+
+
+class Command(BaseCommand):
+    '''
+    Ingest every chat log under directories or matching glob patterns, using the
+    same parsing and insertion as the preprocess task, across worker processes.
+    '''
+    help = (
+        "Store and preprocess every Chatterino or Rustlog log under the given "
+        "directories or glob patterns, in parallel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Directories or glob patterns")
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count(), help="Number of worker processes"
+        )
+        parser.add_argument(
+            "--channel",
+            help="Channel of every file, instead of the first directory of its path",
+        )
+        parser.add_argument(
+            "--format",
+            choices=["Chatterino", "Rustlog"],
+            help="Format of every file, instead of detecting it from its first lines",
+        )
+        parser.add_argument("--sentiment", action="store_true", help="Score sentiment")
+        parser.add_argument("--emote-set", default="", help="Emote set to count emotes of")
+        parser.add_argument(
+            "--filter-emotes", action="store_true", help="Ignore emotes for sentiment"
+        )
+        parser.add_argument(
+            "--min-words", type=int, default=0, help="Minimum words to score sentiment"
+        )
+
+    def handle(self, *args, **options):
+        files = [found for pattern in options["paths"] for found in find_log_files(pattern)]
+        if not files:
+            raise CommandError("No files found.")
+
+        # Resolve formats and channels up front, so workers never race to create one
+        jobs = []
+        channel_ids = {}
+        skipped = 0
+        for path, root in files:
+            format_str = options["format"] or detect_log_format(path)
+            if format_str is None:
+                skipped += 1
+                continue
+            name = options["channel"] or get_channel_name(path, root)
+            if name not in channel_ids:
+                if name:
+                    channel = Channel.objects.filter(name_lower=name.lower()).first()
+                    channel = channel or Channel.objects.create(name=name)
+                else:
+                    channel = get_default_channel()
+                channel_ids[name] = channel.id
+            jobs.append((path, format_str, channel_ids[name]))
+
+        # Forked workers must open their own database connections
+        connections.close_all()
+
+        started = time.perf_counter()
+        messages = total_bytes = duplicates = 0
+        failures = []
+        with ProcessPoolExecutor(max_workers=options["workers"]) as executor:
+            futures = {
+                executor.submit(ingest_log_file, *job, options): job[0] for job in jobs
+            }
+            for future in tqdm(as_completed(futures), total=len(futures), unit="file"):
+                try:
+                    _, count, size = future.result()
+                except Exception as e:
+                    failures.append((futures[future], e))
+                    continue
+                total_bytes += size
+                if count is None:
+                    duplicates += 1
+                else:
+                    messages += count
+        elapsed = time.perf_counter() - started
+
+        for path, error in failures:
+            self.stderr.write(f"Failed to ingest {path}: {error}")
+        self.stdout.write(
+            f"Ingested {len(jobs) - len(failures) - duplicates} files "
+            f"({duplicates} already stored, {skipped} unrecognized, {len(failures)} failed): "
+            f"{messages} messages, {total_bytes / 1e6:.1f} MB in {elapsed:.1f}s "
+            f"({messages / elapsed:.0f} messages/s, {total_bytes / 1e6 / elapsed:.1f} MB/s)"
+        )
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:54
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_emotes(apps, schema_editor):
+    '''
+    Collapse Emote rows sharing an emote_id onto the lowest id, repointing
+    every reference to it, so that emote_id can be made unique.
+    '''
+    Emote = apps.get_model("api", "Emote")
+    EmoteSet = apps.get_model("api", "EmoteSet")
+    Message = apps.get_model("api", "Message")
+    MessageEmote = apps.get_model("api", "MessageEmote")
+    set_links = EmoteSet.emotes.through
+    message_links = Message.emotes.through
+
+    duplicates = (
+        Emote.objects.values("emote_id")
+        .annotate(keep=Min("id"), total=Count("id"))
+        .filter(total__gt=1)
+    )
+    for group in duplicates:
+        keep = group["keep"]
+        stale = list(
+            Emote.objects.filter(emote_id=group["emote_id"])
+            .exclude(id=keep)
+            .values_list("id", flat=True)
+        )
+
+        for links, owner in ((set_links, "emoteset_id"), (message_links, "message_id")):
+            owners = links.objects.filter(emote_id=keep).values_list(owner, flat=True)
+            links.objects.filter(emote_id__in=stale, **{f"{owner}__in": owners}).delete()
+            links.objects.filter(emote_id__in=stale).update(emote_id=keep)
+
+        # Fold counts of clashing (message, emote) pairs into the kept row
+        for row in MessageEmote.objects.filter(emote_id__in=stale).order_by("id"):
+            kept, created = MessageEmote.objects.get_or_create(
+                message_id=row.message_id, emote_id=keep, defaults={"count": row.count}
+            )
+            if not created:
+                kept.count += row.count
+                kept.save(update_fields=["count"])
+            row.delete()
+
+        Emote.objects.filter(id__in=stale).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_channel_name_lower_task_task_id_task_task_type_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_emotes, migrations.RunPython.noop),
+    ]
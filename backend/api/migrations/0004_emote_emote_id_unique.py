@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_merge_duplicate_emotes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emote',
+            name='emote_id',
+            field=models.TextField(unique=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_emote_emote_id_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emoteset',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:41
+
+import api.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_emoteset_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='channel',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=models.SET(api.models.get_default_channel), to='api.channel'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+from django.db.models import Max, Min, OuterRef, Subquery
+
+# Rows updated per statement. Each batch commits on its own, so row locks
+# are short-lived and the table stays writable while the backfill runs.
+BATCH_SIZE = 50000
+
+
+def backfill_message_channel(apps, schema_editor):
+    '''
+    Copy each message's parent_log channel onto Message.channel, walking the
+    table in primary key ranges.
+    '''
+    ChatFile = apps.get_model("api", "ChatFile")
+    Message = apps.get_model("api", "Message")
+
+    bounds = Message.objects.filter(channel__isnull=True).aggregate(
+        low=Min("id"), high=Max("id")
+    )
+    if bounds["low"] is None:
+        return
+
+    parent_channel = Subquery(
+        ChatFile.objects.filter(id=OuterRef("parent_log_id")).values("channel_id")[:1]
+    )
+    for start in range(bounds["low"], bounds["high"] + 1, BATCH_SIZE):
+        Message.objects.filter(
+            id__gte=start, id__lt=start + BATCH_SIZE, channel__isnull=True
+        ).update(channel_id=parent_channel)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0006_message_channel'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_message_channel, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:41
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built concurrently, so ingestion isn't blocked on large tables
+    atomic = False
+
+    dependencies = [
+        ('api', '0007_backfill_message_channel'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='message',
+            index=models.Index(fields=['channel', 'timestamp'], name='message_channel_time_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='message',
+            index=models.Index(fields=['channel', 'username'], name='message_channel_user_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='message',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['timestamp'], name='message_time_brin'),
+        ),
+    ]
@@ -0,0 +1,148 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:30
+
+from django.db import migrations, models
+
+
+def partition_tables(apps, schema_editor):
+    '''
+    Rebuild api_message and api_messageemote as tables partitioned by month on
+    their timestamp, copying existing rows into one partition per month.
+    MessageEmote gains the timestamp of its message, as its partition key.
+
+    Both tables are copied whole in this migration's transaction, which holds an
+    exclusive lock on them until it commits. Messages can't be read or written
+    meanwhile, so stop the web and worker services while it runs: the downtime
+    grows with the number of stored messages.
+    '''
+    with schema_editor.connection.cursor() as cursor:
+        # Identity columns aren't supported on partitioned tables, so both tables
+        # move to plain sequences continuing from the current maximum id.
+        for table in ("api_message", "api_messageemote"):
+            cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned")
+            cursor.execute(
+                f"ALTER TABLE {table}_unpartitioned ALTER COLUMN id DROP IDENTITY IF EXISTS"
+            )
+
+        cursor.execute(
+            'CREATE TABLE api_message (LIKE api_message_unpartitioned) '
+            'PARTITION BY RANGE ("timestamp")'
+        )
+        # The emote timestamps are copied from their messages, so they take the
+        # column type of Message.timestamp rather than a type of their own
+        cursor.execute(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = 'api_message_unpartitioned'::regclass "
+            "    AND attname = 'timestamp'"
+        )
+        timestamp_type = cursor.fetchone()[0]
+        cursor.execute(
+            'CREATE TABLE api_messageemote ('
+            '    id bigint NOT NULL,'
+            '    count integer NOT NULL,'
+            '    emote_id bigint NOT NULL,'
+            '    message_id bigint NOT NULL,'
+            f'    "timestamp" {timestamp_type} NOT NULL'
+            ') PARTITION BY RANGE ("timestamp")'
+        )
+
+        for table in ("api_message", "api_messageemote"):
+            cursor.execute(f"CREATE SEQUENCE {table}_id_seq OWNED BY {table}.id")
+            cursor.execute(
+                f"SELECT setval('{table}_id_seq', "
+                f"COALESCE((SELECT MAX(id) FROM {table}_unpartitioned), 0) + 1, false)"
+            )
+            cursor.execute(
+                f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{table}_id_seq')"
+            )
+            cursor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, "timestamp")')
+            cursor.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+        # One partition per month of existing data
+        cursor.execute(
+            "SELECT DISTINCT date_trunc('month', \"timestamp\")::date "
+            "FROM api_message_unpartitioned"
+        )
+        for (month,) in cursor.fetchall():
+            following = f"{month.year + month.month // 12}-{month.month % 12 + 1:02d}-01"
+            for table in ("api_message", "api_messageemote"):
+                cursor.execute(
+                    f"CREATE TABLE {table}_y{month.year:04d}m{month.month:02d} "
+                    f"PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+                    [month.isoformat(), following],
+                )
+
+        cursor.execute("INSERT INTO api_message SELECT * FROM api_message_unpartitioned")
+        cursor.execute(
+            'INSERT INTO api_messageemote (id, count, emote_id, message_id, "timestamp") '
+            'SELECT me.id, me.count, me.emote_id, me.message_id, m."timestamp" '
+            "FROM api_messageemote_unpartitioned me "
+            "JOIN api_message m ON m.id = me.message_id"
+        )
+
+        # Foreign keys from other tables onto the old message table go with it
+        cursor.execute("DROP TABLE api_messageemote_unpartitioned")
+        cursor.execute("DROP TABLE api_message_unpartitioned CASCADE")
+
+        # Indexes and constraints are declared on the parents, and cascade to partitions
+        for statement in (
+            "CREATE INDEX api_message_parent_log_id_67e450fc ON api_message (parent_log_id)",
+            'CREATE INDEX message_channel_time_idx ON api_message (channel_id, "timestamp")',
+            "CREATE INDEX message_channel_user_idx ON api_message (channel_id, username)",
+            'CREATE INDEX message_time_brin ON api_message USING brin ("timestamp") '
+            "WITH (autosummarize = on)",
+            "ALTER TABLE api_message ADD CONSTRAINT api_message_parent_log_id_fk_api_chatfile_id "
+            "FOREIGN KEY (parent_log_id) REFERENCES api_chatfile (id) "
+            "DEFERRABLE INITIALLY DEFERRED",
+            "ALTER TABLE api_message ADD CONSTRAINT api_message_channel_id_fk_api_channel_id "
+            "FOREIGN KEY (channel_id) REFERENCES api_channel (id) "
+            "DEFERRABLE INITIALLY DEFERRED",
+            "CREATE INDEX api_messageemote_emote_id_4ff3e7a7 ON api_messageemote (emote_id)",
+            "CREATE INDEX api_messageemote_message_id_e9ab207a ON api_messageemote (message_id)",
+            "ALTER TABLE api_messageemote ADD CONSTRAINT api_messageemote_message_emote_ts_uniq "
+            'UNIQUE (message_id, emote_id, "timestamp")',
+            "ALTER TABLE api_messageemote ADD CONSTRAINT api_messageemote_emote_id_fk_api_emote_id "
+            "FOREIGN KEY (emote_id) REFERENCES api_emote (id) "
+            "DEFERRABLE INITIALLY DEFERRED",
+        ):
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_message_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(partition_tables),
+            ],
+            state_operations=[
+                migrations.AlterUniqueTogether(
+                    name='messageemote',
+                    unique_together=set(),
+                ),
+                migrations.AddField(
+                    model_name='messageemote',
+                    name='timestamp',
+                    field=models.DateTimeField(default=None),
+                    preserve_default=False,
+                ),
+                migrations.AlterField(
+                    model_name='message',
+                    name='emotes',
+                    field=models.ManyToManyField(blank=True, db_constraint=False, related_name='emotes_associated', to='api.emote'),
+                ),
+                migrations.AlterField(
+                    model_name='messageemote',
+                    name='message',
+                    field=models.ForeignKey(db_constraint=False, on_delete=models.deletion.CASCADE, to='api.message'),
+                ),
+                migrations.AlterUniqueTogether(
+                    name='messageemote',
+                    unique_together={('message', 'emote', 'timestamp')},
+                ),
+            ],
+        ),
+    ]
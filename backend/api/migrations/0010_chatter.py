@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_partition_message_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Chatter',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='chatter',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='api.chatter'),
+        ),
+    ]
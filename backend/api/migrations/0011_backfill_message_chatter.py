@@ -0,0 +1,49 @@
+from django.db import migrations
+from django.db.models import Max, Min, OuterRef, Subquery
+
+# Rows updated per statement. Each batch commits on its own, so row locks
+# are short-lived and the table stays writable while the backfill runs.
+BATCH_SIZE = 50000
+
+
+def backfill_message_chatter(apps, schema_editor):
+    '''
+    Create a Chatter for every distinct username, then point each message at
+    its chatter, walking the table in primary key ranges.
+    '''
+    Chatter = apps.get_model("api", "Chatter")
+    Message = apps.get_model("api", "Message")
+
+    usernames = Message.objects.values_list("username", flat=True).distinct()
+    batch = []
+    for username in usernames.iterator(chunk_size=BATCH_SIZE):
+        batch.append(Chatter(name=username))
+        if len(batch) == BATCH_SIZE:
+            Chatter.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    Chatter.objects.bulk_create(batch, ignore_conflicts=True)
+
+    bounds = Message.objects.filter(chatter__isnull=True).aggregate(
+        low=Min("id"), high=Max("id")
+    )
+    if bounds["low"] is None:
+        return
+
+    chatter = Subquery(Chatter.objects.filter(name=OuterRef("username")).values("id")[:1])
+    for start in range(bounds["low"], bounds["high"] + 1, BATCH_SIZE):
+        Message.objects.filter(
+            id__gte=start, id__lt=start + BATCH_SIZE, chatter__isnull=True
+        ).update(chatter_id=chatter)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0010_chatter'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_message_chatter, migrations.RunPython.noop),
+    ]
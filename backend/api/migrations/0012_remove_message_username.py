@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_backfill_message_chatter'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='message',
+            name='message_channel_user_idx',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='username',
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['channel', 'chatter'], name='message_channel_chatter_idx'),
+        ),
+    ]
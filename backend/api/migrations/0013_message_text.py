@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_remove_message_username'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.BinaryField(max_length=16, unique=True)),
+                ('text', models.TextField(blank=True)),
+                ('word_count', models.IntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='text',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='api.messagetext'),
+        ),
+    ]
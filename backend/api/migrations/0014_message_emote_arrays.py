@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:05
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_message_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='emote_counts',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.SmallIntegerField(), blank=True, null=True, size=None),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='emote_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, null=True, size=None),
+        ),
+    ]
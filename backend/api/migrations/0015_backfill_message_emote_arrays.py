@@ -0,0 +1,47 @@
+from django.db import migrations
+
+# Messages updated per statement. Each batch commits on its own, so row locks
+# are short-lived and the table stays writable while the backfill runs.
+BATCH_SIZE = 50000
+
+
+def backfill_message_emote_arrays(apps, schema_editor):
+    '''
+    Fold the MessageEmote rows of each message into its emote_ids and
+    emote_counts arrays, walking the message table in primary key ranges.
+    '''
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT MIN(message_id), MAX(message_id) FROM api_messageemote")
+        low, high = cursor.fetchone()
+        if low is None:
+            return
+
+        for start in range(low, high + 1, BATCH_SIZE):
+            cursor.execute(
+                'UPDATE api_message message '
+                'SET emote_ids = used.emote_ids, emote_counts = used.emote_counts '
+                'FROM ('
+                '    SELECT message_id, "timestamp",'
+                '        array_agg(emote_id ORDER BY emote_id) AS emote_ids,'
+                '        array_agg(count ORDER BY emote_id) AS emote_counts'
+                '    FROM api_messageemote'
+                '    WHERE message_id >= %s AND message_id < %s'
+                '    GROUP BY message_id, "timestamp"'
+                ') used '
+                'WHERE message.id = used.message_id '
+                'AND message."timestamp" = used."timestamp"',
+                [start, start + BATCH_SIZE],
+            )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0014_message_emote_arrays'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_message_emote_arrays, migrations.RunPython.noop),
+    ]
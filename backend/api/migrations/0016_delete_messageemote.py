@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_backfill_message_emote_arrays'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='message',
+            name='emotes',
+        ),
+        migrations.DeleteModel(
+            name='MessageEmote',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_delete_messageemote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatfile',
+            name='sha256',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
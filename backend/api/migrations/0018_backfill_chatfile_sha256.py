@@ -0,0 +1,39 @@
+import hashlib
+
+from django.db import migrations
+
+
+def backfill_chatfile_sha256(apps, schema_editor):
+    '''
+    Hash the stored file of every ChatFile. Of several ChatFiles with the same
+    contents only the oldest gets the hash, as it must be unique; files missing
+    from storage are left without one.
+    '''
+    ChatFile = apps.get_model("api", "ChatFile")
+
+    seen = set()
+    for chat_file in ChatFile.objects.filter(sha256__isnull=True).order_by("id"):
+        hasher = hashlib.sha256()
+        try:
+            with chat_file.file.open("rb") as file:
+                for chunk in file.chunks():
+                    hasher.update(chunk)
+        except (FileNotFoundError, ValueError):
+            continue
+
+        digest = hasher.hexdigest()
+        if digest in seen or ChatFile.objects.filter(sha256=digest).exists():
+            continue
+        seen.add(digest)
+        ChatFile.objects.filter(id=chat_file.id).update(sha256=digest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_chatfile_sha256'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_chatfile_sha256, migrations.RunPython.noop),
+    ]
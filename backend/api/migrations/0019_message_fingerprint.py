@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_backfill_chatfile_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='fingerprint',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
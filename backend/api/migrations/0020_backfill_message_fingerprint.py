@@ -0,0 +1,69 @@
+from django.db import migrations
+
+# Days of messages updated per statement. Batches are split on timestamps, as
+# messages sharing a fingerprint always share their timestamp too.
+BATCH_DAYS = 7
+
+
+def backfill_message_fingerprint(apps, schema_editor):
+    '''
+    Fingerprint the stored messages, as get_message_fingerprint does at ingest.
+    Where several messages share a fingerprint (the same message imported from
+    overlapping logs), only the first one stored gets it.
+    '''
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT MIN("timestamp"), MAX("timestamp") FROM api_message')
+        low, high = cursor.fetchone()
+        if low is None:
+            return
+
+        cursor.execute(
+            "SELECT generate_series(date_trunc('day', %s::timestamptz), %s, "
+            "make_interval(days => %s))",
+            [low, high, BATCH_DAYS],
+        )
+        for (start,) in cursor.fetchall():
+            cursor.execute(
+                'UPDATE api_message message SET fingerprint = fingerprinted.fingerprint '
+                'FROM ('
+                '    SELECT id, "timestamp", fingerprint,'
+                '        row_number() OVER (PARTITION BY fingerprint ORDER BY id) AS copy'
+                '    FROM ('
+                '        SELECT message.id, message."timestamp",'
+                "            ('x' || left(md5(concat_ws('|',"
+                '                message.channel_id,'
+                "                to_char(message.\"timestamp\", 'YYYY-MM-DD HH24:MI:SS'),"
+                '                chatter.name,'
+                '                COALESCE(text.text, message.message),'
+                '                row_number() OVER ('
+                '                    PARTITION BY message.parent_log_id, message.channel_id,'
+                '                        message."timestamp", message.chatter_id,'
+                '                        COALESCE(text.text, message.message)'
+                '                    ORDER BY message.id'
+                '                ) - 1'
+                '            )), 16))::bit(64)::bigint AS fingerprint'
+                '        FROM api_message message'
+                '        JOIN api_chatter chatter ON chatter.id = message.chatter_id'
+                '        LEFT JOIN api_messagetext text ON text.id = message.text_id'
+                '        WHERE message."timestamp" >= %s'
+                "            AND message.\"timestamp\" < %s + make_interval(days => %s)"
+                '    ) hashed'
+                ') fingerprinted '
+                'WHERE message.id = fingerprinted.id '
+                'AND message."timestamp" = fingerprinted."timestamp" '
+                'AND fingerprinted.copy = 1',
+                [start, start, BATCH_DAYS],
+            )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0019_message_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_message_fingerprint, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_backfill_message_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(fields=('fingerprint', 'timestamp'), name='message_fingerprint_uniq'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageHourRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('message_count', models.IntegerField(default=0)),
+                ('sentiment_sum', models.FloatField(default=0)),
+                ('sentiment_count', models.IntegerField(default=0)),
+                ('channel', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.channel')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('channel', 'bucket'), name='message_hour_rollup_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MessageMinuteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('message_count', models.IntegerField(default=0)),
+                ('sentiment_sum', models.FloatField(default=0)),
+                ('sentiment_count', models.IntegerField(default=0)),
+                ('channel', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.channel')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('channel', 'bucket'), name='message_minute_rollup_uniq')],
+            },
+        ),
+    ]
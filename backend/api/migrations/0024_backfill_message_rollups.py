@@ -0,0 +1,49 @@
+from django.db import migrations
+
+
+def backfill_message_rollups(apps, schema_editor):
+    '''
+    Aggregate the stored messages into minute rollups one month at a time, then
+    the minute rollups into hour rollups. Buckets that already exist are kept, so
+    an interrupted backfill can be re-run.
+    '''
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT DISTINCT date_trunc('month', \"timestamp\") FROM api_message ORDER BY 1"
+        )
+        for (month,) in cursor.fetchall():
+            cursor.execute(
+                "INSERT INTO api_messageminuterollup "
+                "(channel_id, bucket, message_count, sentiment_sum, sentiment_count) "
+                "SELECT channel_id, date_trunc('minute', \"timestamp\"), COUNT(*), "
+                "    COALESCE(SUM(sentiment_score), 0), COUNT(sentiment_score) "
+                "FROM api_message "
+                "WHERE channel_id IS NOT NULL "
+                "    AND \"timestamp\" >= %s AND \"timestamp\" < %s + interval '1 month' "
+                "GROUP BY 1, 2 "
+                "ON CONFLICT (channel_id, bucket) DO NOTHING",
+                [month, month],
+            )
+
+        cursor.execute(
+            "INSERT INTO api_messagehourrollup "
+            "(channel_id, bucket, message_count, sentiment_sum, sentiment_count) "
+            "SELECT channel_id, date_trunc('hour', bucket), SUM(message_count), "
+            "    SUM(sentiment_sum), SUM(sentiment_count) "
+            "FROM api_messageminuterollup "
+            "GROUP BY 1, 2 "
+            "ON CONFLICT (channel_id, bucket) DO NOTHING"
+        )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0023_message_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_message_rollups, migrations.RunPython.noop),
+    ]
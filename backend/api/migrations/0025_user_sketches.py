@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_backfill_message_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('registers', models.BinaryField()),
+                ('channel', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.channel')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('channel', 'bucket'), name='user_sketch_uniq')],
+            },
+        ),
+    ]
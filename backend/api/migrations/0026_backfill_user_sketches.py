@@ -0,0 +1,42 @@
+from django.db import migrations
+
+from api.sketches import add_to_user_sketches
+
+
+def backfill_user_sketches(apps, schema_editor):
+    '''
+    Sketch the chatters of the stored messages one month at a time. Adding chatters
+    to an existing sketch changes nothing, so an interrupted backfill can be re-run.
+    '''
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT DISTINCT date_trunc('month', \"timestamp\") FROM api_message ORDER BY 1"
+        )
+        for (month,) in cursor.fetchall():
+            cursor.execute(
+                "SELECT channel_id, date_trunc('hour', \"timestamp\"), "
+                "    array_agg(DISTINCT chatter_id) "
+                "FROM api_message "
+                "WHERE channel_id IS NOT NULL AND chatter_id IS NOT NULL "
+                "    AND \"timestamp\" >= %s AND \"timestamp\" < %s + interval '1 month' "
+                "GROUP BY 1, 2",
+                [month, month],
+            )
+            ids_by_channel = {}
+            for channel_id, hour, ids in cursor.fetchall():
+                ids_by_channel.setdefault(channel_id, {})[hour] = ids
+            for channel_id, ids_by_hour in ids_by_channel.items():
+                add_to_user_sketches(channel_id, ids_by_hour)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0025_user_sketches'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_user_sketches, migrations.RunPython.noop),
+    ]
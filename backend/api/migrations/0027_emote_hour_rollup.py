@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_backfill_user_sketches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmoteHourRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('channel', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.channel')),
+                ('emote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.emote')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('channel', 'bucket', 'emote'), name='emote_hour_rollup_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+def backfill_emote_hour_rollups(apps, schema_editor):
+    '''
+    Aggregate the emote uses of the stored messages into hour rollups one month at
+    a time. Buckets that already exist are kept, so an interrupted backfill can be
+    re-run.
+    '''
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT DISTINCT date_trunc('month', \"timestamp\") FROM api_message ORDER BY 1"
+        )
+        for (month,) in cursor.fetchall():
+            cursor.execute(
+                "INSERT INTO api_emotehourrollup (channel_id, bucket, emote_id, count) "
+                "SELECT channel_id, date_trunc('hour', \"timestamp\"), used.emote_pk, "
+                "    SUM(used.count) "
+                "FROM api_message "
+                "CROSS JOIN LATERAL unnest(emote_ids, emote_counts) AS used(emote_pk, count) "
+                "WHERE channel_id IS NOT NULL "
+                "    AND \"timestamp\" >= %s AND \"timestamp\" < %s + interval '1 month' "
+                "    AND used.emote_pk IN (SELECT id FROM api_emote) "
+                "GROUP BY 1, 2, 3 "
+                "ON CONFLICT (channel_id, bucket, emote_id) DO NOTHING",
+                [month, month],
+            )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0027_emote_hour_rollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_emote_hour_rollups, migrations.RunPython.noop),
+    ]
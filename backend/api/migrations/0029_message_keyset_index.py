@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_backfill_emote_hour_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['channel', 'timestamp', 'id'], name='message_channel_time_id_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='message_channel_time_idx',
+        ),
+    ]
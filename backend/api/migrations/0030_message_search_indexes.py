@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:43
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_message_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('message', config='simple'), name='message_search_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('text__isnull', False)), fields=['text'], name='message_text_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='messagetext',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('text', config='simple'), name='message_text_search_gin'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0030_message_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageCopy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.BigIntegerField()),
+                ('timestamp', models.DateTimeField()),
+                ('chat_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.chatfile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fingerprint', 'timestamp', 'chat_file'), name='message_copy_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0031_message_copy'),
+    ]
+
+    operations = [
+        # The through model takes over the existing link table as it is
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='EmoteSetEmote',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('emote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.emote')),
+                        ('emoteset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.emoteset')),
+                    ],
+                    options={
+                        'db_table': 'api_emoteset_emotes',
+                        'unique_together': {('emoteset', 'emote')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='emoteset',
+                    name='emotes',
+                    field=models.ManyToManyField(related_name='emote_sets_containing', through='api.EmoteSetEmote', to='api.emote'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='emotesetemote',
+            name='name',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
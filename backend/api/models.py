@@ -5,9 +5,17 @@ Module to define the Model objects. These objects will likewise define our datab
 import os
 import uuid
 
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
 from django.forms import ValidationError
 
+# Constants
+# Text search configuration of messages: no stemming or stop words, as chat mixes
+# languages, slang and emote names
+SEARCH_CONFIG = "simple"
+
 # Create your models here.
 
 
@@ -48,12 +56,13 @@ class Emote(models.Model):
     Model for a 7TV Emote
 
     Attributes:
-        name: The name of the emote
-        emote_id: The ID of the emote on 7TV
+        name: The name of the emote on 7TV. Emote sets may use it under another name
+            (see EmoteSetEmote)
+        emote_id: The ID of the emote on 7TV (unique, shared across emote sets)
     """
 
     name = models.TextField(blank=False)
-    emote_id = models.TextField(blank=False)
+    emote_id = models.TextField(blank=False, unique=True)
 
 
 class EmoteSet(models.Model):
@@ -65,12 +74,70 @@ class EmoteSet(models.Model):
         set_id: The ID of the emote set on 7TV
         chanels: The channels that the emote set is associated with
         emotes: The emotes that the emote set contains
+        updated_at: The last time the set or its emotes changed
     """
 
     name = models.TextField(blank=False)
     set_id = models.TextField(blank=False, unique=True)
     channels = models.ManyToManyField(Channel, related_name="emote_sets_associated")
-    emotes = models.ManyToManyField(Emote, related_name="emote_sets_containing")
+    emotes = models.ManyToManyField(
+        Emote, through="EmoteSetEmote", related_name="emote_sets_containing"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class EmoteSetEmote(models.Model):
+    """
+    Model for an Emote in an EmoteSet, under the name the set uses for it.
+
+    Attributes:
+        emoteset: The emote set
+        emote: The emote
+        name: The name of the emote in the set, if the set renamed it. Blank when
+            the set uses the emote's own name
+    """
+
+    emoteset = models.ForeignKey(EmoteSet, on_delete=models.CASCADE)
+    emote = models.ForeignKey(Emote, on_delete=models.CASCADE)
+    name = models.TextField(blank=True, default="")
+
+    class Meta:
+        db_table = "api_emoteset_emotes"
+        unique_together = [("emoteset", "emote")]
+
+
+class Chatter(models.Model):
+    """
+    Model for a chat user, so messages can reference users by integer id.
+
+    Attributes:
+        name: The username of the chatter
+    """
+
+    # A 4-byte key, as it is repeated on every message row
+    id = models.AutoField(primary_key=True)
+    name = models.CharField(max_length=255, blank=False, null=False, unique=True)
+
+
+class MessageText(models.Model):
+    """
+    Model for a distinct message body, shared by every message with that exact text.
+    Only used when the DEDUPLICATE_MESSAGE_TEXT setting is enabled.
+
+    Attributes:
+        digest: A 16-byte BLAKE2b hash of the text, used as the lookup key
+        text: The message text
+        word_count: The number of words in the text
+    """
+
+    digest = models.BinaryField(max_length=16, unique=True)
+    text = models.TextField(blank=True)
+    word_count = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            GinIndex(SearchVector("text", config=SEARCH_CONFIG), name="message_text_search_gin"),
+        ]
 
 
 class ChatFile(models.Model):
@@ -84,6 +151,7 @@ class ChatFile(models.Model):
         is_preprocessed: Whether the file has been preprocessed
         uploaded_at: The date and time the file was uploaded
         metadata: The metadata of the file
+        sha256: The SHA-256 hex digest of the file's contents, to detect re-uploads
     '''
     file: models.FileField = models.FileField(upload_to="media/chat", unique=True)
     filename = models.CharField(max_length=255, blank=True, null=False)
@@ -93,6 +161,7 @@ class ChatFile(models.Model):
     is_preprocessed = models.BooleanField(default=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     metadata = models.JSONField(null=True, blank=True)
+    sha256 = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
 
     def save(self, *args, **kwargs):
         # Update the filename field if the file is present and filename is not manually set
@@ -107,44 +176,234 @@ class ChatFile(models.Model):
         super().delete(*args, **kwargs)
 
 
+class ChunkedUpload(models.Model):
+    '''
+    Model for a resumable upload of a chat file, sent in chunks appended at an offset.
+    The ChatFile is only created once every byte has arrived and the checksum matches.
+
+    Attributes:
+        upload_id: The ID used by the client to address the upload
+        filename: The name of the file being uploaded
+        size: The total size of the file in bytes
+        offset: The number of bytes received so far
+        sha256: The SHA-256 hex digest the completed file must match
+        channel: The channel to assign the ChatFile to
+        preprocess: Options to enqueue preprocessing with on completion, if any
+        chat_file: The ChatFile created on completion
+        created_at: The date and time the upload was started
+        updated_at: The date and time a chunk was last received
+    '''
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64)
+    channel = models.ForeignKey(Channel, on_delete=models.SET_NULL, null=True, blank=True)
+    preprocess = models.JSONField(null=True, blank=True)
+    chat_file = models.ForeignKey(ChatFile, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def part_name(self) -> str:
+        """The storage name of the partially received file."""
+        return f"media/uploads/{self.upload_id}.part"
+
+    @property
+    def is_complete(self) -> bool:
+        """Whether every byte of the file has been received."""
+        return self.offset == self.size
+
+
 class Message(models.Model):
     '''
     Model for a chat message.
 
+    The table is partitioned by month on timestamp (see partitions.py), so its
+    primary key is (id, timestamp) in the database and other tables can't hold
+    foreign key constraints on it.
+
     Attributes:
         parent_log: The chat file that the message is associated with
+        channel: The channel of the parent log (denormalized for analytics queries)
         timestamp: The timestamp of the message
-        username: The username of the message sender
-        message: The message text
-        emotes: The emotes associated with the message
+        chatter: The user who sent the message
+        message: The message text (empty when stored in text instead)
+        text: The deduplicated message text, if text deduplication was enabled at ingest
+        emote_ids: The ids of the Emotes used in the message (null if none)
+        emote_counts: The number of uses of each emote in emote_ids, in the same order
         sentiment_score: The sentiment score of the message
+        fingerprint: Hash identifying the message across log sources (see preprocess.py)
     '''
     parent_log = models.ForeignKey(ChatFile, on_delete=models.CASCADE)
-    timestamp = models.DateTimeField(null=False, blank=False)
-    username = models.CharField(
-        max_length=255, null=False, blank=False, default="Default"
+    # Nullable only so the column can be added and backfilled without a table rewrite.
+    # Not indexed on its own, as the composite indexes below lead with it.
+    channel = models.ForeignKey(
+        Channel,
+        on_delete=models.SET(get_default_channel),
+        null=True,
+        blank=True,
+        db_index=False,
     )
+    timestamp = models.DateTimeField(null=False, blank=False)
+    # Nullable only so the column can be added and backfilled without a table rewrite
+    chatter = models.ForeignKey(Chatter, on_delete=models.PROTECT, null=True, blank=True)
     message = models.TextField(blank=True)
-    emotes = models.ManyToManyField(Emote, blank=True, related_name="emotes_associated")
+    text = models.ForeignKey(
+        MessageText, on_delete=models.PROTECT, null=True, blank=True, db_index=False
+    )
+    # Parallel arrays rather than a join table, so emote usage adds no rows.
+    # Emote ids aren't constrained, so deleting an Emote leaves stale ids behind.
+    emote_ids = ArrayField(models.IntegerField(), null=True, blank=True)
+    emote_counts = ArrayField(models.SmallIntegerField(), null=True, blank=True)
     sentiment_score = models.FloatField(null=True, blank=True)
+    # Null for messages duplicating an earlier one, stored before fingerprints existed
+    fingerprint = models.BigIntegerField(null=True, blank=True)
 
+    @property
+    def body(self) -> str:
+        """The message text, wherever it is stored."""
+        return self.text.text if self.text_id else self.message
 
-class MessageEmote(models.Model):
+    class Meta:
+        indexes = [
+            # Serves the keyset pagination of the viewer as well as time range scans
+            models.Index(
+                fields=["channel", "timestamp", "id"], name="message_channel_time_id_idx"
+            ),
+            models.Index(fields=["channel", "chatter"], name="message_channel_chatter_idx"),
+            # Tiny index that suits append-mostly, roughly time-ordered ingestion
+            BrinIndex(fields=["timestamp"], name="message_time_brin", autosummarize=True),
+            # Full-text search of messages (see MessageViewSet.search), whose text is
+            # either their own or a MessageText found through the partial index
+            GinIndex(SearchVector("message", config=SEARCH_CONFIG), name="message_search_gin"),
+            models.Index(
+                fields=["text"], condition=models.Q(text__isnull=False), name="message_text_idx"
+            ),
+        ]
+        constraints = [
+            # Makes bulk inserts skip messages already imported from another log.
+            # Unique constraints on a partitioned table must include its partition key.
+            models.UniqueConstraint(
+                fields=["fingerprint", "timestamp"], name="message_fingerprint_uniq"
+            ),
+        ]
+
+
+class MessageCopy(models.Model):
     '''
-    Many-to-Many relationship between Message and Emote
-    to store the counts of each emote in a message 
+    Model for a message of a chat file which wasn't stored at ingest, as another
+    file had imported it already. When the file holding the message is deleted,
+    the message passes to a file holding a copy rather than going with it.
 
     Attributes:
-        message: The message that the emote is associated with
-        emote: The emote that is associated with the message
-        count: The count of the emote in the message
+        chat_file: The ChatFile holding the copy
+        fingerprint: The fingerprint of the message
+        timestamp: The timestamp of the message
+    '''
+    chat_file = models.ForeignKey(ChatFile, on_delete=models.CASCADE)
+    fingerprint = models.BigIntegerField()
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["fingerprint", "timestamp", "chat_file"], name="message_copy_uniq"
+            ),
+        ]
+
+
+class MessageRollup(models.Model):
     '''
-    message = models.ForeignKey(Message, on_delete=models.CASCADE)
+    Abstract model for message statistics pre-aggregated per channel and time bucket.
+    Maintained at ingest and on deletion (see rollups.py).
+
+    Attributes:
+        channel: The channel of the messages
+        bucket: The start of the time bucket
+        message_count: The number of messages
+        sentiment_sum: The sum of the sentiment scores of the scored messages
+        sentiment_count: The number of scored messages
+    '''
+    # Not indexed on its own, as the unique constraint leads with it
+    channel = models.ForeignKey(Channel, on_delete=models.CASCADE, db_index=False)
+    bucket = models.DateTimeField()
+    message_count = models.IntegerField(default=0)
+    sentiment_sum = models.FloatField(default=0)
+    sentiment_count = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class MessageMinuteRollup(MessageRollup):
+    '''
+    Message statistics per channel and minute.
+    '''
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["channel", "bucket"], name="message_minute_rollup_uniq"
+            ),
+        ]
+
+
+class MessageHourRollup(MessageRollup):
+    '''
+    Message statistics per channel and hour, from which coarser granularities are derived.
+    '''
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["channel", "bucket"], name="message_hour_rollup_uniq"
+            ),
+        ]
+
+
+class EmoteHourRollup(models.Model):
+    '''
+    Uses of each emote per channel and hour, from which coarser granularities are
+    derived. Maintained along with the message rollups (see rollups.py).
+
+    Attributes:
+        channel: The channel of the messages
+        emote: The emote used
+        bucket: The start of the hour
+        count: The number of uses of the emote
+    '''
+    # Not indexed on its own, as the unique constraint leads with it
+    channel = models.ForeignKey(Channel, on_delete=models.CASCADE, db_index=False)
     emote = models.ForeignKey(Emote, on_delete=models.CASCADE)
-    count = models.IntegerField()
+    bucket = models.DateTimeField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["channel", "bucket", "emote"], name="emote_hour_rollup_uniq"
+            ),
+        ]
+
+
+class UserSketch(models.Model):
+    '''
+    HyperLogLog sketch of the chatters of a channel in an hour, for approximate
+    unique user counts. Maintained at ingest and on deletion (see sketches.py).
+
+    Attributes:
+        channel: The channel of the messages
+        bucket: The start of the hour
+        registers: The sketch registers, one byte each
+    '''
+    # Not indexed on its own, as the unique constraint leads with it
+    channel = models.ForeignKey(Channel, on_delete=models.CASCADE, db_index=False)
+    bucket = models.DateTimeField()
+    registers = models.BinaryField()
 
     class Meta:
-        unique_together = ("message", "emote")
+        constraints = [
+            models.UniqueConstraint(fields=["channel", "bucket"], name="user_sketch_uniq"),
+        ]
 
 
 class Task(models.Model):
@@ -0,0 +1,202 @@
+'''
+Management of the monthly Postgres partitions of the Message table.
+
+The table is partitioned by range on its timestamp column, one partition per
+calendar month, plus a DEFAULT partition catching rows for months that have no
+partition yet.
+'''
+
+from datetime import date, datetime
+
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from .analytics_cache import bump_channel_versions
+from .copies import delete_copies_between
+from .rollups import delete_rollups_between
+from .sketches import delete_sketches_between
+
+# Constants
+PARTITIONED_TABLES = ("api_message",)
+# Arbitrary key for the advisory lock serializing partition changes between workers
+PARTITION_LOCK_ID = 7_201_030
+
+
+def month_start(moment: date) -> date:
+    """Return the first day of the month containing the given date."""
+    return date(moment.year, moment.month, 1)
+
+
+def next_month(month: date) -> date:
+    """Return the first day of the month following the given month start."""
+    if month.month == 12:
+        return date(month.year + 1, 1, 1)
+    return date(month.year, month.month + 1, 1)
+
+
+def months_between(start: date, end: date) -> list[date]:
+    """Return the start of each month overlapping the (inclusive) date range."""
+    months = []
+    month = month_start(start)
+    while month <= end:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def partition_name(table: str, month: date) -> str:
+    """Return the name of the partition of a table holding the given month."""
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned() -> bool:
+    """Whether the database supports (and uses) partitioned message tables."""
+    return connection.vendor == "postgresql"
+
+
+def _to_datetime(value) -> datetime:
+    if isinstance(value, str):
+        return parse_datetime(value)
+    return value
+
+
+def ensure_message_partitions(start, end) -> None:
+    """
+    Make sure monthly partitions exist for every month between two timestamps.
+    Called at ingest, before messages are inserted.
+
+    The catalog is checked every time rather than remembered, as another process
+    may have dropped a partition since (see drop_month_partitions).
+
+    Args:
+        start (datetime | str): The earliest timestamp about to be inserted.
+        end (datetime | str): The latest timestamp about to be inserted.
+    """
+    if not is_partitioned():
+        return
+    months = months_between(_to_datetime(start).date(), _to_datetime(end).date())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM unnest(%s::text[]) AS name WHERE to_regclass(name) IS NULL",
+            [[partition_name(table, month) for month in months for table in PARTITIONED_TABLES]],
+        )
+        missing = {row[0] for row in cursor.fetchall()}
+    for month in months:
+        if any(partition_name(table, month) in missing for table in PARTITIONED_TABLES):
+            create_month_partitions(month)
+
+
+def create_month_partitions(month: date) -> None:
+    """
+    Create the partitions of every partitioned table for a month, if missing.
+
+    Rows for that month already sitting in a DEFAULT partition are moved into the
+    new partition before it is attached.
+
+    Args:
+        month (date): The first day of the month.
+    """
+    bounds = [month.isoformat(), next_month(month).isoformat()]
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [PARTITION_LOCK_ID])
+        for table in PARTITIONED_TABLES:
+            name = partition_name(table, month)
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0]:
+                continue
+
+            cursor.execute(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS)')
+
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM "{table}_default" '
+                '    WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+                f'INSERT INTO "{name}" SELECT * FROM moved',
+                bounds,
+            )
+            cursor.execute(
+                f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" '
+                "FOR VALUES FROM (%s) TO (%s)",
+                bounds,
+            )
+
+
+def drop_month_partitions(month: date) -> None:
+    """
+    Drop every message of a month by dropping its partitions.
+    This is far cheaper than deleting the rows.
+
+    The month's rollups, user sketches and message copies are deleted along with
+    them, and the cached analytics of the channels they covered invalidated.
+
+    Args:
+        month (date): The first day of the month.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [PARTITION_LOCK_ID])
+        # Deferred foreign key checks pending on the partition would block the drop
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        channel_ids = delete_rollups_between(month, next_month(month))
+        delete_sketches_between(month, next_month(month))
+        delete_copies_between(month, next_month(month))
+        for table in reversed(PARTITIONED_TABLES):
+            cursor.execute(f'DROP TABLE IF EXISTS "{partition_name(table, month)}"')
+    bump_channel_versions(channel_ids)
+
+
+def drop_month_partitions_of_files(month: date, file_ids: list[int]) -> int | None:
+    """
+    Drop the partitions of a month if every message in them belongs to one of the
+    given chat files, so deleting those files doesn't need to delete row by row.
+
+    The partition is locked before it is checked, so no message can be added to it
+    in between. Rows for the month inserted later go to the DEFAULT partition until
+    a new partition is created for it.
+
+    Args:
+        month (date): The first day of the month.
+        file_ids (list[int]): The ids of the ChatFiles being deleted.
+
+    Returns:
+        int | None: The number of messages dropped, or None if the partition is
+            missing, empty, or holds messages of other chat files.
+    """
+    name = partition_name("api_message", month)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [PARTITION_LOCK_ID])
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if not cursor.fetchone()[0]:
+            return None
+
+        cursor.execute(f'LOCK TABLE "{name}" IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(
+            f'SELECT COUNT(*), COUNT(*) FILTER (WHERE parent_log_id <> ALL(%s)) FROM "{name}"',
+            [list(file_ids)],
+        )
+        total, others = cursor.fetchone()
+        if not total or others:
+            return None
+
+        drop_month_partitions(month)
+    return total
+
+
+def list_month_partitions() -> list[date]:
+    """
+    Return the months which have a Message partition, in order.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = 'api_message'"
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    prefix = "api_message_y"
+    return sorted(
+        date(int(name[len(prefix):len(prefix) + 4]), int(name[-2:]), 1)
+        for name in names
+        if name.startswith(prefix)
+    )
@@ -0,0 +1,93 @@
+'''
+Compact renderers for the time series returned by the aggregate endpoints, chosen
+through content negotiation (an Accept header, or a format query parameter).
+
+Series, lists of {"date", "value"} dictionaries, are rendered as columns instead:
+    - start: the epoch milliseconds of the first date
+    - step: the milliseconds between consecutive dates, if regular, else null
+    - dates: the epoch milliseconds of every date, only if there is no step
+    - values: the values, in order
+This applies to series nested in a dictionary of metrics, or in the 'series' of
+each item of a list. Any other data is rendered as is.
+'''
+
+import msgpack
+import numpy as np
+import orjson
+from rest_framework.renderers import BaseRenderer
+
+# Constants
+SERIES_KEYS = {"date", "value"}
+
+
+def is_series(data) -> bool:
+    """Whether data is a time series, as returned by the aggregate endpoints."""
+    return isinstance(data, list) and all(
+        isinstance(entry, dict) and entry.keys() == SERIES_KEYS for entry in data
+    )
+
+
+def to_columns(data):
+    """
+    Convert the time series in data to columns, whether data is a series itself, a
+    dictionary of metrics (as returned by dashboard_metrics), or a list of items
+    with a 'series' each (as returned by popular_emotes_aggregate).
+    """
+    if is_series(data):
+        return series_to_columns(data)
+    # Each metric is converted on its own, as not all are series
+    if isinstance(data, dict) and data and all(isinstance(value, list) for value in data.values()):
+        return {key: to_columns(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [
+            {**item, "series": series_to_columns(item["series"])}
+            if isinstance(item, dict) and is_series(item.get("series"))
+            else item
+            for item in data
+        ]
+    return data
+
+
+def series_to_columns(data: list[dict]) -> dict:
+    """Convert a time series to columns."""
+    dates = np.array([entry["date"] for entry in data], dtype="datetime64[ms]").astype(np.int64)
+    steps = np.unique(np.diff(dates))
+    columns = {
+        "start": int(dates[0]) if len(dates) else None,
+        "step": int(steps[0]) if len(steps) == 1 else None,
+        "values": [entry["value"] for entry in data],
+    }
+    if columns["step"] is None:
+        columns["dates"] = dates.tolist()
+    return columns
+
+
+class ColumnarJSONRenderer(BaseRenderer):
+    """
+    Renders time series as columns, in JSON (with orjson).
+    """
+
+    media_type = "application/vnd.channellogs.columnar+json"
+    format = "columnar"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return orjson.dumps(to_columns(data))
+
+
+class MsgpackRenderer(BaseRenderer):
+    """
+    Renders time series as columns, in MessagePack.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(to_columns(data), default=str)
@@ -0,0 +1,180 @@
+'''
+Maintenance of the message rollup tables (MessageMinuteRollup, MessageHourRollup),
+which hold message statistics per channel and time bucket for the analytics views,
+and of the emote rollup table (EmoteHourRollup), which holds emote uses per hour.
+
+Rollups are adjusted by the messages added or removed, rather than recomputed:
+minute buckets are aggregated from the messages, and hour buckets from those.
+'''
+
+from django.db import connection
+
+# Constants
+MINUTE_ROLLUP_TABLE = "api_messageminuterollup"
+HOUR_ROLLUP_TABLE = "api_messagehourrollup"
+EMOTE_ROLLUP_TABLE = "api_emotehourrollup"
+
+
+def _upsert(table: str, rows_sql: str) -> str:
+    # Add the statistics of the rows to the table's buckets, creating missing ones
+    return (
+        f"INSERT INTO {table} "
+        "(channel_id, bucket, message_count, sentiment_sum, sentiment_count) "
+        f"{rows_sql} "
+        "ON CONFLICT (channel_id, bucket) DO UPDATE SET "
+        f"message_count = {table}.message_count + EXCLUDED.message_count, "
+        f"sentiment_sum = {table}.sentiment_sum + EXCLUDED.sentiment_sum, "
+        f"sentiment_count = {table}.sentiment_count + EXCLUDED.sentiment_count"
+    )
+
+
+def _upsert_emotes(rows_sql: str) -> str:
+    # Add the emote uses of the rows to the emote rollup's buckets, creating missing ones
+    return (
+        f"INSERT INTO {EMOTE_ROLLUP_TABLE} (channel_id, bucket, emote_id, count) "
+        f"{rows_sql} "
+        "ON CONFLICT (channel_id, bucket, emote_id) DO UPDATE SET "
+        f"count = {EMOTE_ROLLUP_TABLE}.count + EXCLUDED.count"
+    )
+
+
+def _apply_messages(condition: str, params: list, sign: int) -> None:
+    """
+    Add (sign=1) or subtract (sign=-1) the messages matching a condition to the
+    rollups, in a single statement.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "WITH delta AS ("
+            "    SELECT channel_id, date_trunc('minute', \"timestamp\") AS bucket,"
+            "        %s * COUNT(*) AS message_count,"
+            "        %s * COALESCE(SUM(sentiment_score), 0) AS sentiment_sum,"
+            "        %s * COUNT(sentiment_score) AS sentiment_count"
+            "    FROM api_message"
+            f"    WHERE channel_id IS NOT NULL AND {condition}"
+            "    GROUP BY 1, 2"
+            "), minutes AS ("
+            + _upsert(
+                MINUTE_ROLLUP_TABLE,
+                "SELECT channel_id, bucket, message_count, sentiment_sum, sentiment_count "
+                "FROM delta",
+            )
+            + "), emotes AS ("
+            # Emotes deleted since are skipped, as their rollups went with them
+            + _upsert_emotes(
+                "SELECT channel_id, date_trunc('hour', \"timestamp\"), used.emote_pk, "
+                "    %s * SUM(used.count) "
+                "FROM api_message "
+                "CROSS JOIN LATERAL unnest(emote_ids, emote_counts) AS used(emote_pk, count) "
+                f"WHERE channel_id IS NOT NULL AND {condition} "
+                "    AND used.emote_pk IN (SELECT id FROM api_emote) "
+                "GROUP BY 1, 2, 3"
+            )
+            + ") "
+            + _upsert(
+                HOUR_ROLLUP_TABLE,
+                "SELECT channel_id, date_trunc('hour', bucket), SUM(message_count), "
+                "SUM(sentiment_sum), SUM(sentiment_count) FROM delta GROUP BY 1, 2",
+            ),
+            [sign, sign, sign, *params, sign, *params],
+        )
+
+
+def get_last_message_id(parent_id: int) -> int:
+    """
+    Return the highest Message id of a chat file, so the messages a later insert
+    actually adds can be told apart (see add_file_to_rollups).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COALESCE(MAX(id), 0) FROM api_message WHERE parent_log_id = %s",
+            [parent_id],
+        )
+        return cursor.fetchone()[0]
+
+
+def add_file_to_rollups(parent_id: int, after_id: int = 0) -> None:
+    """
+    Add the messages of a chat file inserted after a given id to the rollups.
+    Messages skipped at insert (already imported from another log) aren't counted.
+
+    Args:
+        parent_id (int): The id of the ChatFile.
+        after_id (int, optional): The file's highest message id before the insert,
+            from get_last_message_id. Defaults to 0, adding every message.
+    """
+    _apply_messages("parent_log_id = %s AND id > %s", [parent_id, after_id], 1)
+
+
+def delete_rollups_between(start, end) -> list[int]:
+    """
+    Delete every rollup bucket in a range of time, after all its messages were
+    dropped at once (see partitions.drop_month_partitions).
+
+    Args:
+        start (datetime): The start of the range.
+        end (datetime): The end of the range (exclusive).
+
+    Returns:
+        list[int]: The ids of the Channels which had rollups in the range.
+    """
+    channel_ids = set()
+    with connection.cursor() as cursor:
+        for table in (MINUTE_ROLLUP_TABLE, HOUR_ROLLUP_TABLE, EMOTE_ROLLUP_TABLE):
+            cursor.execute(
+                f"WITH deleted AS (DELETE FROM {table} WHERE bucket >= %s AND bucket < %s "
+                "    RETURNING channel_id) "
+                "SELECT DISTINCT channel_id FROM deleted",
+                [start, end],
+            )
+            channel_ids.update(row[0] for row in cursor.fetchall())
+    return sorted(channel_ids)
+
+
+def add_messages_to_rollups(message_ids: list[int]) -> None:
+    """
+    Add messages to the rollups, in the transaction moving them to their channel.
+
+    Args:
+        message_ids (list[int]): The ids of the Messages.
+    """
+    _apply_messages("id = ANY(%s)", [list(message_ids)], 1)
+
+
+def remove_messages_from_rollups(message_ids: list[int]) -> None:
+    """
+    Subtract messages from the rollups, in the transaction deleting them or moving
+    them to another channel.
+
+    Args:
+        message_ids (list[int]): The ids of the Messages.
+    """
+    _apply_messages("id = ANY(%s)", [list(message_ids)], -1)
+
+
+def move_channel_rollups(channel_id: int, to_channel_id: int) -> None:
+    """
+    Move the rollups of a channel onto another, merging buckets both have.
+
+    Args:
+        channel_id (int): The id of the Channel whose messages are moved.
+        to_channel_id (int): The id of the Channel receiving them.
+    """
+    with connection.cursor() as cursor:
+        for table in (MINUTE_ROLLUP_TABLE, HOUR_ROLLUP_TABLE):
+            cursor.execute(
+                _upsert(
+                    table,
+                    "SELECT %s, bucket, message_count, sentiment_sum, sentiment_count "
+                    f"FROM {table} WHERE channel_id = %s",
+                ),
+                [to_channel_id, channel_id],
+            )
+            cursor.execute(f"DELETE FROM {table} WHERE channel_id = %s", [channel_id])
+        cursor.execute(
+            _upsert_emotes(
+                f"SELECT %s, bucket, emote_id, count FROM {EMOTE_ROLLUP_TABLE} WHERE channel_id = %s"
+            ),
+            [to_channel_id, channel_id],
+        )
+        cursor.execute(f"DELETE FROM {EMOTE_ROLLUP_TABLE} WHERE channel_id = %s", [channel_id])
@@ -5,3 +5,4 @@ Import all the functions from the submodules, which are dependencies of our Cele
 from .preprocess import *
 from .import_rustlog import *
 from .build_emote_set import *
+from .delete_chat_data import *
@@ -1,31 +1,214 @@
-import requests
-from ..models import Emote, EmoteSet
+'''
+Module to build EmoteSet objects from 7TV emote set data.
+'''
 
+from django.db import transaction
 
-def build_emote_set(set_id: str) -> None:
-    response = requests.get(f"http://7tv.io/v3/emote-sets/{set_id}", timeout=3)
-    if response.status_code != 200:
-        raise ConnectionError("Couldn't recover emote set, it may not exist.")
+from ..analytics_cache import bump_channel_versions
+from ..http_client import fetch_json
+from ..models import Emote, EmoteHourRollup, EmoteSet, EmoteSetEmote
+from .preprocess import invalidate_emote_lookups
+
+# Constants
+EMOTE_SET_CACHE_TTL = 5 * 60
+
+
+def get_base_name(emote_dict: dict) -> str:
+    """Return the 7TV name of an emote of a set, whatever the set renamed it to."""
+    return (emote_dict.get("data") or {}).get("name") or emote_dict["name"]
 
-    data = response.json()
 
-    # First create parent EmoteSet
-    obj = EmoteSet.objects.create(name=data["name"], set_id=set_id)
+def upsert_emotes(emote_dicts: list[dict]) -> dict[str, int]:
+    """
+    Insert or update Emote rows for a list of 7TV emote dictionaries in bulk.
 
-    # Use a dictionary to store unique emotes by their emote_id
+    Emotes are keyed on their 7TV emote_id, so an emote that already exists
+    (e.g. because it belongs to another set) is reused rather than duplicated.
+    Each is stored under its own 7TV name, not the name a set gives it. Once the
+    changes commit, the cached analytics of the channels using renamed emotes are
+    invalidated, as they hold emote names.
+
+    Args:
+        emote_dicts (list[dict]): The 'emotes' list of a 7TV emote set response.
+
+    Returns:
+        dict[str, int]: The primary key of the Emote row of each distinct emote_id.
+    """
+    # Store only the first occurrence of each emote_id
     unique_emotes = {}
-    for emote_dict in data["emotes"]:
-        emote_id = emote_dict["id"]
-        # Store only the first occurrence of each emote_id
-        if emote_id not in unique_emotes:
-            unique_emotes[emote_id] = {
-                "name": emote_dict["name"],
-                "emote_id": emote_id,
-            }
-
-    # Create emote objects
-    emotes_list = [
-        Emote.objects.create(**emote_data) for emote_data in unique_emotes.values()
+    for emote_dict in emote_dicts:
+        unique_emotes.setdefault(
+            emote_dict["id"], Emote(name=get_base_name(emote_dict), emote_id=emote_dict["id"])
+        )
+
+    # Skip rows that are already stored as-is, so re-syncing a set is write-free
+    stored_names = dict(
+        Emote.objects.filter(emote_id__in=unique_emotes).values_list("emote_id", "name")
+    )
+    Emote.objects.bulk_create(
+        [
+            emote
+            for emote in unique_emotes.values()
+            if stored_names.get(emote.emote_id) != emote.name
+        ],
+        update_conflicts=True,
+        unique_fields=["emote_id"],
+        update_fields=["name"],
+    )
+
+    renamed = [
+        emote_id
+        for emote_id, name in stored_names.items()
+        if unique_emotes[emote_id].name != name
     ]
+    if renamed:
+        channel_ids = list(
+            EmoteHourRollup.objects.filter(emote__emote_id__in=renamed)
+            .values_list("channel_id", flat=True)
+            .distinct()
+        )
+        transaction.on_commit(lambda: bump_channel_versions(channel_ids))
+    return dict(
+        Emote.objects.filter(emote_id__in=unique_emotes).values_list("emote_id", "id")
+    )
+
+
+def get_aliases(emote_dicts: list[dict], emote_pks: dict[str, int]) -> dict[int, str]:
+    """
+    Map each emote of a set to the name the set uses for it, or a blank name if
+    the set uses the emote's own name (see EmoteSetEmote).
+
+    Args:
+        emote_dicts (list[dict]): The 'emotes' list of a 7TV emote set response.
+        emote_pks (dict[str, int]): The primary key of each emote_id, from upsert_emotes.
+
+    Returns:
+        dict[int, str]: The alias of each Emote primary key in the set.
+    """
+    aliases = {}
+    for emote_dict in emote_dicts:
+        alias = emote_dict["name"] if emote_dict["name"] != get_base_name(emote_dict) else ""
+        aliases.setdefault(emote_pks[emote_dict["id"]], alias)
+    return aliases
+
+
+def fetch_emote_set(set_id: str, use_cache: bool = False) -> dict:
+    """
+    Fetch the data for an emote set from 7TV.
+
+    Args:
+        set_id (str): The ID of the emote set on 7TV.
+        use_cache (bool, optional): Whether a response cached within the last
+            EMOTE_SET_CACHE_TTL seconds may be used. Defaults to False.
+
+    Returns:
+        dict: The JSON body of the 7TV emote set response.
+
+    Raises:
+        ConnectionError: If the emote set could not be retrieved.
+    """
+    data = fetch_json(
+        f"http://7tv.io/v3/emote-sets/{set_id}",
+        ttl=EMOTE_SET_CACHE_TTL if use_cache else None,
+    )
+    if data is None:
+        raise ConnectionError("Couldn't recover emote set, it may not exist.")
+    return data
+
+
+def build_emote_set(set_id: str) -> None:
+    """
+    Fetch an emote set from 7TV and store it, along with its emotes.
+
+    Args:
+        set_id (str): The ID of the emote set on 7TV.
+
+    Raises:
+        ConnectionError: If the emote set could not be retrieved.
+    """
+    # The set was usually just fetched to validate the request, so reuse that response
+    data = fetch_emote_set(set_id, use_cache=True)
+
+    with transaction.atomic():
+        # First create parent EmoteSet
+        obj = EmoteSet.objects.create(name=data["name"], set_id=set_id)
+
+        # Upsert emotes, then link them to the set under its names in a single statement
+        emote_dicts = data.get("emotes") or []
+        aliases = get_aliases(emote_dicts, upsert_emotes(emote_dicts))
+        EmoteSetEmote.objects.bulk_create(
+            [
+                EmoteSetEmote(emoteset_id=obj.id, emote_id=emote_id, name=alias)
+                for emote_id, alias in aliases.items()
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def sync_emote_set(set_id: str) -> dict[str, int]:
+    """
+    Bring a stored EmoteSet in line with its current state on 7TV.
+
+    Only the emote links that changed are added, removed or renamed. Emote rows are
+    never deleted, so message emote history for emotes that left the set is kept.
+    When anything changed, the set's updated_at is bumped, which invalidates the
+    emote lookups cached by the preprocessing workers.
+
+    Args:
+        set_id (str): The ID of the emote set on 7TV.
+
+    Returns:
+        dict[str, int]: The number of emotes 'added' to and 'removed' from the set.
+
+    Raises:
+        ConnectionError: If the emote set could not be retrieved.
+        EmoteSet.DoesNotExist: If the emote set has not been built yet.
+    """
+    data = fetch_emote_set(set_id)
+    emote_set = EmoteSet.objects.get(set_id=set_id)
+    remote_emotes = data.get("emotes") or []
+    remote_names = {emote["id"]: get_base_name(emote) for emote in remote_emotes}
+
+    with transaction.atomic():
+        stored_names = dict(emote_set.emotes.values_list("emote_id", "name"))
+        renamed = any(
+            stored_names[emote_id] != name
+            for emote_id, name in remote_names.items()
+            if emote_id in stored_names
+        )
+
+        remote_aliases = get_aliases(remote_emotes, upsert_emotes(remote_emotes))
+        links = EmoteSetEmote.objects.filter(emoteset=emote_set)
+        current_aliases = dict(links.values_list("emote_id", "name"))
+        added = remote_aliases.keys() - current_aliases.keys()
+        removed = current_aliases.keys() - remote_aliases.keys()
+        realiased = [
+            emote_id
+            for emote_id, alias in remote_aliases.items()
+            if emote_id in current_aliases and current_aliases[emote_id] != alias
+        ]
+
+        links.filter(emote_id__in=removed).delete()
+        EmoteSetEmote.objects.bulk_create(
+            [
+                EmoteSetEmote(
+                    emoteset_id=emote_set.id, emote_id=emote_id, name=remote_aliases[emote_id]
+                )
+                for emote_id in added
+            ],
+            ignore_conflicts=True,
+        )
+        realiased_links = list(links.filter(emote_id__in=realiased))
+        for link in realiased_links:
+            link.name = remote_aliases[link.emote_id]
+        EmoteSetEmote.objects.bulk_update(realiased_links, ["name"])
+
+        changed = added or removed or renamed or realiased or emote_set.name != data["name"]
+        if changed:
+            emote_set.name = data["name"]
+            emote_set.save()
+
+    if changed:
+        invalidate_emote_lookups()
 
-    obj.emotes.set(emotes_list)  # Set the emotes for this EmoteSet
+    return {"added": len(added), "removed": len(removed)}
@@ -0,0 +1,239 @@
+'''
+Module to delete chat data in the background: ChatFiles along with their messages,
+Channels, media files no longer referenced by any ChatFile, and abandoned uploads.
+It also moves ChatFiles and their messages to another channel.
+'''
+
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from ..analytics_cache import bump_channel_versions
+from ..copies import hand_over_messages
+from ..models import Channel, ChatFile, ChunkedUpload, Message, get_default_channel
+from ..partitions import drop_month_partitions_of_files, is_partitioned, list_month_partitions
+from ..rollups import (
+    add_messages_to_rollups,
+    move_channel_rollups,
+    remove_messages_from_rollups,
+)
+from ..sketches import get_sketch_hours, move_channel_sketches, rebuild_user_sketches
+
+# Constants
+DELETE_BATCH_SIZE = 10000
+# Files younger than this may belong to an upload whose ChatFile isn't saved yet
+ORPHAN_MEDIA_MIN_AGE = 60 * 60
+# Chunked uploads without a new chunk for this long are abandoned
+UPLOAD_EXPIRY = 24 * 60 * 60
+
+
+def _process_in_batches(queryset, operation, progress=None) -> int:
+    """
+    Apply an operation to the messages of a queryset, at most DELETE_BATCH_SIZE
+    at a time, until none are left.
+
+    Args:
+        queryset (QuerySet): The messages to process. The operation must remove
+            them from the queryset, or this never returns.
+        operation (Callable[[QuerySet, list[int]], int]): Called with each batch and
+            the ids of its messages, and returns the number of messages processed.
+        progress (Callable[[int], None], optional): Called with the running total
+            after each batch.
+
+    Returns:
+        int: The number of messages processed.
+    """
+    done = 0
+    while True:
+        ids = list(queryset.values_list("id", flat=True)[:DELETE_BATCH_SIZE])
+        if not ids:
+            return done
+        done += operation(queryset.filter(id__in=ids), ids)
+        if progress:
+            progress(done)
+
+
+def delete_chat_files(file_ids: list[int], progress=None) -> int:
+    """
+    Delete ChatFiles, their messages and their files on disk. Messages which
+    another chat file of the channel also holds are handed over to that file.
+
+    Monthly partitions holding only messages of these files are dropped whole,
+    along with their rollups. The remaining messages are deleted in batches, each
+    committed on its own with their subtraction from the rollups, so no statement
+    runs for long or holds many row locks, and the rollups match the messages left
+    if the deletion stops midway.
+
+    Args:
+        file_ids (list[int]): The ids of the ChatFiles to delete.
+        progress (Callable[[int, int], None], optional): Called with the number of
+            messages deleted so far, and the total to delete.
+
+    Returns:
+        int: The number of messages deleted.
+    """
+    # Messages other files of the channel also hold are kept, under one of those
+    hand_over_messages(file_ids)
+
+    messages = Message.objects.filter(parent_log_id__in=file_ids)
+    total = messages.count()
+    deleted = 0
+
+    def report(done):
+        if progress:
+            progress(deleted + done, total)
+
+    # Sketches can't subtract chatters, so those of the files' hours are rebuilt after
+    sketch_hours = get_sketch_hours("parent_log_id = ANY(%s)", [list(file_ids)])
+
+    if is_partitioned():
+        for month in list_month_partitions():
+            deleted += drop_month_partitions_of_files(month, file_ids) or 0
+            report(0)
+
+    def delete_batch(batch, ids):
+        with transaction.atomic():
+            remove_messages_from_rollups(ids)
+            return batch.delete()[0]
+
+    deleted += _process_in_batches(messages, delete_batch, report)
+
+    # Every message is gone, so each cascade only has the file itself to remove
+    for chat_file in ChatFile.objects.filter(id__in=file_ids):
+        chat_file.delete()
+
+    rebuild_user_sketches(sketch_hours)
+    bump_channel_versions(channel_id for channel_id, _ in sketch_hours)
+    return deleted
+
+
+def move_chat_file(file_id: int, channel_id: int, progress=None) -> int:
+    """
+    Move a ChatFile to another channel, moving its messages in batches. Each batch
+    is committed on its own, along with its move between the channels' rollups.
+
+    Args:
+        file_id (int): The id of the ChatFile to move.
+        channel_id (int): The id of the Channel to move it to.
+        progress (Callable[[int, int], None], optional): Called with the number of
+            messages moved so far, and the total to move.
+
+    Returns:
+        int: The number of messages moved.
+    """
+    # Sketches can't subtract chatters, so those of the file's hours are rebuilt after
+    sketch_hours = get_sketch_hours("parent_log_id = %s", [file_id])
+    ChatFile.objects.filter(id=file_id).update(channel_id=channel_id)
+
+    messages = Message.objects.filter(parent_log_id=file_id).exclude(channel_id=channel_id)
+    total = messages.count()
+
+    def report(done):
+        if progress:
+            progress(done, total)
+
+    def move_batch(batch, ids):
+        with transaction.atomic():
+            remove_messages_from_rollups(ids)
+            moved = batch.update(channel_id=channel_id)
+            add_messages_to_rollups(ids)
+            return moved
+
+    moved = _process_in_batches(messages, move_batch, report)
+
+    rebuild_user_sketches(sketch_hours + [(channel_id, hour) for _, hour in sketch_hours])
+    bump_channel_versions([channel_id, *(channel for channel, _ in sketch_hours)])
+    return moved
+
+
+def delete_channel(channel_id: int, progress=None) -> int:
+    """
+    Delete a Channel, moving its ChatFiles and messages to the default channel
+    in batches first, rather than in one statement on delete.
+
+    Args:
+        channel_id (int): The id of the Channel to delete.
+        progress (Callable[[int, int], None], optional): Called with the number of
+            messages moved so far, and the total to move.
+
+    Returns:
+        int: The number of messages moved to the default channel.
+
+    Raises:
+        ValueError: If the channel is the default channel.
+    """
+    channel = Channel.objects.get(id=channel_id)
+    default = get_default_channel()
+    if channel == default:
+        raise ValueError("The default channel can't be deleted.")
+
+    ChatFile.objects.filter(channel=channel).update(channel=default)
+
+    messages = Message.objects.filter(channel=channel)
+    total = messages.count()
+
+    def report(done):
+        if progress:
+            progress(done, total)
+
+    moved = _process_in_batches(
+        messages, lambda batch, _: batch.update(channel=default), report
+    )
+
+    move_channel_rollups(channel.id, default.id)
+    move_channel_sketches(channel.id, default.id)
+    bump_channel_versions([channel.id, default.id])
+    channel.delete()
+    return moved
+
+
+def collect_orphaned_media(min_age: int = ORPHAN_MEDIA_MIN_AGE) -> int:
+    """
+    Remove chat files from storage which no ChatFile refers to anymore, such as
+    those left behind by queryset deletes.
+
+    Args:
+        min_age (int, optional): Files modified within this many seconds are kept,
+            as they may belong to an upload in progress. Defaults to an hour.
+
+    Returns:
+        int: The number of files removed.
+    """
+    directory = ChatFile.file.field.upload_to
+    try:
+        _, names = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return 0
+
+    stored = set(ChatFile.objects.values_list("file", flat=True))
+    cutoff = timezone.now() - timedelta(seconds=min_age)
+    removed = 0
+    for name in names:
+        path = f"{directory}/{name}"
+        if path in stored or default_storage.get_modified_time(path) > cutoff:
+            continue
+        default_storage.delete(path)
+        removed += 1
+    return removed
+
+
+def collect_expired_uploads(max_age: int = UPLOAD_EXPIRY) -> int:
+    """
+    Remove chunked uploads which received no chunk for a while, along with their
+    partially received files.
+
+    Args:
+        max_age (int, optional): The number of seconds since the last chunk after
+            which an upload expires. Defaults to a day.
+
+    Returns:
+        int: The number of uploads removed.
+    """
+    expired = ChunkedUpload.objects.filter(
+        updated_at__lt=timezone.now() - timedelta(seconds=max_age)
+    )
+    for upload in expired:
+        default_storage.delete(upload.part_name)
+    return expired.delete()[0]
@@ -1,9 +1,11 @@
 from datetime import datetime, timedelta
+import hashlib
 import os
 
 import requests
 from django.core.files import File
 
+from ..http_client import get_session
 from ..models import ChatFile, Channel
 
 
@@ -27,15 +29,21 @@ def import_rustlog(repo_name: str, channel_name: str, start_date: datetime, end_
     for date in date_list:
         try:
             link = f"http://{repo_name}/channel/{channel_name}/{date}"
-            response = requests.get(link, timeout=3)
+            response = get_session().get(link, timeout=3)
+
+            # Skip days already imported, in this or any earlier upload
+            content = response.text.encode("utf-8")
+            sha256 = hashlib.sha256(content).hexdigest()
+            if ChatFile.objects.filter(sha256=sha256).exists():
+                continue
 
             # Define the file path and name
             file_path = f"/tmp/{channel_name}/{date}.log"
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
             # Write the response content to a .log file
-            with open(file_path, "w") as file:
-                file.write(response.text)
+            with open(file_path, "wb") as file:
+                file.write(content)
 
             # Create ChatFile instance
             with open(file_path, "rb") as file:
@@ -45,6 +53,7 @@ def import_rustlog(repo_name: str, channel_name: str, start_date: datetime, end_
                     channel=channel,
                     is_preprocessed=False,
                     metadata=None,
+                    sha256=sha256,
                 )
                 chat_file.save()
 
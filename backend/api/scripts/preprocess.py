@@ -3,15 +3,50 @@ Module to store functions for preprocessing data from Chatterino, or Rustlog fil
 Also contains functionality for posting data to the databse on completion.
 '''
 
+import hashlib
 import re
 from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
 from transformers import pipeline
 
-from ..models import ChatFile, EmoteSet, Message, MessageEmote
+from ..analytics_cache import bump_channel_versions
+from ..copies import add_message_copies
+from ..models import ChatFile, Chatter, Emote, EmoteSet, EmoteSetEmote, Message, MessageText
+from ..partitions import ensure_message_partitions
+from ..rollups import add_file_to_rollups, get_last_message_id
+from ..sketches import add_to_user_sketches
 
 # Constants
 CREATE_PREFIX = "bulk_create/"
 
+# Emote lookups per emote set name, stored with the set's updated_at stamp
+_EMOTE_LOOKUPS: dict[str, tuple] = {}
+
+
+def detect_log_format(path: str, max_lines: int = 10) -> str | None:
+    """
+    Detect the format of a log file from its first lines.
+
+    Args:
+        path (str): The file path of the log file.
+        max_lines (int, optional): The number of lines to look at. Defaults to 10.
+
+    Returns:
+        str | None: "Chatterino" or "Rustlog", or None if the file is neither.
+    """
+    rustlog_line = re.compile(r"^\[\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\] #")
+    with open(path, mode="r", encoding="UTF-8", errors="replace") as log_file:
+        for number, line in enumerate(log_file):
+            if number == max_lines:
+                break
+            if number == 0 and line.startswith("# Start logging at "):
+                return "Chatterino"
+            if rustlog_line.match(line):
+                return "Rustlog"
+    return None
+
 
 def extract_info_chatterino(path: str, emote_names: list[str] = None) -> list:
     """
@@ -187,6 +222,120 @@ def get_emote_set(emote_set_name):
     return emote_set.emotes.all()
 
 
+def get_emote_lookup(emote_set_name: str) -> dict[str, Emote]:
+    """
+    Retrieve a mapping of emote names to Emote objects for an EmoteSet.
+
+    The mapping is cached in-process, and rebuilt whenever the set's updated_at
+    stamp changes (e.g. after the set is synced with 7TV).
+
+    Args:
+        emote_set_name (str): The name of the EmoteSet to retrieve.
+
+    Returns:
+        dict[str, Emote]: A dictionary mapping each emote name to its Emote object.
+
+    Raises:
+        EmoteSet.DoesNotExist: If an EmoteSet with the given name does not exist in the database.
+    """
+    emote_set = EmoteSet.objects.get(name=emote_set_name)
+    cached = _EMOTE_LOOKUPS.get(emote_set_name)
+    if cached and cached[0] == emote_set.updated_at:
+        return cached[1]
+
+    # Emotes go by the name the set gives them, if it renamed them
+    lookup = {
+        link.name or link.emote.name: link.emote
+        for link in EmoteSetEmote.objects.filter(emoteset=emote_set).select_related("emote")
+    }
+    _EMOTE_LOOKUPS[emote_set_name] = (emote_set.updated_at, lookup)
+    return lookup
+
+
+def invalidate_emote_lookups() -> None:
+    """Drop every emote lookup cached by this process."""
+    _EMOTE_LOOKUPS.clear()
+
+
+def get_chatter_ids(usernames, chatter_ids: dict[str, int]) -> dict[str, int]:
+    """
+    Resolve usernames to Chatter ids, creating any missing Chatter rows in bulk.
+
+    Args:
+        usernames (Iterable[str]): The usernames to resolve.
+        chatter_ids (dict[str, int]): A cache of already resolved usernames, which is
+            updated in place. Pass the same dictionary for every batch of a task.
+
+    Returns:
+        dict[str, int]: The updated cache, mapping usernames to Chatter ids.
+    """
+    missing = set(usernames).difference(chatter_ids)
+    if missing:
+        Chatter.objects.bulk_create(
+            [Chatter(name=username) for username in missing], ignore_conflicts=True
+        )
+        chatter_ids.update(
+            Chatter.objects.filter(name__in=missing).values_list("name", "id")
+        )
+    return chatter_ids
+
+
+def get_text_digest(text: str) -> bytes:
+    """Return the 16-byte digest identifying a message text in the MessageText table."""
+    return hashlib.blake2b(text.encode("UTF-8"), digest_size=16).digest()
+
+
+def get_message_fingerprint(
+    channel_id: int, timestamp: str, username: str, text: str, ordinal: int
+) -> int:
+    """
+    Return the fingerprint identifying a message, whichever log it was imported from.
+
+    Args:
+        channel_id (int): The id of the message's Channel.
+        timestamp (str): The message timestamp, as "YYYY-MM-DD HH:MM:SS".
+        username (str): The name of the user who sent the message.
+        text (str): The message text.
+        ordinal (int): The number of identical messages (same channel, timestamp,
+            user and text) preceding this one in its log.
+
+    Returns:
+        int: The first 8 bytes of the MD5 of the fields, as a signed 64-bit integer.
+        Matches the SQL backfill in migration 0020, so don't change one without the other.
+    """
+    key = "|".join([str(channel_id), timestamp, username, text, str(ordinal)])
+    return int.from_bytes(hashlib.md5(key.encode("UTF-8")).digest()[:8], "big", signed=True)
+
+
+def get_message_text_ids(texts, text_ids: dict[str, int]) -> dict[str, int]:
+    """
+    Resolve message texts to MessageText ids, creating any missing rows in bulk.
+
+    Args:
+        texts (Iterable[str]): The message texts to resolve.
+        text_ids (dict[str, int]): A cache of already resolved texts, which is
+            updated in place. Pass the same dictionary for every batch of a task.
+
+    Returns:
+        dict[str, int]: The updated cache, mapping texts to MessageText ids.
+    """
+    missing = {get_text_digest(text): text for text in set(texts).difference(text_ids)}
+    if missing:
+        MessageText.objects.bulk_create(
+            [
+                MessageText(
+                    digest=digest, text=text, word_count=len(re.findall(r"\w+", text))
+                )
+                for digest, text in missing.items()
+            ],
+            ignore_conflicts=True,
+        )
+        stored = MessageText.objects.filter(digest__in=missing).values_list("digest", "id")
+        for digest, text_id in stored:
+            text_ids[missing[bytes(digest)]] = text_id
+    return text_ids
+
+
 def filter_emotes_from_message(message):
     """Remove any emotes from the message"""
     cleaned_message = message["message"]
@@ -218,12 +367,12 @@ def preprocess_log(
     emote_set_name: str,
     filter_emotes: bool,
     min_words: int,
-):
+) -> int:
 
     # Get emote set, if emotes anbled
     if use_emotes:
-        emote_set_obj = get_emote_set(emote_set_name)
-        emote_names = [x.name for x in emote_set_obj]
+        emote_lookup = get_emote_lookup(emote_set_name)
+        emote_names = list(emote_lookup)
     else:
         emote_names = []
 
@@ -259,8 +408,10 @@ def preprocess_log(
         else:
             messages = [msg["message"] for msg in form_data_list if msg_validator(msg)]
 
+        # Classify each distinct text once, as chat repeats itself heavily
+        unique_messages = list(dict.fromkeys(messages))
         emotion_results = pipe(
-            messages, ["positive opinion", "negative opinion", "neutral opinion"]
+            unique_messages, ["positive opinion", "negative opinion", "neutral opinion"]
         )
 
 
@@ -270,54 +421,95 @@ def preprocess_log(
             "neutral opinion": 0,
             "positive opinion": 1,
         }
-        sentiment_score = [translate[result["labels"][0]] for result in emotion_results]
+        score_by_text = {
+            text: translate[result["labels"][0]]
+            for text, result in zip(unique_messages, emotion_results)
+        }
+        sentiment_score = iter([score_by_text[text] for text in messages])
 
         # Update the original list with classification results
         for item in form_data_list:
             if not msg_validator(item):
                 item.update({"sentiment_score": None})
             else:
-                item.update({"sentiment_score": sentiment_score.pop(0)})
+                item.update({"sentiment_score": next(sentiment_score)})
+
+    # Make sure the monthly Message partitions exist for the log's time span
+    if form_data_list:
+        timestamps = [user_data["timestamp"] for user_data in form_data_list]
+        ensure_message_partitions(min(timestamps), max(timestamps))
 
     # Prepare messages in bulk
     parent_log = ChatFile.objects.get(id=parent_id)
+    chatter_ids = get_chatter_ids(
+        {user_data["username"] for user_data in form_data_list}, {}
+    )
+    if settings.DEDUPLICATE_MESSAGE_TEXT:
+        text_ids = get_message_text_ids(
+            {user_data["message"] for user_data in form_data_list}, {}
+        )
     messages_to_create = []
-    message_emotes_to_create = []
+    # Occurrences of each (timestamp, user, text) so far, to number repeated messages
+    ordinals = Counter()
 
     for user_data in form_data_list:
-        # Extract user and remove it from the data dictionary
+        # Reference the shared text, or store it inline
+        if settings.DEDUPLICATE_MESSAGE_TEXT:
+            body = {"text_id": text_ids[user_data["message"]]}
+        else:
+            body = {"message": user_data["message"]}
 
         # Create a Message instance with the remaining data
         if use_sentiment:
             message = Message(
                 parent_log=parent_log,
-                username=user_data["username"],
+                channel_id=parent_log.channel_id,
+                chatter_id=chatter_ids[user_data["username"]],
                 timestamp=user_data["timestamp"],
-                message=user_data["message"],
+                **body,
                 sentiment_score=user_data["sentiment_score"],
             )
         else:
             message = Message(
                 parent_log=parent_log,
-                username=user_data["username"],
+                channel_id=parent_log.channel_id,
+                chatter_id=chatter_ids[user_data["username"]],
                 timestamp=user_data["timestamp"],
-                message=user_data["message"],
+                **body,
             )
 
-        messages_to_create.append(message)
+        key = (user_data["timestamp"], user_data["username"], user_data["message"])
+        message.fingerprint = get_message_fingerprint(
+            parent_log.channel_id, *key, ordinals[key]
+        )
+        ordinals[key] += 1
 
-        message.save()
-        if use_emotes:
-            emotes = user_data.get("emotes", {})
-            for emote_name, count in emotes.items():
-                emote_obj = emote_set_obj.get(name=emote_name)
-                message_emotes_to_create.append(
-                    MessageEmote(message=message, emote=emote_obj, count=count)
-                )
+        emotes = user_data.get("emotes")
+        if use_emotes and emotes:
+            message.emote_ids = [emote_lookup[emote_name].id for emote_name in emotes]
+            message.emote_counts = list(emotes.values())
+
+        messages_to_create.append(message)
 
-    # Insert messages in bulk
+    # Insert messages in bulk, skipping those already imported from another log,
+    # and add those inserted to the rollups
+    after_id = get_last_message_id(parent_log.id)
     Message.objects.bulk_create(messages_to_create, ignore_conflicts=True)
-    if use_emotes:
-        MessageEmote.objects.bulk_create(
-            message_emotes_to_create, ignore_conflicts=True
-        )
+    add_file_to_rollups(parent_log.id, after_id)
+
+    # Record the skipped messages, so they outlive the log holding them
+    add_message_copies(
+        parent_log.id,
+        [message.fingerprint for message in messages_to_create],
+        [message.timestamp for message in messages_to_create],
+    )
+
+    # Add the chatters to the hourly sketches. Chatters of skipped messages were
+    # already added, so adding them again changes nothing.
+    ids_by_hour = {}
+    for user_data in form_data_list:
+        hour = datetime.strptime(user_data["timestamp"][:13], "%Y-%m-%d %H")
+        ids_by_hour.setdefault(hour, set()).add(chatter_ids[user_data["username"]])
+    add_to_user_sketches(parent_log.channel_id, ids_by_hour)
+    bump_channel_versions([parent_log.channel_id])
+    return len(messages_to_create)
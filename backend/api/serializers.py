@@ -65,7 +65,8 @@ class MessageSerializer(serializers.ModelSerializer):
     Serializer for the Message Model
     '''
     parent_log = ChatFileSerializer()
-    emotes = EmoteSerializer(many=True)
+    username = serializers.CharField(source="chatter.name", read_only=True)
+    message = serializers.CharField(source="body", read_only=True)
 
     class Meta:
         model = Message
@@ -74,9 +75,35 @@ class MessageSerializer(serializers.ModelSerializer):
             "timestamp",
             "username",
             "message",
-            "emotes",
+            "emote_ids",
+            "emote_counts",
             "sentiment_score",
         ]
         extra_kwargs = {
             "sentiment_score": {"required": False},
         }
+
+
+class MessageListSerializer(serializers.ModelSerializer):
+    '''
+    Lean read-only serializer for lists of Messages: the file and channel are given
+    by id, so a page takes no query beyond the one fetching it (with the chatter and
+    text selected).
+    '''
+    username = serializers.CharField(source="chatter.name", read_only=True, default=None)
+    message = serializers.CharField(source="body", read_only=True)
+
+    class Meta:
+        model = Message
+        fields = [
+            "id",
+            "parent_log",
+            "channel",
+            "timestamp",
+            "username",
+            "message",
+            "emote_ids",
+            "emote_counts",
+            "sentiment_score",
+        ]
+        read_only_fields = fields
@@ -0,0 +1,244 @@
+'''
+HyperLogLog sketches of the chatters of each channel per hour (UserSketch), used to
+approximate unique user counts over any range of hours without scanning messages.
+
+A sketch is a byte array of 2 ** PRECISION registers, each holding the longest
+run of leading zeros seen among the hashes routed to it. Sketches of different
+hours merge by taking the maximum of each register. The standard error of an
+estimate is 1.04 / sqrt(2 ** PRECISION), about 1.6%.
+'''
+
+from datetime import datetime
+
+import numpy as np
+from django.db import connection, transaction
+
+# Constants
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+STANDARD_ERROR = 1.04 / REGISTERS ** 0.5
+
+
+def hash_ids(ids) -> np.ndarray:
+    """
+    Hash integer ids to well-mixed 64-bit values (splitmix64's finalizer).
+
+    Args:
+        ids (Iterable[int]): The ids to hash.
+
+    Returns:
+        np.ndarray: The hashes, as uint64.
+    """
+    hashes = np.fromiter(ids, dtype=np.uint64)
+    hashes += np.uint64(0x9E3779B97F4A7C15)
+    hashes ^= hashes >> np.uint64(30)
+    hashes *= np.uint64(0xBF58476D1CE4E5B9)
+    hashes ^= hashes >> np.uint64(27)
+    hashes *= np.uint64(0x94D049BB133111EB)
+    hashes ^= hashes >> np.uint64(31)
+    return hashes
+
+
+def build_sketch(ids) -> np.ndarray:
+    """
+    Build the sketch of a collection of ids.
+
+    Args:
+        ids (Iterable[int]): The ids (Chatter ids) to add, duplicates included or not.
+
+    Returns:
+        np.ndarray: The sketch registers, as uint8.
+    """
+    hashes = hash_ids(ids)
+    width = 64 - PRECISION
+    index = (hashes >> np.uint64(width)).astype(np.intp)
+    rest = hashes & np.uint64((1 << width) - 1)
+
+    # Position of the first set bit of the remaining bits, counted from the top.
+    # The bits fit a float64 mantissa, so its exponent is exactly their bit length.
+    _, bit_length = np.frexp(rest.astype(np.float64))
+    rank = (width + 1 - bit_length).astype(np.uint8)
+
+    registers = np.zeros(REGISTERS, dtype=np.uint8)
+    np.maximum.at(registers, index, rank)
+    return registers
+
+
+def merge_sketches(sketches) -> np.ndarray:
+    """Merge sketches into the sketch of the union of their ids."""
+    merged = np.zeros(REGISTERS, dtype=np.uint8)
+    for sketch in sketches:
+        np.maximum(merged, sketch, out=merged)
+    return merged
+
+
+def estimate(sketch: np.ndarray) -> int:
+    """
+    Estimate the number of distinct ids added to a sketch.
+
+    Returns:
+        int: The estimate, with a standard error of STANDARD_ERROR (relative).
+    """
+    alpha = 0.7213 / (1 + 1.079 / REGISTERS)
+    raw = alpha * REGISTERS**2 / np.sum(np.ldexp(1.0, -sketch.astype(np.int32)))
+    zeros = int(np.count_nonzero(sketch == 0))
+    # Small cardinalities are counted far more accurately from the empty registers
+    if raw <= 2.5 * REGISTERS and zeros:
+        return round(REGISTERS * np.log(REGISTERS / zeros))
+    return round(raw)
+
+
+def to_sketch(registers) -> np.ndarray:
+    """Return the sketch stored in a UserSketch.registers value."""
+    return np.frombuffer(bytes(registers), dtype=np.uint8)
+
+
+def add_to_user_sketches(channel_id: int, ids_by_hour: dict[datetime, set[int]]) -> None:
+    """
+    Add chatters to the sketches of a channel's hours, creating missing sketches.
+    Adding a chatter already counted changes nothing, so re-imported messages are
+    harmless.
+
+    Args:
+        channel_id (int): The id of the Channel.
+        ids_by_hour (dict[datetime, set[int]]): The Chatter ids seen in each hour.
+    """
+    if not ids_by_hour:
+        return
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Find the bucket each hour is stored as. An hour skipped by a daylight saving
+        # change is stored as the next one, as are its messages, so both share a sketch.
+        cursor.execute(
+            "SELECT hour, hour::timestamptz FROM unnest(%s::timestamp[]) AS hour",
+            [list(ids_by_hour)],
+        )
+        ids_by_bucket: dict[datetime, set[int]] = {}
+        for hour, bucket in cursor.fetchall():
+            ids_by_bucket.setdefault(bucket, set()).update(ids_by_hour[hour])
+        buckets = sorted(ids_by_bucket)
+
+        # Create missing rows first, so every sketch can be locked while merging
+        cursor.execute(
+            "INSERT INTO api_usersketch (channel_id, bucket, registers) "
+            "SELECT %s, bucket, %s FROM unnest(%s::timestamp[]) AS bucket "
+            "ON CONFLICT (channel_id, bucket) DO NOTHING",
+            [channel_id, bytes(REGISTERS), buckets],
+        )
+        cursor.execute(
+            "SELECT bucket, registers FROM api_usersketch "
+            "WHERE channel_id = %s AND bucket = ANY(%s::timestamp[]) "
+            "ORDER BY bucket FOR UPDATE",
+            [channel_id, buckets],
+        )
+        cursor.executemany(
+            "UPDATE api_usersketch SET registers = %s WHERE channel_id = %s AND bucket = %s",
+            [
+                (
+                    np.maximum(
+                        to_sketch(registers), build_sketch(ids_by_bucket[bucket])
+                    ).tobytes(),
+                    channel_id,
+                    bucket,
+                )
+                for bucket, registers in cursor.fetchall()
+            ],
+        )
+
+
+def rebuild_user_sketches(pairs) -> None:
+    """
+    Rebuild sketches from the stored messages, after messages were deleted or moved
+    (which a sketch can't subtract). Sketches of hours left empty are removed.
+
+    Args:
+        pairs (Iterable[tuple[int, datetime]]): The (channel id, hour) to rebuild.
+    """
+    by_channel: dict[int, list[datetime]] = {}
+    for channel_id, hour in pairs:
+        by_channel.setdefault(channel_id, []).append(hour)
+
+    with connection.cursor() as cursor:
+        for channel_id, hours in by_channel.items():
+            cursor.execute(
+                "DELETE FROM api_usersketch "
+                "WHERE channel_id = %s AND bucket = ANY(%s::timestamp[])",
+                [channel_id, hours],
+            )
+            # The range bound lets the scan use the channel's time index, and skip the
+            # partitions of other months
+            cursor.execute(
+                "SELECT date_trunc('hour', \"timestamp\"), array_agg(DISTINCT chatter_id) "
+                "FROM api_message "
+                "WHERE channel_id = %s AND chatter_id IS NOT NULL "
+                "    AND \"timestamp\" >= %s::timestamp "
+                "    AND \"timestamp\" < %s::timestamp + interval '1 hour' "
+                "    AND date_trunc('hour', \"timestamp\") = ANY(%s::timestamp[]) "
+                "GROUP BY 1",
+                [channel_id, min(hours), max(hours), hours],
+            )
+            add_to_user_sketches(channel_id, {hour: set(ids) for hour, ids in cursor.fetchall()})
+
+
+def get_sketch_hours(condition: str, params: list) -> list[tuple[int, datetime]]:
+    """
+    Return the (channel id, hour) pairs of the messages matching a condition, to
+    rebuild once they are gone.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT DISTINCT channel_id, date_trunc('hour', \"timestamp\") FROM api_message "
+            f"WHERE channel_id IS NOT NULL AND {condition}",
+            params,
+        )
+        return cursor.fetchall()
+
+
+def delete_sketches_between(start, end) -> None:
+    """
+    Delete every sketch in a range of time, after all its messages were dropped at
+    once (see partitions.drop_month_partitions).
+
+    Args:
+        start (datetime): The start of the range.
+        end (datetime): The end of the range (exclusive).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "DELETE FROM api_usersketch WHERE bucket >= %s AND bucket < %s", [start, end]
+        )
+
+
+def move_channel_sketches(channel_id: int, to_channel_id: int) -> None:
+    """
+    Merge the sketches of a channel into another's, and remove them.
+
+    Args:
+        channel_id (int): The id of the Channel whose messages are moved.
+        to_channel_id (int): The id of the Channel receiving them.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT bucket, registers FROM api_usersketch WHERE channel_id = %s",
+            [channel_id],
+        )
+        rows = cursor.fetchall()
+
+    # Merging registers equals adding the ids, so go through the sketch rows directly
+    with transaction.atomic(), connection.cursor() as cursor:
+        for bucket, registers in rows:
+            cursor.execute(
+                "INSERT INTO api_usersketch (channel_id, bucket, registers) VALUES (%s, %s, %s) "
+                "ON CONFLICT (channel_id, bucket) DO NOTHING",
+                [to_channel_id, bucket, bytes(REGISTERS)],
+            )
+            cursor.execute(
+                "SELECT registers FROM api_usersketch "
+                "WHERE channel_id = %s AND bucket = %s FOR UPDATE",
+                [to_channel_id, bucket],
+            )
+            merged = np.maximum(to_sketch(cursor.fetchone()[0]), to_sketch(registers))
+            cursor.execute(
+                "UPDATE api_usersketch SET registers = %s WHERE channel_id = %s AND bucket = %s",
+                [merged.tobytes(), to_channel_id, bucket],
+            )
+        cursor.execute("DELETE FROM api_usersketch WHERE channel_id = %s", [channel_id])
@@ -4,8 +4,18 @@ Module to define the Celery tasks dispatched by the django backend.
 
 from datetime import datetime
 from celery import shared_task
-from .models import ChatFile, Task
-from .scripts import preprocess_log, import_rustlog, build_emote_set
+from .models import ChatFile, EmoteSet, Task
+from .scripts import (
+    preprocess_log,
+    import_rustlog,
+    build_emote_set,
+    sync_emote_set,
+    delete_chat_files,
+    move_chat_file,
+    delete_channel,
+    collect_orphaned_media,
+    collect_expired_uploads,
+)
 
 
 @shared_task
@@ -77,6 +87,44 @@ def build_emote_set_task(set_id, ticket_id):
     task.save()
 
 
+@shared_task
+def sync_emote_set_task(set_id, ticket_id=None):
+    '''
+    Celery task to sync a stored emote set with 7TV.
+    A ticket is optional, as periodic syncs are not requested by a user.
+    '''
+
+    task = None
+    if ticket_id:
+        task = Task.objects.get(ticket=ticket_id)
+        task.status = "IN_PROGRESS"
+        task.save()
+
+    try:
+        changes = sync_emote_set(set_id)
+        if task:
+            task.status = "COMPLETED"
+            task.result = f"{changes['added']} added, {changes['removed']} removed"
+
+    except Exception as e:
+        if not task:
+            raise
+        task.status = "FAILED"
+        task.result = str(e)
+
+    if task:
+        task.save()
+
+
+@shared_task
+def sync_all_emote_sets_task():
+    '''
+    Periodic Celery task to dispatch a sync for every stored emote set.
+    '''
+    for set_id in EmoteSet.objects.values_list("set_id", flat=True):
+        sync_emote_set_task.delay(set_id)
+
+
 @shared_task
 def get_rustlog_task(
     ticket_id, repo_name: str, channel_name: str, start_date: datetime, end_date: str
@@ -94,3 +142,94 @@ def get_rustlog_task(
         task.result = str(e)
 
     task.save()
+
+
+def _report_progress(task, action):
+    '''
+    Return a progress callback writing "<done> of <total> messages <action>"
+    to a task's result, so it can be polled through its ticket.
+    '''
+    def report(done, total):
+        task.result = f"{done} of {total} messages {action}"
+        task.save(update_fields=["result"])
+    return report
+
+
+@shared_task
+def delete_chat_files_task(ticket_id, file_ids):
+    '''
+    Celery task to delete ChatFiles and their messages in batches.
+    '''
+
+    # Get task object, and set in progress
+    task = Task.objects.get(ticket=ticket_id)
+    task.status = "IN_PROGRESS"
+    task.save()
+
+    try:
+        deleted = delete_chat_files(file_ids, _report_progress(task, "deleted"))
+        collect_orphaned_media()
+        task.status = "COMPLETED"
+        task.result = f"{len(file_ids)} files and {deleted} messages deleted"
+
+    except Exception as e:
+        task.status = "FAILED"
+        task.result = str(e)
+
+    task.save()
+
+
+@shared_task
+def move_chat_file_task(ticket_id, file_id, channel_id):
+    '''
+    Celery task to move a ChatFile and its messages to another channel in batches.
+    '''
+
+    # Get task object, and set in progress
+    task = Task.objects.get(ticket=ticket_id)
+    task.status = "IN_PROGRESS"
+    task.save()
+
+    try:
+        moved = move_chat_file(file_id, channel_id, _report_progress(task, "moved"))
+        task.status = "COMPLETED"
+        task.result = f"{moved} messages moved"
+
+    except Exception as e:
+        task.status = "FAILED"
+        task.result = str(e)
+
+    task.save()
+
+
+@shared_task
+def delete_channel_task(ticket_id, channel_id):
+    '''
+    Celery task to delete a Channel, moving its data to the default channel.
+    '''
+
+    # Get task object, and set in progress
+    task = Task.objects.get(ticket=ticket_id)
+    task.status = "IN_PROGRESS"
+    task.save()
+
+    try:
+        moved = delete_channel(channel_id, _report_progress(task, "moved"))
+        task.status = "COMPLETED"
+        task.result = f"{moved} messages moved to the default channel"
+
+    except Exception as e:
+        task.status = "FAILED"
+        task.result = str(e)
+
+    task.save()
+
+
+@shared_task
+def collect_orphaned_media_task():
+    '''
+    Periodic Celery task to remove chat files no ChatFile refers to,
+    and abandoned chunked uploads.
+    '''
+    collect_orphaned_media()
+    collect_expired_uploads()
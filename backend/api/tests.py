@@ -1,10 +1,115 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+from datetime import date, datetime
+from unittest import mock
+
+import msgpack
+import pyarrow.parquet as pq
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+
+from .models import (
+    Channel,
+    ChatFile,
+    Chatter,
+    ChunkedUpload,
+    Emote,
+    EmoteHourRollup,
+    EmoteSet,
+    EmoteSetEmote,
+    Message,
+    MessageCopy,
+    MessageHourRollup,
+    MessageMinuteRollup,
+    MessageText,
+    UserSketch,
+)
+from .management.commands.ingest_logs import find_log_files, get_channel_name, ingest_log_file
+from .partitions import (
+    drop_month_partitions,
+    drop_month_partitions_of_files,
+    ensure_message_partitions,
+    list_month_partitions,
+)
+from .renderers import to_columns
+from .rollups import remove_messages_from_rollups
+from .scripts import (
+    build_emote_set,
+    collect_orphaned_media,
+    delete_chat_files,
+    detect_log_format,
+    get_chatter_ids,
+    get_message_text_ids,
+    move_chat_file,
+    preprocess_log,
+    sync_emote_set,
+)
+from .sketches import (
+    STANDARD_ERROR,
+    add_to_user_sketches,
+    build_sketch,
+    estimate,
+    merge_sketches,
+    rebuild_user_sketches,
+    to_sketch,
+)
+from .transforms import apply_transforms, parse_max_points, parse_transforms
+from .views.emote_set_views import get_url_metadata
+from .views.message_views import get_emote_sums
+
+
+# Tests don't need the shared Redis cache, which the analytics and 7TV responses use
+TEST_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ApiTestCase(TestCase):
+    """Base test case, using a local memory cache."""
+
+    def create_chat_file(self, channel: Channel, content: bytes) -> ChatFile:
+        """Store a chat file, whose file is removed from disk after the test."""
+        chat_file = ChatFile.objects.create(
+            file=SimpleUploadedFile("test_file.txt", content), channel=channel
+        )
+        # Rows are rolled back with the test, but stored files aren't
+        self.addCleanup(lambda path=chat_file.file.path: os.path.isfile(path) and os.remove(path))
+        return chat_file
+
+    def ingest_log(self, channel: Channel, *lines: str, format_str="Chatterino", emote_set=""):
+        """Store a chat log of the given lines, and preprocess it."""
+        chat_file = self.create_chat_file(channel, "".join(f"{line}\n" for line in lines).encode())
+        preprocess_log(
+            chat_file.id, chat_file.file.path, format_str, False, bool(emote_set), emote_set,
+            False, 0,
+        )
+        return chat_file
+
 
-from .models import ChatFile
+def mock_7tv_response(name, emotes):
+    response = mock.Mock(status_code=200)
+    response.json.return_value = {
+        "name": name,
+        # Emotes are (id, name) pairs, with the 7TV name third if the set renamed them
+        "emotes": [
+            {"id": emote_id, "name": emote_name, "data": {"name": (*base_name, emote_name)[0]}}
+            for emote_id, emote_name, *base_name in emotes
+        ],
+    }
+    return response
 
 
-class FileUploadTestCase(TestCase):
+class FileUploadTestCase(ApiTestCase):
     def setUp(self):
         self.client = Client()
         self.upload_url = "/api/chatlogs/"
@@ -38,3 +143,1023 @@ class FileUploadTestCase(TestCase):
 
         # Delete entry
         response = self.client.delete(f'{self.upload_url}{chat_log.id}/')
+
+
+class BuildEmoteSetTestCase(ApiTestCase):
+    def setUp(self):
+        cache.clear()
+
+    @mock.patch("api.http_client.get_session")
+    def test_emotes_shared_across_sets(self, mock_session):
+        mock_get = mock_session.return_value.get
+        mock_get.return_value = mock_7tv_response("first", [("a", "KEKW"), ("b", "OMEGALUL")])
+        build_emote_set("set1")
+        mock_get.return_value = mock_7tv_response("second", [("b", "OMEGALUL"), ("c", "Pog")])
+        build_emote_set("set2")
+
+        self.assertEqual(Emote.objects.count(), 3)
+        shared = Emote.objects.get(emote_id="b")
+        self.assertEqual(shared.emote_sets_containing.count(), 2)
+        self.assertEqual(EmoteSet.objects.get(set_id="set2").emotes.count(), 2)
+
+    @mock.patch("api.http_client.get_session")
+    def test_sync_only_changes_links(self, mock_session):
+        mock_get = mock_session.return_value.get
+        mock_get.return_value = mock_7tv_response("set", [("a", "KEKW"), ("b", "OMEGALUL")])
+        build_emote_set("set1")
+        mock_get.return_value = mock_7tv_response("set", [("b", "OMEGALUL"), ("c", "Pog")])
+        changes = sync_emote_set("set1")
+
+        self.assertEqual(changes, {"added": 1, "removed": 1})
+        emote_set = EmoteSet.objects.get(set_id="set1")
+        self.assertEqual(set(emote_set.emotes.values_list("emote_id", flat=True)), {"b", "c"})
+        # Emotes that left the set are kept for message history
+        self.assertTrue(Emote.objects.filter(emote_id="a").exists())
+
+    @mock.patch("api.http_client.get_session")
+    def test_aliases_kept_per_set(self, mock_session):
+        mock_get = mock_session.return_value.get
+        mock_get.return_value = mock_7tv_response("first", [("a", "KEKW")])
+        build_emote_set("set1")
+        mock_get.return_value = mock_7tv_response("second", [("a", "LUL", "KEKW")])
+        build_emote_set("set2")
+
+        # The emote keeps its 7TV name, and each set its own name for it
+        self.assertEqual(Emote.objects.get(emote_id="a").name, "KEKW")
+        channel = Channel.objects.create(name="aliases")
+        for set_name, line in [("first", "bob: KEKW LUL"), ("second", "bob: LUL KEKW")]:
+            chat_log = self.ingest_log(
+                channel, "# Start logging at 2024-05-10 12:00:00", f"[12:00:01] {line}",
+                emote_set=set_name,
+            )
+            message = Message.objects.get(parent_log=chat_log)
+            self.assertEqual((message.emote_ids, message.emote_counts),
+                             ([Emote.objects.get(emote_id="a").id], [1]))
+
+        mock_get.return_value = mock_7tv_response("second", [("a", "KEKW")])
+        sync_emote_set("set2")
+        self.assertEqual(EmoteSetEmote.objects.get(emoteset__set_id="set2").name, "")
+
+    @mock.patch("api.http_client.get_session")
+    def test_rename_invalidates_cached_analytics(self, mock_session):
+        mock_get = mock_session.return_value.get
+        mock_get.return_value = mock_7tv_response("renamed", [("a", "KEKW")])
+        build_emote_set("set1")
+        channel = Channel.objects.create(name="renamed")
+        self.ingest_log(
+            channel, "# Start logging at 2024-05-10 12:00:00", "[12:00:01] bob: KEKW",
+            emote_set="renamed",
+        )
+
+        url = "/api/chat/messages/popular_emotes_aggregate/"
+        params = {"channel": channel.id, "start_date": "2024-05-10", "end_date": "2024-05-10"}
+        self.assertEqual(Client().get(url, params).json()[0]["name"], "KEKW")
+        mock_get.return_value = mock_7tv_response("renamed", [("a", "KEKL")])
+        with self.captureOnCommitCallbacks(execute=True):
+            sync_emote_set("set1")
+        self.assertEqual(Client().get(url, params).json()[0]["name"], "KEKL")
+
+    @mock.patch("api.http_client.get_session")
+    def test_validation_response_reused(self, mock_session):
+        mock_get = mock_session.return_value.get
+        mock_get.return_value = mock_7tv_response("set", [("a", "KEKW")])
+        self.assertTrue(get_url_metadata("set1"))
+        build_emote_set("set1")
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(EmoteSet.objects.get(set_id="set1").emotes.count(), 1)
+
+
+class MessageChannelTestCase(ApiTestCase):
+    def test_channel_follows_parent_log(self):
+        first = Channel.objects.create(name="first")
+        second = Channel.objects.create(name="second")
+        chat_log = self.ingest_log(
+            first,
+            "# Start logging at 2024-05-10 12:00:00",
+            "[12:00:01] bob: hi",
+            "[13:00:00] alice: bye",
+        )
+
+        # The request only enqueues the move
+        with mock.patch("api.views.chatfile_views.move_chat_file_task") as task:
+            response = Client().patch(
+                f"/api/chat/files/{chat_log.id}/",
+                encode_multipart(BOUNDARY, {"channel": json.dumps({"id": second.id})}),
+                content_type=MULTIPART_CONTENT,
+            )
+        self.assertEqual(response.status_code, 200)
+        ticket, *args = task.delay.call_args.args
+        self.assertEqual((str(ticket), *args), (response.json()["ticket"], chat_log.id, second.id))
+        self.assertEqual(Message.objects.filter(channel=first).count(), 2)
+
+        with mock.patch("api.scripts.delete_chat_data.DELETE_BATCH_SIZE", 1):
+            self.assertEqual(move_chat_file(chat_log.id, second.id), 2)
+        self.assertEqual(ChatFile.objects.get(id=chat_log.id).channel, second)
+        self.assertEqual(Message.objects.filter(channel=second).count(), 2)
+        for channel, count in [(first, 0), (second, 2)]:
+            self.assertEqual(
+                sum(MessageHourRollup.objects.filter(channel=channel)
+                    .values_list("message_count", flat=True)),
+                count,
+            )
+        self.assertEqual(UserSketch.objects.filter(channel=first).count(), 0)
+        self.assertEqual(UserSketch.objects.filter(channel=second).count(), 2)
+
+
+class ChatterTestCase(ApiTestCase):
+    def test_chatter_ids_resolved_once(self):
+        Chatter.objects.create(name="bob")
+        chatter_ids = get_chatter_ids(["bob", "alice"], {})
+        self.assertEqual(Chatter.objects.count(), 2)
+        self.assertEqual(chatter_ids["bob"], Chatter.objects.get(name="bob").id)
+
+        with self.assertNumQueries(0):
+            get_chatter_ids(["alice"], chatter_ids)
+
+
+class MessageTextTestCase(ApiTestCase):
+    def test_texts_stored_once(self):
+        text_ids = get_message_text_ids(["W", "KEKW W", "W"], {})
+        get_message_text_ids(["W"], {})
+
+        self.assertEqual(MessageText.objects.count(), 2)
+        self.assertEqual(MessageText.objects.get(id=text_ids["KEKW W"]).word_count, 2)
+
+
+class MessageEmoteTestCase(ApiTestCase):
+    def test_emote_sums_from_arrays(self):
+        channel = Channel.objects.create(name="emotes")
+        kekw = Emote.objects.create(name="KEKW", emote_id="k")
+        omegalul = Emote.objects.create(name="OMEGALUL", emote_id="o")
+        chat_log = self.create_chat_file(channel, b"Small test file. (Emotes)")
+        for timestamp, emote_ids, emote_counts in (
+            ("2024-01-01 00:00:00", [kekw.id, omegalul.id], [2, 1]),
+            ("2024-01-02 00:00:00", [kekw.id], [3]),
+            ("2024-01-03 00:00:00", None, None),
+            ("2024-02-01 00:00:00", [omegalul.id], [5]),
+        ):
+            Message.objects.create(
+                parent_log=chat_log, channel=channel, timestamp=timestamp,
+                emote_ids=emote_ids, emote_counts=emote_counts,
+            )
+
+        sums = get_emote_sums(channel.id, "2024-01-01", "2024-01-31")
+        self.assertEqual(sums, [
+            {"id": "k", "name": "KEKW", "value": 5},
+            {"id": "o", "name": "OMEGALUL", "value": 1},
+        ])
+
+
+class DeleteChatDataTestCase(ApiTestCase):
+    def test_delete_chat_files(self):
+        channel = Channel.objects.create(name="delete")
+        deleted = self.create_chat_file(channel, b"Deleted file.")
+        kept = self.create_chat_file(channel, b"Kept file.")
+        ensure_message_partitions("2024-01-01T00:00:00Z", "2024-02-01T00:00:00Z")
+        for chat_log, timestamp in (
+            (deleted, "2024-01-01 00:00:00"),
+            (deleted, "2024-01-02 00:00:00"),
+            (deleted, "2024-02-01 00:00:00"),
+            (kept, "2024-02-02 00:00:00"),
+        ):
+            Message.objects.create(parent_log=chat_log, channel=channel, timestamp=timestamp)
+        path = deleted.file.name
+
+        progress = []
+        self.assertEqual(delete_chat_files([deleted.id], lambda *args: progress.append(args)), 3)
+
+        self.assertEqual(progress[-1], (3, 3))
+        self.assertEqual(list(Message.objects.values_list("parent_log", flat=True)), [kept.id])
+        self.assertNotIn(date(2024, 1, 1), list_month_partitions())
+        self.assertFalse(ChatFile.objects.filter(id=deleted.id).exists())
+        self.assertFalse(default_storage.exists(path))
+
+    @mock.patch("api.scripts.delete_chat_data.DELETE_BATCH_SIZE", 1)
+    def test_rollups_match_after_interrupted_delete(self):
+        channel = Channel.objects.create(name="interrupted")
+        chat_log = self.ingest_log(
+            channel,
+            "# Start logging at 2024-05-10 12:00:00",
+            "[12:00:01] bob: one",
+            "[12:00:02] bob: two",
+            "[12:00:03] bob: three",
+        )
+        # A message of another file keeps the month's partition from being dropped whole
+        self.ingest_log(channel, "# Start logging at 2024-05-10 12:00:00", "[12:00:04] alice: kept")
+
+        # The second batch fails, after the first was deleted
+        batches = []
+
+        def subtract_first_batch(ids):
+            if batches:
+                raise RuntimeError("Interrupted")
+            batches.append(ids)
+            remove_messages_from_rollups(ids)
+
+        with mock.patch(
+            "api.scripts.delete_chat_data.remove_messages_from_rollups", subtract_first_batch
+        ):
+            with self.assertRaises(RuntimeError):
+                delete_chat_files([chat_log.id])
+        self.assertEqual(Message.objects.filter(parent_log=chat_log).count(), 2)
+        self.assertEqual(MessageHourRollup.objects.get(channel=channel).message_count, 3)
+
+    def test_collect_orphaned_media(self):
+        chat_log = self.create_chat_file(Channel.objects.create(name="media"), b"Referenced file.")
+        orphan = default_storage.save("media/chat/orphan.txt", ContentFile(b"Orphan"))
+        self.addCleanup(default_storage.delete, orphan)
+
+        self.assertEqual(collect_orphaned_media(min_age=0), 1)
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertTrue(default_storage.exists(chat_log.file.name))
+
+
+class PartitionTestCase(ApiTestCase):
+    def count_rows(self, table: str) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
+            return cursor.fetchone()[0]
+
+    def test_partitions_recreated_after_drop(self):
+        chat_log = self.create_chat_file(Channel.objects.create(name="partitions"), b"Partitions.")
+        # Rows of a month without a partition wait in the DEFAULT partition
+        Message.objects.create(parent_log=chat_log, timestamp="2030-03-10 00:00:00")
+        self.assertEqual(self.count_rows("api_message_default"), 1)
+
+        ensure_message_partitions("2030-03-01T00:00:00Z", "2030-04-15T00:00:00Z")
+        self.assertTrue({date(2030, 3, 1), date(2030, 4, 1)} <= set(list_month_partitions()))
+        self.assertEqual(self.count_rows("api_message_y2030m03"), 1)
+        self.assertEqual(self.count_rows("api_message_default"), 0)
+
+        # A month dropped since, here as by another process, is created again
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE "api_message_y2030m03"')
+        ensure_message_partitions("2030-03-10T00:00:00Z", "2030-03-10T00:00:00Z")
+        Message.objects.create(parent_log=chat_log, timestamp="2030-03-10 00:00:00")
+        self.assertEqual(self.count_rows("api_message_y2030m03"), 1)
+
+        drop_month_partitions(date(2030, 3, 1))
+        self.assertNotIn(date(2030, 3, 1), list_month_partitions())
+        self.assertFalse(Message.objects.exists())
+
+    def test_drop_partitions_of_files(self):
+        channel = Channel.objects.create(name="partition_files")
+        deleted, kept = (self.create_chat_file(channel, name.encode()) for name in "dk")
+        ensure_message_partitions("2030-06-01T00:00:00Z", "2030-06-01T00:00:00Z")
+        Message.objects.create(parent_log=deleted, timestamp="2030-06-01 00:00:00")
+        Message.objects.create(parent_log=kept, timestamp="2030-06-02 00:00:00")
+
+        # The partition holds messages of another file, so is kept
+        self.assertIsNone(drop_month_partitions_of_files(date(2030, 6, 1), [deleted.id]))
+        self.assertEqual(Message.objects.count(), 2)
+        self.assertEqual(drop_month_partitions_of_files(date(2030, 6, 1), [deleted.id, kept.id]), 2)
+        self.assertNotIn(date(2030, 6, 1), list_month_partitions())
+        self.assertIsNone(drop_month_partitions_of_files(date(2030, 6, 1), [deleted.id]))
+
+
+class DropMessagePartitionsTestCase(ApiTestCase):
+    def test_derived_data_dropped_with_messages(self):
+        channel = Channel.objects.create(name="dropped")
+        emote_set = EmoteSet.objects.create(name="dropped_set", set_id="dropped_set")
+        emote_set.emotes.add(Emote.objects.create(name="KEKW", emote_id="k"))
+        for day in (10, 11):
+            self.ingest_log(
+                channel,
+                f"# Start logging at 2030-{day - 3:02}-{day} 12:00:00",
+                "[12:00:01] bob: KEKW",
+                emote_set="dropped_set",
+            )
+
+        url = "/api/chat/messages/message_count_aggregate/"
+        params = {"channel": channel.id, "start_date": "2030-07-01", "end_date": "2030-08-31"}
+        self.assertEqual([entry["value"] for entry in Client().get(url, params).json()], [1, 1])
+
+        call_command("drop_message_partitions", "--before", "2030-08", stdout=io.StringIO())
+        for model in (MessageMinuteRollup, MessageHourRollup, EmoteHourRollup, UserSketch):
+            self.assertEqual(
+                [bucket.month for bucket in model.objects.filter(channel=channel)
+                 .values_list("bucket", flat=True)],
+                [8],
+            )
+        # The cached response was invalidated
+        self.assertEqual([entry["value"] for entry in Client().get(url, params).json()], [1])
+
+
+class ChatFileDedupTestCase(ApiTestCase):
+    def test_reupload_returns_existing_file(self):
+        client = Client()
+        content = b"Small test file. (Duplicate)"
+        first = client.post(
+            "/api/chat/files/", {"files": SimpleUploadedFile('test_file_9.txt', content)}
+        )
+        self.addCleanup(os.remove, ChatFile.objects.get().file.path)
+        second = client.post(
+            "/api/chat/files/", {"files": SimpleUploadedFile('test_file_10.txt', content)}
+        )
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()["files"][0]["id"], first.json()["files"][0]["id"])
+        self.assertEqual(ChatFile.objects.get().sha256, hashlib.sha256(content).hexdigest())
+
+
+class MessageFingerprintTestCase(ApiTestCase):
+    def test_overlapping_logs_imported_once(self):
+        channel = Channel.objects.create(name="overlap")
+        self.ingest_log(
+            channel,
+            "# Start logging at 2024-05-10 12:00:00",
+            "[12:00:01] bob: W",
+            "[12:00:01] bob: W",
+            "[12:00:02] alice: hi",
+        )
+        self.assertEqual(Message.objects.count(), 3)
+
+        rustlog = self.ingest_log(
+            channel,
+            "[2024-05-10 12:00:01] #overlap bob: W",
+            "[2024-05-10 12:00:01] #overlap bob: W",
+            "[2024-05-10 12:00:02] #overlap alice: hi",
+            "[2024-05-10 12:00:03] #overlap alice: bye",
+            format_str="Rustlog",
+        )
+        self.assertEqual(
+            list(Message.objects.filter(parent_log=rustlog).values_list("message", flat=True)),
+            ["bye"],
+        )
+
+    def test_deleting_overlapping_log_keeps_shared_messages(self):
+        channel = Channel.objects.create(name="overlap")
+        chatterino = self.ingest_log(
+            channel,
+            "# Start logging at 2024-05-10 12:00:00",
+            "[12:00:01] bob: W",
+            "[12:00:01] bob: W",
+            "[12:00:02] alice: hi",
+            "[12:00:02] alice: only here",
+        )
+        rustlog = self.ingest_log(
+            channel,
+            "[2024-05-10 12:00:01] #overlap bob: W",
+            "[2024-05-10 12:00:01] #overlap bob: W",
+            "[2024-05-10 12:00:02] #overlap alice: hi",
+            "[2024-05-10 12:00:03] #overlap alice: bye",
+            format_str="Rustlog",
+        )
+
+        self.assertEqual(delete_chat_files([chatterino.id]), 1)
+        self.assertEqual(
+            sorted(Message.objects.filter(parent_log=rustlog).values_list("message", flat=True)),
+            ["W", "W", "bye", "hi"],
+        )
+        self.assertEqual(Message.objects.count(), 4)
+        self.assertEqual(
+            sum(MessageMinuteRollup.objects.values_list("message_count", flat=True)), 4
+        )
+        self.assertFalse(MessageCopy.objects.exists())
+
+    def test_shared_message_in_daylight_saving_gap_kept(self):
+        channel = Channel.objects.create(name="overlap")
+        # 02:30 doesn't exist on 2024-03-10 in the database time zone
+        chatterino = self.ingest_log(
+            channel, "# Start logging at 2024-03-10 02:00:00", "[02:30:00] bob: W"
+        )
+        rustlog = self.ingest_log(
+            channel, "[2024-03-10 02:30:00] #overlap bob: W", format_str="Rustlog"
+        )
+        self.assertEqual(MessageCopy.objects.filter(chat_file=rustlog).count(), 1)
+
+        self.assertEqual(delete_chat_files([chatterino.id]), 0)
+        self.assertEqual(Message.objects.filter(parent_log=rustlog).count(), 1)
+
+
+class ChunkedUploadTestCase(ApiTestCase):
+    content = b"[12:00:01] bob: W\n" * 100
+
+    def start_upload(self):
+        """Start an upload of the content, returning a function to send chunks."""
+        response = Client().post("/api/chat/uploads/", {
+            "filename": "chunked.log",
+            "size": len(self.content),
+            "sha256": hashlib.sha256(self.content).hexdigest(),
+        })
+        self.assertEqual(response.status_code, 201)
+        upload = ChunkedUpload.objects.get(upload_id=response.json()["upload_id"])
+        self.addCleanup(default_storage.delete, upload.part_name)
+        # Names reserved by completions rolled back with the test are left in storage
+        self.addCleanup(lambda: [
+            default_storage.delete(f"media/chat/{stored}")
+            for stored in default_storage.listdir("media/chat")[1]
+            if stored.startswith("chunked")
+        ])
+
+        def send(offset, chunk):
+            return Client().patch(
+                f"/api/chat/uploads/{upload.upload_id}/", chunk,
+                content_type="application/offset+octet-stream",
+                headers={"Upload-Offset": str(offset)},
+            )
+        return upload, send
+
+    def test_resumable_upload(self):
+        client = Client()
+        content = self.content
+        upload, send = self.start_upload()
+        url = f"/api/chat/uploads/{upload.upload_id}/"
+
+        self.assertEqual(send(0, content[:1000]).json()["offset"], 1000)
+        self.assertEqual(client.get(url).json()["offset"], 1000)
+        self.assertEqual(send(0, content[:1000]).status_code, 409)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = send(1000, content[1000:])
+        self.assertEqual(response.status_code, 201)
+        chat_file = ChatFile.objects.get(id=response.json()["file"]["id"])
+        self.addCleanup(os.remove, chat_file.file.path)
+        with chat_file.file.open("rb") as file:
+            self.assertEqual(file.read(), content)
+
+    def test_completion_retried(self):
+        upload, send = self.start_upload()
+        # Completion failing rolls back, leaving the file in place for an empty chunk
+        with mock.patch(
+            "api.views.upload_views.ChatFileSerializer", side_effect=RuntimeError
+        ), self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                send(0, self.content)
+        self.assertFalse(ChatFile.objects.exists())
+        self.assertEqual(ChunkedUpload.objects.get(id=upload.id).offset, len(self.content))
+        self.assertTrue(default_storage.exists(upload.part_name))
+
+        # So does failing to move the file into place once the ChatFile is committed
+        with mock.patch(
+            "api.views.upload_views.os.replace", side_effect=OSError
+        ), self.assertRaises(OSError):
+            with self.captureOnCommitCallbacks(execute=True):
+                send(len(self.content), b"")
+        self.assertFalse(ChatFile.objects.exists())
+        self.assertTrue(default_storage.exists(upload.part_name))
+
+        self.assertEqual(send(len(self.content), self.content[-1:]).status_code, 409)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = send(len(self.content), b"")
+        self.assertEqual(response.status_code, 201)
+        chat_file = ChatFile.objects.get(id=response.json()["file"]["id"])
+        self.addCleanup(os.remove, chat_file.file.path)
+        with chat_file.file.open("rb") as file:
+            self.assertEqual(file.read(), self.content)
+        self.assertFalse(default_storage.exists(upload.part_name))
+        self.assertEqual(send(len(self.content), b"").status_code, 409)
+
+    def test_concurrent_completion_reuses_file(self):
+        existing = self.create_chat_file(Channel.objects.create(name="uploads"), self.content)
+        existing.sha256 = hashlib.sha256(self.content).hexdigest()
+        existing.save()
+        upload, send = self.start_upload()
+        # The other upload is stored after this one checked for it
+        with mock.patch.object(
+            ChatFile.objects, "filter", return_value=ChatFile.objects.none()
+        ), self.captureOnCommitCallbacks(execute=True):
+            response = send(0, self.content)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["file"]["id"], existing.id)
+        self.assertFalse(default_storage.exists(upload.part_name))
+
+
+class IngestLogsTestCase(ApiTestCase):
+    def test_formats_and_channels_from_paths(self):
+        with tempfile.TemporaryDirectory() as root:
+            logs = {
+                os.path.join("alpha", "alpha-2024-05-10.log"):
+                    "# Start logging at 2024-05-10 12:00:00\n[12:00:01] bob: W\n",
+                os.path.join("beta", "2024", "5", "10.log"):
+                    "[2024-05-10 12:00:01] #beta bob: W\n",
+                "notes.txt": "Not a log\n",
+            }
+            for name, content in logs.items():
+                os.makedirs(os.path.dirname(os.path.join(root, name)), exist_ok=True)
+                with open(os.path.join(root, name), "w", encoding="UTF-8") as log_file:
+                    log_file.write(content)
+
+            found = {
+                os.path.relpath(path, root): (detect_log_format(path), get_channel_name(path, base))
+                for path, base in find_log_files(root)
+            }
+
+        self.assertEqual(found, {
+            os.path.join("alpha", "alpha-2024-05-10.log"): ("Chatterino", "alpha"),
+            os.path.join("beta", "2024", "5", "10.log"): ("Rustlog", "beta"),
+            "notes.txt": (None, None),
+        })
+
+    def write_log(self, name: str, content: str) -> str:
+        """Write a log file to a temporary directory, removing its stored copies after the test."""
+        root = tempfile.mkdtemp()
+        path = os.path.join(root, name)
+        with open(path, "w", encoding="UTF-8") as log_file:
+            log_file.write(content)
+        stem = os.path.splitext(name)[0]
+        self.addCleanup(lambda: [
+            default_storage.delete(f"media/chat/{stored}")
+            for stored in default_storage.listdir("media/chat")[1]
+            if stored.startswith(stem)
+        ])
+        self.addCleanup(lambda: os.remove(path) or os.rmdir(root))
+        return path
+
+    def test_failed_ingest_is_retried(self):
+        channel = Channel.objects.create(name="alpha")
+        path = self.write_log(
+            "ingest-retry.log", "# Start logging at 2024-05-10 12:00:00\n[12:00:01] bob: W\n"
+        )
+        options = {"sentiment": False, "emote_set": "", "filter_emotes": False, "min_words": 0}
+
+        with mock.patch(
+            "api.management.commands.ingest_logs.preprocess_log", side_effect=ValueError
+        ):
+            with self.assertRaises(ValueError):
+                ingest_log_file(path, "Chatterino", channel.id, options)
+        self.assertFalse(ChatFile.objects.exists())
+
+        _, count, _ = ingest_log_file(path, "Chatterino", channel.id, options)
+        self.assertEqual(count, 1)
+        self.assertTrue(ChatFile.objects.get().is_preprocessed)
+
+    def test_identical_file_stored_concurrently(self):
+        channel = Channel.objects.create(name="alpha")
+        path = self.write_log(
+            "ingest-race.log", "# Start logging at 2024-05-10 12:00:00\n[12:00:01] bob: W\n"
+        )
+        with open(path, "rb") as log_file:
+            sha256 = hashlib.sha256(log_file.read()).hexdigest()
+        stored = self.create_chat_file(channel, b"Stored first")
+        ChatFile.objects.filter(id=stored.id).update(sha256=sha256)
+        options = {"sentiment": False, "emote_set": "", "filter_emotes": False, "min_words": 0}
+
+        # The other worker stores its copy between this one's check and insert
+        with mock.patch("django.db.models.query.QuerySet.exists", return_value=False):
+            result = ingest_log_file(path, "Chatterino", channel.id, options)
+
+        self.assertEqual(result[1], None)
+        self.assertEqual(list(ChatFile.objects.values_list("id", flat=True)), [stored.id])
+        self.assertFalse(Message.objects.exists())
+
+
+class MessageRollupTestCase(ApiTestCase):
+    def test_rollups_follow_ingest_and_deletion(self):
+        channel = Channel.objects.create(name="rollup")
+        log = [
+            "# Start logging at 2024-05-10 12:00:00",
+            "[12:00:01] bob: W",
+            "[12:30:00] alice: hi",
+            "[13:00:00] bob: bye",
+        ]
+        # The second file only holds messages already imported, so adds nothing
+        chat_logs = [self.ingest_log(channel, *log) for _ in range(2)]
+
+        counts = dict(
+            MessageHourRollup.objects.filter(channel=channel).values_list("bucket__hour", "message_count")
+        )
+        self.assertEqual(counts, {12: 2, 13: 1})
+
+        response = Client().get("/api/chat/messages/message_count_aggregate/", {
+            "channel": channel.id, "start_date": "2024-05-10T00:00:00",
+            "end_date": "2024-05-10T00:00:00", "granularity": "hour",
+        })
+        self.assertEqual([entry["value"] for entry in response.json()], [2, 1])
+
+        delete_chat_files([chat_log.id for chat_log in chat_logs])
+        self.assertFalse(
+            MessageHourRollup.objects.filter(channel=channel, message_count__gt=0).exists()
+        )
+
+
+class UserSketchTestCase(ApiTestCase):
+    def test_estimates_within_error_bound(self):
+        sketches = [build_sketch(range(start, start + 30000)) for start in (0, 20000)]
+        # Five standard errors, so the test can't fail by chance
+        self.assertAlmostEqual(
+            estimate(merge_sketches(sketches)) / 50000, 1, delta=5 * STANDARD_ERROR
+        )
+        self.assertEqual(estimate(build_sketch([])), 0)
+
+    def test_approximate_unique_users(self):
+        channel = Channel.objects.create(name="sketch")
+        first = self.ingest_log(
+            channel,
+            "# Start logging at 2024-05-10 12:00:00",
+            "[12:00:01] bob: hi",
+            "[12:30:00] alice: hi",
+        )
+        self.ingest_log(channel, "# Start logging at 2024-05-11 13:00:00", "[13:00:00] bob: bye")
+        self.assertEqual(UserSketch.objects.filter(channel=channel).count(), 2)
+
+        params = {
+            "channel": channel.id, "start_date": "2024-05-10T00:00:00",
+            "end_date": "2024-05-11T00:00:00", "approximate": "true",
+        }
+        response = Client().get("/api/chat/messages/unique_users/", params)
+        self.assertEqual(response.json(), {"value": 2})
+        response = Client().get("/api/chat/messages/unique_users_aggregate/", params)
+        self.assertEqual([entry["value"] for entry in response.json()], [2, 1])
+
+        # Deleting a file rebuilds the sketches of its hours from the remaining messages
+        delete_chat_files([first.id])
+        response = Client().get("/api/chat/messages/unique_users/", params)
+        self.assertEqual(response.json(), {"value": 1})
+
+    def test_sketches_across_daylight_saving_change(self):
+        channel = Channel.objects.create(name="dst")
+        # 02:00 doesn't exist on 2024-03-10 in the database time zone, so it is
+        # stored as 03:00, and its chatters join that hour's
+        hours = [datetime(2024, 3, 10, hour) for hour in range(6)]
+        add_to_user_sketches(channel.id, {hour: set(range(50 * (index + 1)))
+                                          for index, hour in enumerate(hours)})
+
+        def estimates():
+            return {
+                sketch.bucket.hour: estimate(to_sketch(sketch.registers))
+                for sketch in UserSketch.objects.filter(channel=channel)
+            }
+        expected = {0: 50, 1: 100, 3: 200, 4: 250, 5: 300}
+        found = estimates()
+        self.assertEqual(found.keys(), expected.keys())
+        for hour, value in found.items():
+            self.assertAlmostEqual(value / expected[hour], 1, delta=5 * STANDARD_ERROR)
+
+        # Rebuilding from messages across the change gives the same buckets
+        UserSketch.objects.filter(channel=channel).delete()
+        self.ingest_log(
+            channel,
+            "# Start logging at 2024-03-10 01:00:00",
+            "[01:30:00] bob: hi",
+            "[02:30:00] alice: hi",
+            "[03:30:00] carol: hi",
+        )
+        self.assertEqual(estimates(), {1: 1, 3: 2})
+        rebuild_user_sketches((channel.id, hour) for hour in hours[1:4])
+        self.assertEqual(estimates(), {1: 1, 3: 2})
+
+
+class AnalyticsCacheTestCase(ApiTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_until_ingest(self):
+        channel = Channel.objects.create(name="cached")
+        params = {"channel": channel.id, "start_date": "2024-05-10", "end_date": "2024-05-10"}
+        url = "/api/chat/messages/message_count/"
+        self.assertEqual(Client().get(url, params).json(), {"value": 0})
+        # Equivalent parameters are served from the cache, without a query
+        with self.assertNumQueries(0):
+            response = Client().get(url, {**params, "start_date": "2024-05-10T00:00:00"})
+        self.assertEqual(response.json(), {"value": 0})
+
+        chat_log = self.ingest_log(
+            channel, "# Start logging at 2024-05-10 12:00:00", "[12:00:01] bob: hi"
+        )
+        self.assertEqual(Client().get(url, params).json(), {"value": 1})
+
+        delete_chat_files([chat_log.id])
+        self.assertEqual(Client().get(url, params).json(), {"value": 0})
+
+
+class DashboardMetricsTestCase(ApiTestCase):
+    def test_matches_separate_endpoints(self):
+        channel = Channel.objects.create(name="dashboard")
+        emote_set = EmoteSet.objects.create(name="dashboard_set", set_id="dashboard_set")
+        emote_set.emotes.add(
+            Emote.objects.create(name="KEKW", emote_id="k"),
+            Emote.objects.create(name="Pog", emote_id="p"),
+        )
+        self.ingest_log(
+            channel,
+            "# Start logging at 2024-05-10 12:00:00",
+            "[12:00:01] bob: hi KEKW KEKW",
+            "[12:30:00] alice: hi Pog",
+            "[13:00:00] bob: bye KEKW",
+            emote_set="dashboard_set",
+        )
+
+        params = {
+            "channel": channel.id, "start_date": "2024-05-10", "end_date": "2024-05-10",
+            "granularity": "hour",
+        }
+        response = Client().get(
+            "/api/chat/messages/dashboard_metrics/", {**params, "metrics": "count,users,cumulative"}
+        )
+        data = response.json()
+        self.assertEqual(list(data), ["count", "users", "cumulative"])
+        for metric, endpoint in [
+            ("count", "message_count_aggregate"),
+            ("users", "unique_users_aggregate"),
+            ("cumulative", "message_count_cumulative"),
+        ]:
+            expected = Client().get(f"/api/chat/messages/{endpoint}/", params).json()
+            self.assertEqual(data[metric], expected)
+
+        # Transforms apply before the running sum, as on message_count_cumulative
+        transformed = {**params, "granularity": "minute", "transform": "fill_gaps,moving_avg:2"}
+        response = Client().get(
+            "/api/chat/messages/dashboard_metrics/", {**transformed, "metrics": "cumulative"}
+        )
+        self.assertEqual(
+            response.json()["cumulative"],
+            Client().get("/api/chat/messages/message_count_cumulative/", transformed).json(),
+        )
+
+        response = Client().get(
+            "/api/chat/messages/dashboard_metrics/", {**params, "metrics": "emotes", "limit": 1}
+        )
+        self.assertEqual([emote["name"] for emote in response.json()["emotes"]], ["KEKW"])
+        self.assertEqual(
+            response.json()["emotes"],
+            Client().get(
+                "/api/chat/messages/popular_emotes_aggregate/", {**params, "limit": 1}
+            ).json(),
+        )
+
+        response = Client().get(
+            "/api/chat/messages/dashboard_metrics/", {**params, "metrics": "count,votes"}
+        )
+        self.assertEqual(response.status_code, 400)
+        for channel_id in [None, "dashboard"]:
+            response = Client().get(
+                "/api/chat/messages/dashboard_metrics/",
+                {key: value for key, value in {**params, "channel": channel_id}.items()
+                 if value is not None},
+            )
+            self.assertEqual(response.status_code, 400)
+
+
+class TransformTestCase(ApiTestCase):
+    def test_transform_pipeline(self):
+        data = [
+            {"date": "2024-01-01T00:00:00", "value": 1},
+            {"date": "2024-01-03T00:00:00", "value": 3},
+            {"date": "2024-01-04T00:00:00", "value": None},
+        ]
+        transformed = apply_transforms(data, parse_transforms("fill_gaps,moving_avg:2,cumsum"))
+        self.assertEqual(
+            [(entry["date"][:10], entry["value"]) for entry in transformed],
+            [("2024-01-01", 1), ("2024-01-02", 1.5), ("2024-01-03", 3), ("2024-01-04", 4.5)],
+        )
+        self.assertEqual(
+            [entry["value"] for entry in apply_transforms(data, parse_transforms("normalize"))],
+            [-1, 1, None],
+        )
+        for spec in ["smooth", "moving_avg", "moving_avg:0", "cumsum:2"]:
+            with self.assertRaises(ValueError):
+                parse_transforms(spec)
+
+        response = Client().get(
+            "/api/chat/messages/message_count_aggregate/", {"transform": "moving_avg:x"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_downsample_keeps_extremes(self):
+        data = [
+            {"date": f"2024-01-01T{minute // 60:02d}:{minute % 60:02d}:00", "value": minute % 10}
+            for minute in range(1000)
+        ]
+        data[567]["value"] = 100
+        downsampled = apply_transforms(data, [], "minute", parse_max_points("50"))
+        self.assertLessEqual(len(downsampled), 50)
+        self.assertEqual(max(entry["value"] for entry in downsampled), 100)
+        self.assertEqual(min(entry["value"] for entry in downsampled), 0)
+        self.assertEqual(downsampled, sorted(downsampled, key=lambda entry: entry["date"]))
+        with self.assertRaises(ValueError):
+            parse_max_points("1")
+
+
+class ColumnarRendererTestCase(ApiTestCase):
+    def test_columns(self):
+        regular = [
+            {"date": "2024-01-01T00:00:00", "value": 1},
+            {"date": "2024-01-02T00:00:00", "value": None},
+        ]
+        self.assertEqual(
+            to_columns(regular), {"start": 1704067200000, "step": 86400000, "values": [1, None]}
+        )
+        irregular = [*regular, {"date": "2024-01-04T00:00:00", "value": 3}]
+        self.assertEqual(to_columns(irregular)["dates"][2], 1704326400000)
+        self.assertEqual(to_columns({"value": 1}), {"value": 1})
+
+    def test_content_negotiation(self):
+        url = "/api/chat/messages/message_count_aggregate/"
+        response = Client().get(url, HTTP_ACCEPT="application/vnd.channellogs.columnar+json")
+        self.assertEqual(
+            response.json(), {"start": None, "step": None, "dates": [], "values": []}
+        )
+        response = Client().get(url, {"format": "msgpack"})
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content)["values"], [])
+        self.assertEqual(Client().get(url).json(), [])
+
+    def test_nested_series(self):
+        channel = Channel.objects.create(name="columns")
+        emote_set = EmoteSet.objects.create(name="columns_set", set_id="columns_set")
+        emote_set.emotes.add(Emote.objects.create(name="KEKW", emote_id="k"))
+        self.ingest_log(
+            channel,
+            "# Start logging at 2024-05-10 12:00:00",
+            "[12:00:01] bob: KEKW",
+            "[13:00:00] alice: KEKW KEKW",
+            emote_set="columns_set",
+        )
+        params = {
+            "channel": channel.id, "start_date": "2024-05-10", "end_date": "2024-05-10",
+            "granularity": "hour",
+        }
+        columns = {"start": 1715342400000, "step": 3600000}
+
+        # The default dashboard mixes series with the emotes, which each have a series
+        response = Client().get(
+            "/api/chat/messages/dashboard_metrics/", {**params, "format": "columnar"}
+        )
+        data = response.json()
+        self.assertEqual(data["count"], {**columns, "values": [1, 1]})
+        self.assertEqual(data["cumulative"], {**columns, "values": [1, 2]})
+        self.assertEqual(data["emotes"][0]["series"], {**columns, "values": [1, 2]})
+
+        response = Client().get(
+            "/api/chat/messages/popular_emotes_aggregate/", {**params, "format": "msgpack"}
+        )
+        emotes = msgpack.unpackb(response.content)
+        self.assertEqual((emotes[0]["name"], emotes[0]["value"]), ("KEKW", 3))
+        self.assertEqual(emotes[0]["series"], {**columns, "values": [1, 2]})
+
+
+class EmoteRollupTestCase(ApiTestCase):
+    def test_emote_series_follow_ingest_and_deletion(self):
+        channel = Channel.objects.create(name="emote_rollup")
+        emote_set = EmoteSet.objects.create(name="rollup_set", set_id="rollup_set")
+        emote_set.emotes.add(
+            Emote.objects.create(name="KEKW", emote_id="k"),
+            Emote.objects.create(name="Pog", emote_id="p"),
+        )
+        chat_log = self.ingest_log(
+            channel,
+            "# Start logging at 2024-05-10 12:00:00",
+            "[12:00:01] bob: KEKW KEKW Pog",
+            "[13:00:00] alice: KEKW",
+            "[13:30:00] alice: Pog",
+            emote_set="rollup_set",
+        )
+
+        url = "/api/chat/messages/popular_emotes_aggregate/"
+        params = {
+            "channel": channel.id, "start_date": "2024-05-10", "end_date": "2024-05-10",
+            "granularity": "hour", "limit": 1,
+        }
+        # The rollups (hour granularity) and the messages (minute granularity) agree
+        for granularity, dates in [("hour", ["12:00", "13:00"]), ("minute", ["12:00", "13:00"])]:
+            response = Client().get(url, {**params, "granularity": granularity})
+            self.assertEqual(
+                [(emote["id"], emote["value"]) for emote in response.json()], [("k", 3)]
+            )
+            self.assertEqual(
+                [(entry["date"][11:16], entry["value"]) for entry in response.json()[0]["series"]],
+                list(zip(dates, [2, 1])),
+            )
+        self.assertEqual(Client().get(url, {**params, "limit": 0}).status_code, 400)
+
+        delete_chat_files([chat_log.id])
+        self.assertEqual(Client().get(url, params).json(), [])
+
+
+class MessagePaginationTestCase(ApiTestCase):
+    def test_cursor_pages(self):
+        channel = Channel.objects.create(name="keyset")
+        self.ingest_log(
+            channel,
+            "# Start logging at 2024-05-10 12:00:00",
+            "[12:00:01] bob: one",
+            "[12:00:02] alice: two",
+            "[12:00:02] carol: three",
+            "[12:00:02] dave: four",
+            "[12:00:03] bob: five",
+        )
+
+        url = "/api/chat/messages/"
+        pages = [Client().get(url, {"channel": channel.id, "page_size": 2}).json()]
+        while pages[-1]["next"]:
+            pages.append(Client().get(pages[-1]["next"]).json())
+        self.assertEqual(
+            [[message["message"] for message in page["results"]] for page in pages],
+            [["one", "two"], ["three", "four"], ["five"]],
+        )
+        self.assertEqual(pages[0]["count"], 5)
+        self.assertIsNone(pages[0]["previous"])
+
+        # Going back from the last page gives the same pages
+        previous = Client().get(pages[-1]["previous"]).json()
+        self.assertEqual(previous["results"], pages[1]["results"])
+        previous = Client().get(previous["previous"]).json()
+        self.assertEqual(previous["results"], pages[0]["results"])
+        self.assertIsNone(previous["previous"])
+
+        newest = Client().get(url, {"channel": channel.id, "page_size": 2, "ordering": "-timestamp"})
+        self.assertEqual([message["message"] for message in newest.json()["results"]], ["five", "four"])
+        self.assertEqual(Client().get(url, {"cursor": "bogus"}).status_code, 404)
+
+    def test_page_query_count(self):
+        channel = Channel.objects.create(name="lean")
+        chat_log = self.ingest_log(
+            channel,
+            "# Start logging at 2024-05-10 12:00:00",
+            *(f"[12:00:{second:02}] user{second}: hi {second}" for second in range(50)),
+        )
+
+        # The estimated count and the page, however many messages and chatters
+        with self.assertNumQueries(2):
+            response = Client().get("/api/chat/messages/", {"channel": channel.id, "page_size": 50})
+        message = response.json()["results"][0]
+        self.assertEqual(
+            (message["parent_log"], message["channel"], message["username"], message["message"]),
+            (chat_log.id, channel.id, "user0", "hi 0"),
+        )
+
+
+class MessageSearchTestCase(ApiTestCase):
+    def search(self, **params):
+        response = Client().get("/api/chat/messages/search/", params)
+        return [message["message"] for message in response.json()["results"]]
+
+    def test_ranked_search(self):
+        channel = Channel.objects.create(name="search")
+        with override_settings(DEDUPLICATE_MESSAGE_TEXT=True):
+            chat_log = self.ingest_log(
+                channel,
+                "# Start logging at 2024-05-10 12:00:00",
+                "[12:00:01] bob: hello there",
+                "[12:00:02] alice: hello hello world",
+                "[12:00:03] bob: goodbye world",
+            )
+        Message.objects.create(
+            parent_log=chat_log, channel=channel, timestamp="2024-05-10 12:00:04",
+            chatter=Chatter.objects.get(name="bob"), message="Hello again",
+        )
+
+        self.assertEqual(
+            self.search(channel=channel.id, q="hello"),
+            ["hello hello world", "Hello again", "hello there"],
+        )
+        self.assertEqual(self.search(channel=channel.id, q="hello", username="bob"),
+                         ["Hello again", "hello there"])
+        self.assertEqual(self.search(channel=channel.id, q='"goodbye world" or there'),
+                         ["goodbye world", "hello there"])
+        self.assertEqual(self.search(channel=channel.id, q="world -goodbye"), ["hello hello world"])
+        # Texts past the lookup limit are joined instead, with the same results
+        with mock.patch("api.views.message_views.SEARCH_TEXT_LIMIT", 1):
+            self.assertEqual(
+                self.search(channel=channel.id, q="hello"),
+                ["hello hello world", "Hello again", "hello there"],
+            )
+
+        # Pages follow the ranking
+        first = Client().get(
+            "/api/chat/messages/search/", {"channel": channel.id, "q": "hello", "page_size": 2}
+        ).json()
+        second = Client().get(first["next"]).json()
+        self.assertEqual([message["message"] for message in second["results"]], ["hello there"])
+        self.assertEqual(Client().get("/api/chat/messages/search/").status_code, 400)
+
+
+class MessageExportTestCase(ApiTestCase):
+    def test_export_formats(self):
+        channel = Channel.objects.create(name="export")
+        self.ingest_log(
+            channel,
+            "# Start logging at 2024-05-10 12:00:00",
+            "[12:00:01] bob: hi, there",
+            "[12:00:02] alice: bye",
+        )
+
+        def export(file_format):
+            response = Client().get(
+                "/api/chat/messages/export/", {"channel": channel.id, "file_format": file_format}
+            )
+            self.assertTrue(response.streaming)
+            return b"".join(response.streaming_content)
+
+        expected = [("bob", "hi, there"), ("alice", "bye")]
+        rows = [json.loads(line) for line in export("ndjson").splitlines()]
+        self.assertEqual([(row["username"], row["message"]) for row in rows], expected)
+        self.assertEqual(rows[0]["timestamp"], "2024-05-10T12:00:01")
+        rows = list(csv.DictReader(io.StringIO(export("csv").decode())))
+        self.assertEqual([(row["username"], row["message"]) for row in rows], expected)
+        table = pq.read_table(io.BytesIO(export("parquet")))
+        self.assertEqual(list(zip(table["username"].to_pylist(), table["message"].to_pylist())), expected)
+        self.assertEqual(
+            Client().get("/api/chat/messages/export/", {"channel": channel.id, "file_format": "xls"})
+            .status_code,
+            400,
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "export.ndjson")
+            call_command("export_messages", "Export", "--output", path, stdout=io.StringIO())
+            with open(path, "rb") as exported:
+                self.assertEqual(exported.read(), export("ndjson"))
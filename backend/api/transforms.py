@@ -0,0 +1,205 @@
+'''
+Transforms of aggregated time series, as returned by the aggregate endpoints: lists
+of dictionaries with a 'date' (ISO format) and a 'value' key.
+
+Series are converted to NumPy arrays once, transformed in O(n) each, and converted
+back. Missing values (None) are NaN in between.
+'''
+
+import numpy as np
+
+# Constants
+# NumPy datetime64 unit and step of the periods of each granularity
+PERIOD_UNITS = {
+    "minute": ("m", 1),
+    "hour": ("h", 1),
+    "day": ("D", 1),
+    "week": ("D", 7),
+    "month": ("M", 1),
+}
+
+
+def to_arrays(data: list[dict]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Convert a series to arrays of its dates (datetime64) and values (int64, or
+    float64 with NaN for missing values).
+    """
+    dates = np.array([entry["date"] for entry in data], dtype="datetime64[s]")
+    values = np.asarray([np.nan if entry["value"] is None else entry["value"] for entry in data])
+    if values.dtype == object or not len(values):
+        values = values.astype(np.float64)
+    return dates, values
+
+
+def from_arrays(dates: np.ndarray, values: np.ndarray) -> list[dict]:
+    """Convert arrays of dates and values back to a series."""
+    values = values.astype(object)
+    values[np.isnan(values.astype(np.float64))] = None
+    return [
+        {"date": date, "value": value}
+        for date, value in zip(np.datetime_as_string(dates, unit="s").tolist(), values.tolist())
+    ]
+
+
+def fill_gaps(dates: np.ndarray, values: np.ndarray, granularity: str, fill=0):
+    """
+    Insert the periods missing between the first and last of a series, which had no
+    messages, with a fill value.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The dates and values of every period.
+    """
+    if not len(dates):
+        return dates, values
+    unit, step = PERIOD_UNITS[granularity]
+    periods = dates.astype(f"datetime64[{unit}]")
+    every_period = np.arange(periods[0], periods[-1] + 1, step)
+
+    filled = np.full(len(every_period), fill, dtype=np.result_type(values, fill))
+    filled[np.searchsorted(every_period, periods)] = values
+    return every_period.astype("datetime64[s]"), filled
+
+
+def moving_average(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    Average each value with the ones before it, over a trailing window of a number
+    of periods (fewer at the start of the series). Missing values count as 0.
+    """
+    sums = np.cumsum(np.nan_to_num(values, nan=0.0), dtype=np.float64)
+    sums[period:] = sums[period:] - sums[:-period]
+    return sums / np.minimum(np.arange(1, len(values) + 1), period)
+
+
+def running_sum(values: np.ndarray) -> np.ndarray:
+    """Return the cumulative sum of the values. Missing values count as 0."""
+    if values.dtype.kind == "f":
+        values = np.nan_to_num(values, nan=0.0)
+    return np.cumsum(values)
+
+
+def normalize_values(values: np.ndarray) -> np.ndarray:
+    """
+    Scale the values such that the maximum is 1 and the minimum is -1, or to 0.5 if
+    they are all the same. Missing values are kept missing.
+    """
+    values = values.astype(np.float64)
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return values
+    low, high = values[valid].min(), values[valid].max()
+    if low == high:
+        return np.where(valid, 0.5, np.nan)
+    return 2 * (values - low) / (high - low) - 1
+
+
+def downsample(dates: np.ndarray, values: np.ndarray, max_points: int):
+    """
+    Reduce a series to at most max_points points, keeping its shape: the points are
+    split into max_points // 2 bins of consecutive points, and the lowest and highest
+    point of each bin are kept, in order. Spikes and dips survive, unlike with
+    averaging or striding.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The dates and values of the points kept.
+    """
+    if len(values) <= max_points:
+        return dates, values
+    starts = np.linspace(0, len(values), max_points // 2, endpoint=False).astype(np.intp)
+    sizes = np.diff(np.append(starts, len(values)))
+
+    # Missing values are never a bin's extreme, unless the whole bin is missing
+    floats = values.astype(np.float64)
+    keep = np.zeros(len(values), dtype=bool)
+    for fill, reduce in ((np.inf, np.minimum), (-np.inf, np.maximum)):
+        candidates = np.where(np.isnan(floats), fill, floats)
+        extremes = np.repeat(reduce.reduceat(candidates, starts), sizes)
+        # First index of each bin holding its extreme
+        hits = np.flatnonzero(candidates == extremes)
+        bins = np.repeat(np.arange(len(starts)), sizes)[hits]
+        keep[hits[np.unique(bins, return_index=True)[1]]] = True
+    return dates[keep], values[keep]
+
+
+TRANSFORMS = {
+    "fill_gaps": lambda dates, values, arg, granularity: fill_gaps(
+        dates, values, granularity, 0 if arg is None else arg
+    ),
+    "moving_avg": lambda dates, values, arg, granularity: (
+        dates, moving_average(values, int(arg))
+    ),
+    "cumsum": lambda dates, values, arg, granularity: (dates, running_sum(values)),
+    "normalize": lambda dates, values, arg, granularity: (dates, normalize_values(values)),
+}
+
+
+def parse_transforms(spec: str) -> list[tuple[str, float | None]]:
+    """
+    Parse a transform parameter: comma-separated transforms, applied in order, each
+    optionally followed by an argument after a colon.
+        - fill_gaps[:value]: insert periods without messages, as value (default 0)
+        - moving_avg:period: trailing moving average over a number of periods
+        - cumsum: running sum
+        - normalize: scale to [-1, 1]
+
+    Returns:
+        list[tuple[str, float | None]]: Each transform name and argument.
+
+    Raises:
+        ValueError: If a transform is unknown, or its argument is missing or invalid.
+    """
+    transforms = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, arg_str = item.partition(":")
+        if name not in TRANSFORMS:
+            raise ValueError(f"Unknown transform {name!r}. Choose in {list(TRANSFORMS)}.")
+        try:
+            arg = float(arg_str) if arg_str else None
+        except ValueError as exc:
+            raise ValueError(f"Invalid argument for transform {name!r}.") from exc
+        if name == "moving_avg" and (arg is None or arg < 1 or arg != int(arg)):
+            raise ValueError("moving_avg takes a whole number of periods, as moving_avg:7.")
+        if name in ("cumsum", "normalize") and arg is not None:
+            raise ValueError(f"Transform {name!r} takes no argument.")
+        transforms.append((name, arg))
+    return transforms
+
+
+def parse_max_points(value: str | None) -> int | None:
+    """
+    Parse a max_points parameter, the number of points to downsample a series to.
+
+    Raises:
+        ValueError: If the value isn't a whole number of at least 2.
+    """
+    if not value:
+        return None
+    if not value.isdigit() or int(value) < 2:
+        raise ValueError("max_points must be a whole number of at least 2.")
+    return int(value)
+
+
+def apply_transforms(
+    data: list[dict], transforms, granularity: str = "day", max_points: int = None
+) -> list[dict]:
+    """
+    Apply transforms, as returned by parse_transforms, to a series, then downsample it.
+
+    Args:
+        data (list[dict]): The series, with 'date' and 'value' keys.
+        transforms (list[tuple[str, float | None]]): The transforms to apply in order.
+        granularity (str, optional): The granularity of the series, for fill_gaps.
+            Defaults to 'day'.
+        max_points (int, optional): The maximum number of points to return (see
+            downsample). Defaults to None, keeping every point.
+
+    Returns:
+        list[dict]: The transformed series.
+    """
+    if not transforms and (not max_points or len(data) <= max_points):
+        return data
+    dates, values = to_arrays(data)
+    for name, arg in transforms:
+        dates, values = TRANSFORMS[name](dates, values, arg, granularity)
+    if max_points:
+        dates, values = downsample(dates, values, max_points)
+    return from_arrays(dates, values)
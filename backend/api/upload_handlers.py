@@ -0,0 +1,62 @@
+'''
+Upload handlers computing the SHA-256 of each uploaded file as it streams in, so
+duplicate uploads can be detected without reading the file a second time.
+'''
+
+import hashlib
+
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler,
+    TemporaryFileUploadHandler,
+)
+
+
+class Sha256UploadMixin:
+    """
+    Mixin for an upload handler, setting a 'sha256' attribute (hex digest) on each
+    file it completes.
+    """
+
+    def new_file(self, *args, **kwargs):
+        self.hasher = hashlib.sha256()
+        return super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        # An inactive memory handler passes the file on, to be hashed by the next one
+        if getattr(self, "activated", True):
+            self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.hasher.hexdigest()
+        return file
+
+
+class Sha256MemoryFileUploadHandler(Sha256UploadMixin, MemoryFileUploadHandler):
+    """MemoryFileUploadHandler which also hashes the file."""
+
+
+class Sha256TemporaryFileUploadHandler(Sha256UploadMixin, TemporaryFileUploadHandler):
+    """TemporaryFileUploadHandler which also hashes the file."""
+
+
+def get_sha256(file) -> str:
+    """
+    Return the SHA-256 hex digest of an uploaded file, as computed during upload.
+    Files that weren't received through the handlers above are hashed in chunks.
+
+    Args:
+        file (UploadedFile): The uploaded file.
+
+    Returns:
+        str: The hex digest of the file's contents.
+    """
+    digest = getattr(file, "sha256", None)
+    if digest is None:
+        hasher = hashlib.sha256()
+        for chunk in file.chunks():
+            hasher.update(chunk)
+        digest = hasher.hexdigest()
+    return digest
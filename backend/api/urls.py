@@ -10,11 +10,13 @@ from .views import (
     EmoteSetViewSet,
     EmoteViewSet,
     TaskStatusView,
-    ChannelViewSet
+    ChannelViewSet,
+    ChunkedUploadViewSet,
 )
 
 router = DefaultRouter()
 router.register(r"chat/files", ChatFileViewSet)
+router.register(r"chat/uploads", ChunkedUploadViewSet)
 router.register(r"chat/messages", MessageViewSet)
 router.register(r"chat/emotesets", EmoteSetViewSet)
 router.register(r"chat/emotes", EmoteViewSet)
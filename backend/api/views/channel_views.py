@@ -2,15 +2,45 @@
 Module for Channel-related views.
 '''
 
-from rest_framework import viewsets
-from ..models import Channel
+from rest_framework import status, viewsets
+from rest_framework.request import HttpRequest
+from rest_framework.response import Response
+from ..models import Channel, Task, get_default_channel
 from ..serializers import ChannelSerializer
+from ..tasks import delete_channel_task
 
 
 class ChannelViewSet(viewsets.ModelViewSet):
     '''
     Standard viewset for Channel objects.
-    No custom actions are defined
+    Deletion runs as a task, as it moves the channel's messages to the default channel.
     '''
     queryset = Channel.objects.all()
     serializer_class = ChannelSerializer
+
+    def destroy(self, request: HttpRequest, *args, **kwargs):
+        """
+        Create a task deleting the Channel, and return the associated ticket number.
+
+        Arguments:
+            request -- HttpRequest object
+        Returns:
+            Response object with status code 200 OK, containing 'message' and
+            'ticket' fields
+        """
+        channel = self.get_object()
+        if channel == get_default_channel():
+            return Response(
+                {"error": "The default channel can't be deleted."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        task = Task.objects.create(status="PENDING")
+        delete_channel_task.delay(task.ticket, channel.id)
+        return Response(
+            {
+                "message": "Successfully enqueued channel for deletion",
+                "ticket": str(task.ticket),
+            },
+            status=status.HTTP_200_OK,
+        )
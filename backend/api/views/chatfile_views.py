@@ -5,17 +5,27 @@ Module for all ChatFile views
 import json
 
 import requests
+from django.db import IntegrityError, transaction
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.request import HttpRequest
 from rest_framework.response import Response
 
 from ..common import parse_dates
-
+from ..http_client import fetch_json
 
 from ..models import Channel, ChatFile, Task
 from ..serializers import ChatFileSerializer
-from ..tasks import get_rustlog_task, preprocess_task
+from ..tasks import (
+    delete_chat_files_task,
+    get_rustlog_task,
+    move_chat_file_task,
+    preprocess_task,
+)
+from ..upload_handlers import get_sha256
+
+# Constants
+RUSTLOG_CHANNELS_CACHE_TTL = 10 * 60
 
 
 class ChatFileViewSet(viewsets.ModelViewSet):
@@ -35,8 +45,16 @@ class ChatFileViewSet(viewsets.ModelViewSet):
             )
 
         file_objs = []
+        created = False
 
         for file in files:
+            # A re-uploaded file returns the existing record, rather than a copy
+            sha256 = get_sha256(file)
+            existing = ChatFile.objects.filter(sha256=sha256).first()
+            if existing:
+                file_objs.append(self.get_serializer(existing).data)
+                continue
+
             # Prepare the data for each file
             chat_log_data = {
                 "file": file,
@@ -49,40 +67,97 @@ class ChatFileViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(data=chat_log_data)
             serializer.is_valid(raise_exception=True)
 
-            self.perform_create(serializer)
+            try:
+                with transaction.atomic():
+                    serializer.save(sha256=sha256)
+            except IntegrityError:
+                # The same file was uploaded concurrently and stored first. The copy
+                # saved to storage is removed by collect_orphaned_media.
+                existing = ChatFile.objects.get(sha256=sha256)
+                file_objs.append(self.get_serializer(existing).data)
+                continue
             file_objs.append(serializer.data)
+            created = True
 
         headers = self.get_success_headers(file_objs[0]) if file_objs else {}
         return Response(
-            {"files": file_objs}, status=status.HTTP_201_CREATED, headers=headers
+            {"files": file_objs},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+            headers=headers,
         )
 
     def partial_update(self, request, *args, **kwargs):
+        """
+        Create a task moving the ChatFile and its messages to another channel, and
+        return the associated ticket number.
+
+        Arguments:
+            request -- HttpRequest object containing the following fields:
+                - channel: str, a JSON object with the 'id' of the channel
+
+        Returns:
+            Response object with status code 200 OK, containing 'message' and
+            'ticket' fields
+        """
         ref_instance = self.get_object()
 
-        channel = dict(request.POST)
-        formatted = {"channel": json.loads(channel["channel"][0])}
+        try:
+            channel_id = json.loads(request.POST.get("channel"))["id"]
+            channel = Channel.objects.get(id=channel_id)
+        except (TypeError, ValueError, KeyError, Channel.DoesNotExist):
+            return Response(
+                {"error": "Channel not found"}, status=status.HTTP_400_BAD_REQUEST
+            )
 
-        ref_instance.channel = Channel.objects.get(id=formatted["channel"]["id"])
-        ref_instance.save()
+        # Messages are moved in batches by Celery, rather than within the request
+        task = Task.objects.create(status="PENDING")
+        move_chat_file_task.delay(task.ticket, ref_instance.id, channel.id)
+        return Response(
+            {
+                "message": "Successfully enqueued file for moving",
+                "ticket": str(task.ticket),
+            },
+            status=status.HTTP_200_OK,
+        )
 
-        ref_serializer = self.get_serializer()
+    def destroy(self, request: HttpRequest, *args, **kwargs):
+        """
+        Create a task deleting the ChatFile and its messages, and return
+        the associated ticket number.
 
-        headers = self.get_success_headers(ref_serializer.data)
-        return Response(ref_serializer.data, status=status.HTTP_200_OK, headers=headers)
+        Arguments:
+            request -- HttpRequest object
+        Returns:
+            Response object with status code 200 OK, containing 'message' and
+            'ticket' fields
+        """
+        return self._dispatch_delete([self.get_object().id])
 
     @action(detail=False, methods=["delete"])
     def delete_all(self, request: HttpRequest):
         """
-        Deletes all rows from the ChatFile table.
+        Create a task deleting all rows from the ChatFile table, and return
+        the associated ticket number.
 
         Arguments:
             request -- HttpRequest object
         Returns:
-            Response object with status code 200 OK
+            Response object with status code 200 OK, containing 'message' and
+            'ticket' fields
         """
-        ChatFile.objects.all().delete()
-        return Response(status=status.HTTP_200_OK)
+        return self._dispatch_delete(list(ChatFile.objects.values_list("id", flat=True)))
+
+    def _dispatch_delete(self, file_ids: list[int]) -> Response:
+        # Messages are deleted in batches by Celery, rather than within the request
+        task = Task.objects.create(status="PENDING")
+        delete_chat_files_task.delay(task.ticket, file_ids)
+        return Response(
+            {
+                "message": "Successfully enqueued files for deletion",
+                "ticket": str(task.ticket),
+            },
+            status=status.HTTP_200_OK,
+        )
 
     @action(detail=False, methods=["post"])
     def preprocess(self, request: HttpRequest, *args, **kwargs):
@@ -214,19 +289,15 @@ class ChatFileViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Perform the GET request to the channels endpoint
+        # Perform the GET request to the channels endpoint, or serve it from cache
         try:
-            response = requests.get(f"{repo_url}/channels", timeout=3)
+            data = fetch_json(f"{repo_url}/channels", ttl=RUSTLOG_CHANNELS_CACHE_TTL)
         except requests.RequestException:
             # Handle exceptions from the requests library (e.g., connection errors)
             return Response(
                 {"error": "could not connect to repo_url"},
                 status=status.HTTP_404_NOT_FOUND,
             )
-
-        # Parse the JSON response
-        try:
-            data = response.json()
         except ValueError:
             return Response(
                 {"error": "Invalid JSON response"},
@@ -234,4 +305,4 @@ class ChatFileViewSet(viewsets.ModelViewSet):
             )
 
         # Return the JSON data or an empty dictionary if no data
-        return Response({"data": data})
+        return Response({"data": data or {}})
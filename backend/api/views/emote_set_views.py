@@ -2,14 +2,14 @@
 Module for the EmoteSetViewSet class / EmoteSet views
 '''
 
-import requests
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from ..models import EmoteSet, Task
+from ..scripts import fetch_emote_set
 from ..serializers import EmoteSetSerializer
-from ..tasks import build_emote_set_task
+from ..tasks import build_emote_set_task, sync_emote_set_task
 
 
 class EmoteSetViewSet(viewsets.ModelViewSet):
@@ -45,6 +45,27 @@ class EmoteSetViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK,
         )
 
+    @action(detail=True, methods=["post"])
+    def sync(self, request, *args, **kwargs):
+        """
+        Custom action to enqueue a sync of this emote set with 7TV,
+        adding and removing only the emotes that changed.
+        """
+        emote_set = self.get_object()
+
+        # Create a new task
+        task = Task.objects.create(status="PENDING")
+
+        sync_emote_set_task.delay(emote_set.set_id, task.ticket)
+
+        return Response(
+            {
+                "message": "Successfully enqueued emote set sync",
+                "ticket": str(task.ticket),
+            },
+            status=status.HTTP_200_OK,
+        )
+
     @action(detail=False, methods=["delete"])
     def delete_all(self, request, *args, **kwargs):
         """
@@ -59,8 +80,9 @@ class EmoteSetViewSet(viewsets.ModelViewSet):
 def get_url_metadata(set_id):
     """
     Get the data from the API endpoint.
+    The response is cached, so the build task can reuse it.
     """
-    response = requests.get(f"http://7tv.io/v3/emote-sets/{set_id}", timeout=3)
-    if response.status_code != 200:
+    try:
+        return fetch_emote_set(set_id, use_cache=True)
+    except ConnectionError:
         return {}
-    return response.json()
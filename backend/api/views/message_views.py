@@ -2,17 +2,78 @@
 Module for Message views.
 '''
 
+import json
+from base64 import b64decode, b64encode
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs, urlencode
+
 import numpy as np
-from django.db.models import Count, Sum, Avg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import (
+    Avg,
+    Count,
+    DateTimeField,
+    ExpressionWrapper,
+    FloatField,
+    Q,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Cast, NullIf
+from django.http import StreamingHttpResponse
 from django_filters import rest_framework as filters
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
+from ..analytics_cache import cached_analytics
 from ..common import GRANULARITY, parse_dates
-from ..models import ChatFile, Message, MessageEmote
-from ..serializers import MessageSerializer
+from ..export import EXPORT_FORMATS, export_messages
+from ..models import (
+    SEARCH_CONFIG,
+    EmoteHourRollup,
+    Message,
+    MessageHourRollup,
+    MessageMinuteRollup,
+    MessageText,
+    UserSketch,
+)
+from ..renderers import ColumnarJSONRenderer, MsgpackRenderer
+from ..serializers import MessageListSerializer, MessageSerializer
+from ..sketches import REGISTERS, estimate, to_sketch
+from ..transforms import apply_transforms, parse_max_points, parse_transforms
+
+# Constants
+# Rollup models, coarsest first, with their bucket size and the granularities they serve
+ROLLUPS = [
+    (MessageHourRollup, timedelta(hours=1), {"hour", "day", "week", "month"}),
+    (MessageMinuteRollup, timedelta(minutes=1), {"minute", "hour", "day", "week", "month"}),
+]
+SENTIMENT_ROLLUP_AVG = ExpressionWrapper(
+    Sum("sentiment_sum") / NullIf(Sum("sentiment_count"), 0), output_field=FloatField()
+)
+# Aggregates of the dashboard metrics over messages, and over rollup rows where possible.
+# The cumulative count is derived from the count. Emotes are ranked and bucketed apart,
+# as by popular_emotes_aggregate.
+DASHBOARD_METRICS = {
+    "count": Count("id"),
+    "users": Count("chatter", distinct=True),
+    "sentiment": Avg("sentiment_score"),
+}
+DASHBOARD_ROLLUP_METRICS = {
+    "count": Sum("message_count"),
+    "sentiment": SENTIMENT_ROLLUP_AVG,
+}
+DASHBOARD_DERIVED_METRICS = {"cumulative": "count"}
+DEFAULT_EMOTE_LIMIT = 10
+MAX_EMOTE_LIMIT = 100
+# Most matching MessageTexts a search looks up in advance, rather than joining them
+SEARCH_TEXT_LIMIT = 1000
 
 
 # Common Functions
@@ -29,33 +90,7 @@ def calculate_moving_average(data, period):
             key (str) and a 'value' key (int) representing the
             moving average at that date.
     """
-    values = [entry["value"] for entry in data]
-    dates = [entry["date"] for entry in data]
-
-    # Ensure all values are numbers and handle None
-    values = [
-        0 if v is None else v for v in values
-    ]  # Replace None with 0 or use another default value
-
-    # Compute the moving average
-    moving_averages = []
-    for i in range(len(values)):
-        start = max(0, i - period + 1)
-        window = values[start : i + 1]
-        if window:
-            moving_avg = np.mean(window)
-        else:
-            moving_avg = 0
-        moving_averages.append(moving_avg)
-
-    # Include the moving averages in the result
-    return [
-        {
-            "date": dates[i],
-            "value": moving_averages[i],
-        }
-        for i in range(len(dates))
-    ]
+    return apply_transforms(data, [("moving_avg", period)])
 
 
 def calculate_running_sum(data):
@@ -71,15 +106,7 @@ def calculate_running_sum(data):
             key (str) and a 'value' key (float or int) representing the
             cumulative sum up to that date.
     """
-    running_total = 0
-    result = []
-
-    for entry in data:
-        if entry["value"]:
-            running_total += entry["value"]
-        result.append({"date": entry["date"], "value": running_total})
-
-    return result
+    return apply_transforms(data, [("cumsum", None)])
 
 
 def normalize(data):
@@ -99,43 +126,63 @@ def normalize(data):
             each dictionary contains a 'date' key (str) and a 'value' key
             (float or None).
     """
-    if data:
-        # Filter out entries with None values
-        valid_entries = [x["value"] for x in data if x["value"] is not None]
-
-        if not valid_entries:
-            # If no valid entries, return the original data with None values preserved
-            return [{"date": entry["date"], "value": None} for entry in data]
+    return apply_transforms(data, [("normalize", None)])
 
-        min_value = min(valid_entries)
-        max_value = max(valid_entries)
 
-        # Handle the case where all valid values are the same
-        if min_value == max_value:
-            return [
-                {
-                    "date": entry["date"],
-                    "value": 0.5 if entry["value"] is not None else None,
-                }
-                for entry in data
-            ]
-
-        # Scale values to range [-1, 1]
-        def scale(value):
-            return 2 * (value - min_value) / (max_value - min_value) - 1
+def get_emote_totals(
+    channel, start_date, end_date, limit=None, use_rollups=False
+) -> list[tuple]:
+    """
+    Sum the uses of each emote in a channel within a date range.
 
-        return [
-            {
-                "date": entry["date"],
-                "value": scale(entry["value"]) if entry["value"] is not None else None,
-            }
-            for entry in data
-        ]
+    Args:
+        channel (Channel): The channel for which to sum emote uses.
+        start_date (datetime): The start date of the date range.
+        end_date (datetime): The end date of the date range.
+        limit (int, optional): The number of emotes to return. Defaults to None, for all.
+        use_rollups (bool, optional): Whether to sum the emote rollups instead of the
+            messages, if the range starts and ends on hour boundaries. Defaults to False.
 
-    return []
+    Returns:
+        list[tuple]: The primary key, 7TV ID, name and uses of each emote, most used first.
+    """
+    if use_rollups and get_rollup_model(start_date, end_date, "hour") is MessageHourRollup:
+        # Buckets emptied by deletions are kept, but have no uses to report
+        totals = (
+            EmoteHourRollup.objects.filter(
+                bucket__range=[start_date, end_date], channel=channel, count__gt=0
+            )
+            .values_list("emote_id", "emote__emote_id", "emote__name")
+            .annotate(total=Sum("count"))
+            .order_by("-total", "emote_id")
+        )
+        return list(totals[:limit] if limit else totals)
+
+    # Unnest the parallel emote arrays of the Channel's messages in the date range,
+    # and sum counts per emote
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT emote.id, emote.emote_id, emote.name, SUM(used.count) AS total_count
+            FROM api_message message
+            CROSS JOIN LATERAL unnest(message.emote_ids, message.emote_counts)
+                AS used(emote_pk, count)
+            JOIN api_emote emote ON emote.id = used.emote_pk
+            WHERE message.channel_id = %s
+                AND message.timestamp BETWEEN %s AND %s
+                AND message.emote_ids IS NOT NULL
+            GROUP BY emote.id
+            ORDER BY total_count DESC, emote.id
+            LIMIT %s
+            """,
+            [channel, start_date, end_date, limit],
+        )
+        return cursor.fetchall()
 
 
-def get_emote_sums(channel, start_date, end_date) -> list[dict]:
+def get_emote_sums(
+    channel, start_date, end_date, limit=None, use_rollups=False
+) -> list[dict]:
     """
     Retrieve the sum of emote counts for a given channel within a specified date range.
 
@@ -143,6 +190,9 @@ def get_emote_sums(channel, start_date, end_date) -> list[dict]:
         channel (Channel): The channel object for which to retrieve emote counts.
         start_date (datetime): The start date of the date range.
         end_date (datetime): The end date of the date range.
+        limit (int, optional): The number of emotes to return. Defaults to None, for all.
+        use_rollups (bool, optional): Whether to sum the emote rollups when possible
+            (see get_emote_totals). Defaults to False.
 
     Returns:
         list: A list of dictionaries, where each dictionary contains the following keys:
@@ -151,36 +201,191 @@ def get_emote_sums(channel, start_date, end_date) -> list[dict]:
             - 'value' (int): The total count of the emote within the specified date range.
         The list is sorted in descending order by the 'value' key.
     """
-    # Filter messages between the two timestamps
-    channel_logs = ChatFile.objects.filter(channel=channel)
+    return [
+        {"id": emote_id, "name": name, "value": total_count}
+        for _, emote_id, name, total_count in get_emote_totals(
+            channel, start_date, end_date, limit, use_rollups
+        )
+    ]
 
-    # Retrieve Message objects associated with the Channel's ChatFiles in the date range
-    messages = Message.objects.filter(
-        parent_log__in=channel_logs, timestamp__range=[start_date, end_date]
-    )
 
-    # Retrieve MessageEmote objects associated with the filtered messages,
-    # and sum counts
-    emote_occurrences = (
-        MessageEmote.objects.filter(message__in=messages)
-        .values("emote__name", "emote__emote_id")
-        .annotate(total_count=Sum("count"))
-        .order_by("-total_count")
-    )
+def get_emote_series(channel, start_date, end_date, granularity, emote_pks) -> dict:
+    """
+    Sum the uses of emotes in a channel per period within a date range, from the
+    emote rollups when they fit the range and granularity, else from the messages.
 
-    # Convert the result to a dictionary for easier usage
-    emote_count_by_name = [
+    Returns:
+        dict: The series of each emote primary key, as lists of dictionaries with
+            'date' and 'value' keys. Periods without uses are left out.
+    """
+    series = {pk: [] for pk in emote_pks}
+    if get_rollup_model(start_date, end_date, granularity) is MessageHourRollup:
+        rows = (
+            EmoteHourRollup.objects.filter(
+                bucket__range=[start_date, end_date],
+                channel=channel,
+                emote_id__in=emote_pks,
+                count__gt=0,
+            )
+            .annotate(period=GRANULARITY[granularity]("bucket"))
+            .values_list("emote_id", "period")
+            .annotate(total=Sum("count"))
+            .order_by("emote_id", "period")
+        )
+    else:
+        with connection.cursor() as cursor:
+            # Granularities are date_trunc fields
+            cursor.execute(
+                """
+                SELECT used.emote_pk, date_trunc(%s, message.timestamp), SUM(used.count)
+                FROM api_message message
+                CROSS JOIN LATERAL unnest(message.emote_ids, message.emote_counts)
+                    AS used(emote_pk, count)
+                WHERE message.channel_id = %s
+                    AND message.timestamp BETWEEN %s AND %s
+                    AND message.emote_ids && %s::integer[]
+                    AND used.emote_pk = ANY(%s)
+                GROUP BY 1, 2
+                ORDER BY 1, 2
+                """,
+                [granularity, channel, start_date, end_date, emote_pks, emote_pks],
+            )
+            rows = cursor.fetchall()
+
+    for pk, period, total in rows:
+        series[pk].append({"date": period.isoformat(), "value": total})
+    return series
+
+
+def get_popular_emotes(
+    channel, start_date, end_date, granularity, limit, transforms, max_points
+) -> list[dict]:
+    """
+    Rank the most used emotes of a channel within a date range, with the uses of
+    each emote per period.
+
+    Args:
+        channel (int): The ID of the channel.
+        start_date (datetime): The start date of the date range.
+        end_date (datetime): The end date of the date range.
+        granularity (str): The granularity of the series, a key of GRANULARITY.
+        limit (int): The number of emotes to return.
+        transforms (list[tuple]): The transforms applied to each series
+            (see transforms.parse_transforms).
+        max_points (int | None): The number of points to downsample each series to.
+
+    Returns:
+        list[dict]: The 'id', 'name', total 'value' and 'series' of each emote,
+            most used first.
+    """
+    # Rank emotes over the whole range first, so only the top ones are bucketed
+    totals = get_emote_totals(channel, start_date, end_date, limit, use_rollups=True)
+    series = get_emote_series(
+        channel, start_date, end_date, granularity, [pk for pk, *_ in totals]
+    )
+    return [
         {
-            "id": item["emote__emote_id"],
-            "name": item["emote__name"],
-            "value": item["total_count"],
+            "id": emote_id,
+            "name": name,
+            "value": total,
+            "series": apply_transforms(series[pk], transforms, granularity, max_points),
         }
-        for item in emote_occurrences
+        for pk, emote_id, name, total in totals
     ]
-    return sorted(emote_count_by_name, key=lambda x: x["value"], reverse=True)
 
 
-def aggregate_data(request, aggregate_func, response_key, do_normalize=False) -> Response:
+def parse_limit(value: str | None, default: int | None) -> int | None:
+    """
+    Parse a limit parameter, a number of emotes to return, up to MAX_EMOTE_LIMIT.
+
+    Raises:
+        ValueError: If the value isn't a whole number between 1 and MAX_EMOTE_LIMIT.
+    """
+    if not value:
+        return default
+    if not value.isdigit() or not 1 <= int(value) <= MAX_EMOTE_LIMIT:
+        raise ValueError(f"limit must be a whole number between 1 and {MAX_EMOTE_LIMIT}.")
+    return int(value)
+
+
+def get_rollup_model(start_date: datetime, end_date: datetime, granularity: str):
+    """
+    Return the coarsest rollup model able to answer an aggregation exactly: its
+    buckets must fit the granularity, and the (inclusive) date range must start
+    and end on bucket boundaries.
+
+    Returns:
+        type[MessageRollup] | None: The rollup model, or None if the messages must be
+            aggregated directly.
+    """
+    def is_aligned(moment, size):
+        midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        return (moment - midnight) % size == timedelta(0)
+
+    for model, size, granularities in ROLLUPS:
+        if (
+            granularity in granularities
+            and is_aligned(start_date, size)
+            and is_aligned(end_date + timedelta(seconds=1), size)
+        ):
+            return model
+    return None
+
+
+def wants_approximate(request) -> bool:
+    """Whether a request opted in to approximate answers, with approximate=true."""
+    return request.query_params.get("approximate", "").lower() == "true"
+
+
+def estimate_unique_users(channel, start_date, end_date, truncate_func=None) -> dict:
+    """
+    Estimate the number of unique chatters of a channel by merging its hourly
+    UserSketches, rather than counting distinct chatters over its messages.
+    Each estimate has a relative standard error of about 1.6% (sketches.STANDARD_ERROR).
+    The (inclusive) date range must start and end on hour boundaries.
+
+    Args:
+        channel (Channel): The channel to estimate unique chatters of.
+        start_date (datetime): The start date of the date range.
+        end_date (datetime): The end date of the date range.
+        truncate_func (function, optional): The truncation of hours to periods, from
+            GRANULARITY. Defaults to None, estimating over the whole range.
+
+    Returns:
+        dict: The estimate of each period (the None key without truncate_func).
+            Periods without messages are left out.
+    """
+    sketches = UserSketch.objects.filter(bucket__range=[start_date, end_date], channel=channel)
+    if truncate_func:
+        sketches = sketches.annotate(period=truncate_func("bucket"))
+    else:
+        sketches = sketches.annotate(period=Value(None, output_field=DateTimeField()))
+
+    merged = {}
+    for period, registers in sketches.values_list("period", "registers").order_by("period"):
+        sketch = merged.setdefault(period, np.zeros(REGISTERS, dtype=np.uint8))
+        np.maximum(sketch, to_sketch(registers), out=sketch)
+    return {period: estimate(sketch) for period, sketch in merged.items()}
+
+
+def estimate_row_count(queryset) -> int:
+    """
+    Return the query planner's estimate of the number of rows of a queryset, which
+    costs a plan rather than a count.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def aggregate_data(
+    request, aggregate_func, response_key, do_normalize=False, rollup_func=None,
+    sketched=False, running_sum=False,
+) -> Response:
     """
     Aggregate message data for a given channel within a specified date range.
 
@@ -189,6 +394,18 @@ def aggregate_data(request, aggregate_func, response_key, do_normalize=False) ->
         aggregate_func (function): The function to use for aggregating the data.
         response_key (str): The key to use for the aggregated value in the response.
         do_normalize (bool, optional): Whether to normalize the aggregated data. Defaults to False.
+        rollup_func (function, optional): The equivalent of aggregate_func over rollup
+            rows. If provided, rollups are aggregated instead of messages when possible.
+        sketched (bool, optional): Whether aggregate_func counts unique chatters, which
+            may then be estimated from UserSketches if the request asks for
+            approximate=true (see estimate_unique_users). Defaults to False.
+        running_sum (bool, optional): Whether to return the running sum of the
+            aggregated data. Defaults to False.
+
+    The request may also carry a transform parameter, a pipeline applied to the
+    aggregated data in order, such as 'fill_gaps,moving_avg:7,cumsum,normalize'
+    (see transforms.parse_transforms), and a max_points parameter, the number of
+    points to downsample the result to (see transforms.downsample).
 
     Returns:
         Response: A Django REST Framework Response object containing the aggregated data.
@@ -198,6 +415,14 @@ def aggregate_data(request, aggregate_func, response_key, do_normalize=False) ->
     end_date_str = request.query_params.get("end_date")
     granularity = request.query_params.get("granularity", "day")  # Default to 'day'
 
+    try:
+        transforms = parse_transforms(request.query_params.get("transform", ""))
+        max_points = parse_max_points(request.query_params.get("max_points"))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if running_sum:
+        transforms.append(("cumsum", None))
+
     try:
         start_date, end_date = parse_dates(start_date_str, end_date_str)
         truncate_func = GRANULARITY.get(granularity)
@@ -209,15 +434,34 @@ def aggregate_data(request, aggregate_func, response_key, do_normalize=False) ->
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    aggregated_data = (
-        Message.objects.filter(
-            timestamp__range=[start_date, end_date], parent_log__channel=channel
+    # Sketches are hourly, so they can answer the requests hour rollups can
+    rollup_model = get_rollup_model(start_date, end_date, granularity)
+    if sketched and wants_approximate(request) and rollup_model is MessageHourRollup:
+        estimates = estimate_unique_users(channel, start_date, end_date, truncate_func)
+        aggregated_data = [
+            {"period": period, "total": total} for period, total in estimates.items()
+        ]
+    elif rollup_func and rollup_model:
+        # Buckets emptied by deletions are kept, but have no messages to report
+        aggregated_data = (
+            rollup_model.objects.filter(
+                bucket__range=[start_date, end_date], channel=channel, message_count__gt=0
+            )
+            .annotate(period=truncate_func("bucket"))
+            .values("period")
+            .annotate(total=rollup_func)
+            .order_by("period")
+        )
+    else:
+        aggregated_data = (
+            Message.objects.filter(
+                timestamp__range=[start_date, end_date], channel=channel
+            )
+            .annotate(period=truncate_func("timestamp"))
+            .values("period")
+            .annotate(total=aggregate_func)
+            .order_by("period")
         )
-        .annotate(period=truncate_func("timestamp"))
-        .values("period")
-        .annotate(total=aggregate_func)
-        .order_by("period")
-    )
 
     formatted_data = [
         {
@@ -229,6 +473,7 @@ def aggregate_data(request, aggregate_func, response_key, do_normalize=False) ->
 
     if do_normalize:
         formatted_data = normalize(formatted_data)
+    formatted_data = apply_transforms(formatted_data, transforms, granularity, max_points)
 
     return Response(formatted_data, status=status.HTTP_200_OK)
 
@@ -237,37 +482,191 @@ def aggregate_data(request, aggregate_func, response_key, do_normalize=False) ->
 class MessageFilter(filters.FilterSet):
     """
     A filter class for the Message model that allows filtering messages
-    by a date range.
+    by channel, user and a date range.
 
     Attributes:
+        channel (filters.NumberFilter): A filter for messages in the channel with the given id.
+        username (filters.CharFilter): A filter for messages sent by the given user.
         start_date (filters.DateTimeFilter): A filter for messages with a
             timestamp greater than or equal to the specified start date.
         end_date (filters.DateTimeFilter): A filter for messages with a
             timestamp less than or equal to the specified end date.
     """
 
+    channel = filters.NumberFilter(field_name="channel")
+    username = filters.CharFilter(field_name="chatter__name")
     start_date = filters.DateTimeFilter(field_name="timestamp", lookup_expr="gte")
     end_date = filters.DateTimeFilter(field_name="timestamp", lookup_expr="lte")
 
     class Meta:
         model = Message
-        fields = ["start_date", "end_date"]
+        fields = ["channel", "username", "start_date", "end_date"]
 
 
-class MessagePagination(PageNumberPagination):
+class MessagePagination(BasePagination):
     """
-    A pagination class for the Message model that allows paginating messages
-    by with a configurable page size.
+    A keyset pagination class for the Message model: pages are found by seeking to
+    the (timestamp, id) of the last message seen, carried in an opaque cursor, so
+    every page costs the same however deep it is. The count is an estimate, from the
+    rollups or the query planner, rather than a count of every message.
+
+    Messages are ordered by timestamp, or by descending timestamp with
+    ordering=-timestamp, then by id.
 
     Attributes:
         page_size (int): The number of items per page.
         page_size_query_param (str): The query parameter for the page size.
         max_page_size (int): The maximum number of items per page.
+        cursor_query_param (str): The query parameter for the cursor.
+        keyset (tuple): The fields ordering the pages, with the type of their values.
     """
 
     page_size = 10  # Number of items per page
     page_size_query_param = "page_size"
     max_page_size = 100  # Maximum number of items per page
+    cursor_query_param = "cursor"
+    keyset = (("timestamp", datetime.fromisoformat), ("id", int))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        self.count = self.get_approximate_count(queryset, request, view)
+
+        # Going back, read the page in reverse from the cursor, then flip it over
+        forward = cursor is None or not cursor[1]
+        ascending = self.is_descending(request) != forward
+        if cursor:
+            queryset = self.seek(queryset, cursor[0], ascending)
+        ordering = [name if ascending else f"-{name}" for name, _ in self.keyset]
+
+        # One extra row tells whether there is a page beyond this one
+        page = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        if not forward:
+            page.reverse()
+
+        self.next_position = self.previous_position = None
+        if page:
+            if has_more or not forward:
+                self.next_position = (self.get_position(page[-1]), False)
+            if cursor is not None and (has_more or forward):
+                self.previous_position = (self.get_position(page[0]), True)
+        elif cursor is not None:
+            # Past either end, only the way back is open
+            if forward:
+                self.previous_position = (cursor[0], True)
+            else:
+                self.next_position = (cursor[0], False)
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.encode_cursor(self.next_position),
+                "previous": self.encode_cursor(self.previous_position),
+                "count": self.count,
+                "results": data,
+            }
+        )
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def is_descending(self, request) -> bool:
+        """Whether the pages run in descending order of the keyset."""
+        return request.query_params.get("ordering", "").startswith("-")
+
+    def get_position(self, item) -> tuple:
+        """Return the values of the keyset fields of an item."""
+        return tuple(getattr(item, name) for name, _ in self.keyset)
+
+    def seek(self, queryset, position: tuple, ascending: bool):
+        """
+        Restrict a queryset to the items strictly after a position, in ascending or
+        descending order of the keyset.
+        """
+        lookup = "gt" if ascending else "lt"
+        # (a, b) > (x, y) is a > x OR (a = x AND b > y), and so on for more fields
+        condition = None
+        for (name, _), value in reversed(list(zip(self.keyset, position))):
+            after = Q(**{f"{name}__{lookup}": value})
+            condition = after if condition is None else after | Q(**{name: value}) & condition
+        # The bound on the leading field lets the index range scan start at the position
+        leading = self.keyset[0][0]
+        return queryset.filter(Q(**{f"{leading}__{lookup}e": position[0]}), condition)
+
+    def decode_cursor(self, request):
+        """
+        Return the (position, reverse) a cursor points to, or None without a cursor.
+
+        Raises:
+            NotFound: If the cursor is invalid.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = parse_qs(b64decode(encoded.encode("ascii")).decode("ascii"))
+            values = json.loads(cursor["p"][0])
+            if len(values) != len(self.keyset):
+                raise ValueError("Wrong number of values")
+            position = tuple(parse(value) for (_, parse), value in zip(self.keyset, values))
+            return position, bool(int(cursor.get("r", ["0"])[0]))
+        except (KeyError, TypeError, ValueError) as exc:
+            raise NotFound("Invalid cursor") from exc
+
+    def encode_cursor(self, cursor) -> str | None:
+        """Return the URL of the page at a (position, reverse) cursor."""
+        if cursor is None:
+            return None
+        position, reverse = cursor
+        values = [value.isoformat() if isinstance(value, datetime) else value for value in position]
+        query = {"p": json.dumps(values)}
+        if reverse:
+            query["r"] = 1
+        encoded = b64encode(urlencode(query).encode("ascii")).decode("ascii")
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, encoded
+        )
+
+    def get_approximate_count(self, queryset, request, view) -> int:
+        """
+        Estimate the number of messages matching the filters: from the minute rollups
+        when only the channel and dates are filtered on, else from the query plan.
+        """
+        filterset = view.filterset_class(request.query_params, queryset=queryset)
+        if filterset.is_valid() and filterset.form.cleaned_data.get("channel") is not None \
+                and not filterset.form.cleaned_data.get("username"):
+            data = filterset.form.cleaned_data
+            rollups = MessageMinuteRollup.objects.filter(channel=int(data["channel"]))
+            if data.get("start_date"):
+                start = data["start_date"].replace(second=0, microsecond=0)
+                rollups = rollups.filter(bucket__gte=start)
+            if data.get("end_date"):
+                rollups = rollups.filter(bucket__lte=data["end_date"])
+            return rollups.aggregate(count=Sum("message_count"))["count"] or 0
+        return estimate_row_count(queryset)
+
+
+class MessageSearchPagination(MessagePagination):
+    """
+    A keyset pagination class for message search results, ordered by descending
+    rank, then by descending timestamp and id. The count is the planner's estimate.
+    """
+
+    keyset = (("rank", float), ("timestamp", datetime.fromisoformat), ("id", int))
+
+    def is_descending(self, request) -> bool:
+        return True
+
+    def get_approximate_count(self, queryset, request, view) -> int:
+        return estimate_row_count(queryset)
 
 
 class MessageViewSet(viewsets.ModelViewSet):
@@ -276,36 +675,157 @@ class MessageViewSet(viewsets.ModelViewSet):
     Attributes:
         queryset (QuerySet): The base queryset for the Message model.
         serializer_class (Serializer): The serializer class for the Message model.
+        list_serializer_class (Serializer): The lean serializer class for lists of
+            messages.
         pagination_class (Pagination): The pagination class for the Message model.
         filter_backends (tuple): The filter backends to be used for filtering the queryset.
         filterset_class (FilterSet): The filterset class for the Message model.
+        renderer_classes (list): The renderers, including compact renderers of time
+            series, chosen with an Accept header or a format query parameter.
         ordering (list): The default ordering for the queryset.
     """
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
+    list_serializer_class = MessageListSerializer
     pagination_class = MessagePagination
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = MessageFilter
+    renderer_classes = [
+        *api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer, MsgpackRenderer
+    ]
     ordering = ["timestamp"]  # Ensure default ordering by timestamp
+
+    def get_serializer_class(self):
+        """
+        Use the lean serializer for lists and search results, which needs no query
+        per message.
+        """
+        if self.action in ("list", "search"):
+            return self.list_serializer_class
+        return super().get_serializer_class()
+
     def get_queryset(self):
         """
         Optionally restricts the returned messages by applying filters and ordering.
+        Messages are paged by (timestamp, id), so only the direction can be chosen,
+        with ordering=timestamp (the default) or ordering=-timestamp.
         """
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related("chatter", "text")
 
-        # Apply ordering
-        ordering = self.request.query_params.get("ordering", None)
-        if ordering:
-            # Allow ordering by specific fields if provided
-            ordering_fields = ordering.split(",")
-            queryset = queryset.order_by(*ordering_fields)
+        if self.request.query_params.get("ordering", "").startswith("-"):
+            queryset = queryset.order_by("-timestamp", "-id")
         else:
-            # Apply default ordering if no ordering parameter is provided
-            queryset = queryset.order_by("timestamp")
+            queryset = queryset.order_by("timestamp", "id")
 
         return queryset
 
     @action(detail=False, methods=["get"])
+    def export(self, request):
+        """
+        Stream every message of a channel within a date range, oldest first, as a file
+        to download. The messages are read and sent a chunk at a time.
+
+        Query Parameters:
+            - channel (int): The ID of the channel to export.
+            - start_date (str, optional): The start date of the date range in YYYY-MM-DD format.
+            - end_date (str, optional): The end date of the date range in YYYY-MM-DD format.
+            - file_format (str, optional): 'ndjson' (the default), 'csv' or 'parquet'.
+
+        Returns:
+            StreamingHttpResponse: The file, with the id, timestamp, username, message,
+                emote_ids, emote_counts and sentiment_score of each message.
+        """
+        channel = request.query_params.get("channel", "")
+        file_format = request.query_params.get("file_format", "ndjson")
+        if not channel.isdigit():
+            return Response(
+                {"error": "A channel ID is required."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"Invalid file_format. Choose in {list(EXPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            start_date, end_date = parse_dates(
+                request.query_params.get("start_date"), request.query_params.get("end_date")
+            )
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        response = StreamingHttpResponse(
+            export_messages(int(channel), start_date, end_date, file_format),
+            content_type=EXPORT_FORMATS[file_format][1],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="messages_{channel}.{file_format}"'
+        )
+        return response
+
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """
+        Search messages for words, with the channel, date range and username filters
+        of the message list. Words match whole (see models.SEARCH_CONFIG), in web
+        search syntax: "quoted phrases", or, and -excluded words.
+
+        Query Parameters:
+            - q (str): The words to search for.
+            - channel (int, optional): The ID of the channel to search.
+            - start_date (str, optional): The start date of the date range.
+            - end_date (str, optional): The end date of the date range.
+            - username (str, optional): The name of the chatter to search.
+            - page_size (int, optional): The number of messages per page, up to 100.
+            - cursor (str, optional): The cursor of the page, from a next or previous link.
+
+        Returns:
+            Response: A page of matching messages, as for the message list, each with a
+                'rank' (float) of relevance. Messages are ordered by descending rank,
+                then newest first.
+        """
+        terms = request.query_params.get("q", "").strip()
+        if not terms:
+            return Response(
+                {"error": "Missing search terms (q)."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Messages hold their text themselves, or share a deduplicated MessageText
+        query = SearchQuery(terms, config=SEARCH_CONFIG, search_type="websearch")
+        # Matching texts are looked up first, so both conditions can use their index.
+        # Texts are shared across channels, so common words may match too many to
+        # list; those are joined in the query instead.
+        texts = (
+            MessageText.objects.annotate(vector=SearchVector("text", config=SEARCH_CONFIG))
+            .filter(vector=query)
+            .values_list("id", flat=True)
+        )
+        text_ids = list(texts[:SEARCH_TEXT_LIMIT + 1])
+        condition = Q(vector=query)
+        if len(text_ids) > SEARCH_TEXT_LIMIT:
+            condition |= Q(text__in=texts)
+        elif text_ids:
+            condition |= Q(text__in=text_ids)
+        # The rank is cast to double precision, so it comes back exact for the cursor
+        rank = SearchRank(SearchVector("message", "text__text", config=SEARCH_CONFIG), query)
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .annotate(vector=SearchVector("message", config=SEARCH_CONFIG))
+            .filter(condition)
+            .annotate(rank=Cast(rank, FloatField()))
+        )
+
+        paginator = MessageSearchPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        data = self.get_serializer(page, many=True).data
+        for message, item in zip(page, data):
+            item["rank"] = message.rank
+        return paginator.get_paginated_response(data)
+
+    @action(detail=False, methods=["get"])
+    @cached_analytics
     def message_count_aggregate(self, request):
         """
         Retrieve the aggregated message counts for a given channel within a specified date range.
@@ -317,6 +837,10 @@ class MessageViewSet(viewsets.ModelViewSet):
             - granularity (str, optional): The granularity of the aggregation
               (e.g., 'day', 'week', 'month').
                 Defaults to 'day'.
+            - transform (str, optional): A pipeline of transforms applied to the
+              result, such as 'fill_gaps,moving_avg:7' (see transforms.parse_transforms).
+            - max_points (int, optional): The number of points to downsample the
+              result to, keeping the lowest and highest of each bin of points.
 
         Returns:
             Response: A Django REST Framework Response object containing a list of dictionaries,
@@ -327,9 +851,10 @@ class MessageViewSet(viewsets.ModelViewSet):
             The aggregated data is normalized such that the maximum value is 1 and the
             minimum value is -1.
         """
-        return aggregate_data(request, Count("id"), "value")
+        return aggregate_data(request, Count("id"), "value", rollup_func=Sum("message_count"))
 
     @action(detail=False, methods=["get"])
+    @cached_analytics
     def message_count_cumulative(self, request):
         """
         Retrieve the running sum of message counts for a given channel within a specified
@@ -342,6 +867,11 @@ class MessageViewSet(viewsets.ModelViewSet):
             - end_date (str): The end date of the date range in YYYY-MM-DD format.
             - granularity (str, optional): The granularity of the aggregation 
               (e.g., 'day', 'week', 'month'). Defaults to 'day'.
+            - transform (str, optional): A pipeline of transforms applied to the message
+              counts before their running sum, such as 'fill_gaps'
+              (see transforms.parse_transforms).
+            - max_points (int, optional): The number of points to downsample the
+              running sum to, keeping the lowest and highest of each bin of points.
 
         Returns:
             Response: A Django REST Framework Response object containing a list of dictionaries,
@@ -350,11 +880,12 @@ class MessageViewSet(viewsets.ModelViewSet):
                 - 'total_messages' (int): The running sum of message counts up to the specified
                    date or period.
         """
-        response = aggregate_data(request, Count("id"), "value")
-        data = response.data
-        return Response(calculate_running_sum(data), status=status.HTTP_200_OK)
+        return aggregate_data(
+            request, Count("id"), "value", rollup_func=Sum("message_count"), running_sum=True
+        )
 
     @action(detail=False, methods=["get"])
+    @cached_analytics
     def message_count(self, request):
         """
         Retrieve the total count of messages for a given channel within a specified date range.
@@ -387,12 +918,13 @@ class MessageViewSet(viewsets.ModelViewSet):
             )
         # Filter messages within the given date range
         message_count = Message.objects.filter(
-            timestamp__range=[start_date, end_date], parent_log__channel=channel
+            timestamp__range=[start_date, end_date], channel=channel
         ).count()
 
         return Response({"value": message_count}, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["get"])
+    @cached_analytics
     def unique_users(self, request):
         """
         Retrieve the number of unique users who sent messages in a channel within 
@@ -402,6 +934,9 @@ class MessageViewSet(viewsets.ModelViewSet):
             - channel (str): The name of the channel for which to retrieve the message count.
             - start_date (str): The start date of the date range in YYYY-MM-DD format.
             - end_date (str): The end date of the date range in YYYY-MM-DD format.
+            - approximate (str, optional): 'true' to estimate the count from hourly
+              HyperLogLog sketches, within a relative standard error of about 1.6%,
+              instead of counting distinct chatters over the messages.
 
         Returns:
             Response: A Django REST Framework Response object containing a dictionary
@@ -425,19 +960,25 @@ class MessageViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        # Estimate from the hourly sketches if asked to and the range allows it
+        if wants_approximate(request) and get_rollup_model(
+            start_date, end_date, "hour"
+        ) is MessageHourRollup:
+            unique_users = estimate_unique_users(channel, start_date, end_date).get(None, 0)
+            return Response({"value": unique_users}, status=status.HTTP_200_OK)
+
         # Find the number of distinct users who sent messages within the given date range
         unique_users = (
             Message.objects.filter(
-                timestamp__range=[start_date, end_date], parent_log__channel=channel
+                timestamp__range=[start_date, end_date], channel=channel
             )
-            .values("username")
-            .distinct()
-            .aggregate(count=Count("username"))["count"]
+            .aggregate(count=Count("chatter", distinct=True))["count"]
         )
 
         return Response({"value": unique_users}, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["get"])
+    @cached_analytics
     def unique_users_aggregate(self, request):
         """
         Retrieve the aggregated unique users for a given channel within a specified date range.
@@ -449,6 +990,13 @@ class MessageViewSet(viewsets.ModelViewSet):
             - granularity (str, optional): The granularity of the aggregation
               (e.g., 'day', 'week', 'month').
                 Defaults to 'day'.
+            - transform (str, optional): A pipeline of transforms applied to the
+              result, such as 'fill_gaps,moving_avg:7' (see transforms.parse_transforms).
+            - max_points (int, optional): The number of points to downsample the
+              result to, keeping the lowest and highest of each bin of points.
+            - approximate (str, optional): 'true' to estimate each period's count from
+              hourly HyperLogLog sketches, within a relative standard error of about
+              1.6%. Ignored for the 'minute' granularity, which is always exact.
 
         Returns:
             Response: A Django REST Framework Response object containing a list of dictionaries,
@@ -459,9 +1007,12 @@ class MessageViewSet(viewsets.ModelViewSet):
             The aggregated data is normalized such that the maximum value is 1 and the
             minimum value is -1.
         """
-        return aggregate_data(request, Count("username", distinct=True), "value")
+        return aggregate_data(
+            request, Count("chatter", distinct=True), "value", sketched=True
+        )
 
     @action(detail=False, methods=["get"])
+    @cached_analytics
     def popular_emotes(self, request):
         """
         Retrieve the most popular emotes for a given channel within a specified date range.
@@ -470,6 +1021,8 @@ class MessageViewSet(viewsets.ModelViewSet):
             - channel (str): The name of the channel for which to retrieve emote counts.
             - start_date (str): The start date of the date range in YYYY-MM-DD format.
             - end_date (str): The end date of the date range in YYYY-MM-DD format.
+            - limit (int, optional): The number of emotes to return, up to 100.
+              Defaults to every emote.
 
         Returns:
             Response: A Django REST Framework Response object containing a list of dictionaries,
@@ -484,6 +1037,10 @@ class MessageViewSet(viewsets.ModelViewSet):
         end_date_str = request.query_params.get("end_date")
 
         # Parse parameters
+        try:
+            limit = parse_limit(request.query_params.get("limit"), None)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         try:
             start_date, end_date = parse_dates(start_date_str, end_date_str)
         except ValueError:
@@ -493,10 +1050,200 @@ class MessageViewSet(viewsets.ModelViewSet):
             )
 
         # Query to sum values for each distinct key in 'emotes', and normalize to average at 0.
-        response_data = get_emote_sums(channel, start_date, end_date)
+        response_data = get_emote_sums(channel, start_date, end_date, limit, use_rollups=True)
         return Response(response_data, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["get"])
+    @cached_analytics
+    def popular_emotes_aggregate(self, request):
+        """
+        Retrieve the most popular emotes for a given channel within a specified date range,
+        along with the aggregated uses of each emote per period.
+
+        Query Parameters:
+            - channel (str): The name of the channel for which to retrieve emote counts.
+            - start_date (str): The start date of the date range in YYYY-MM-DD format.
+            - end_date (str): The end date of the date range in YYYY-MM-DD format.
+            - granularity (str, optional): The granularity of the aggregation
+              (e.g., 'day', 'week', 'month'). Defaults to 'day'.
+            - limit (int, optional): The number of emotes to return, up to 100.
+              Defaults to 10.
+            - transform (str, optional): A pipeline of transforms applied to each
+              series, such as 'fill_gaps,moving_avg:7' (see transforms.parse_transforms).
+            - max_points (int, optional): The number of points to downsample each
+              series to, keeping the lowest and highest of each bin of points.
+
+        Returns:
+            Response: A Django REST Framework Response object containing a list of dictionaries,
+                where each dictionary contains the following keys:
+                - 'id' (str): The ID of the emote.
+                - 'name' (str): The name of the emote.
+                - 'value' (int): The total count of the emote within the specified date range.
+                - 'series' (list): Dictionaries with 'date' and 'value' keys, the uses of the
+                  emote in each period.
+            The list is sorted in descending order by the 'value' key.
+        """
+        channel = request.query_params.get("channel")
+        start_date_str = request.query_params.get("start_date")
+        end_date_str = request.query_params.get("end_date")
+        granularity = request.query_params.get("granularity", "day")
+
+        try:
+            limit = parse_limit(request.query_params.get("limit"), DEFAULT_EMOTE_LIMIT)
+            transforms = parse_transforms(request.query_params.get("transform", ""))
+            max_points = parse_max_points(request.query_params.get("max_points"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if granularity not in GRANULARITY:
+            return Response(
+                {"error": f"Invalid granularity. Choose in {list(GRANULARITY)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            start_date, end_date = parse_dates(start_date_str, end_date_str)
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        response_data = get_popular_emotes(
+            channel, start_date, end_date, granularity, limit, transforms, max_points
+        )
+        return Response(response_data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"])
+    @cached_analytics
+    def dashboard_metrics(self, request):
+        """
+        Retrieve several aggregated metrics for a given channel within a specified date
+        range at once, computed in a single grouped pass over the messages.
+
+        Query Parameters:
+            - channel (int): The ID of the channel for which to aggregate metrics.
+            - start_date (str): The start date of the date range in YYYY-MM-DD format.
+            - end_date (str): The end date of the date range in YYYY-MM-DD format.
+            - granularity (str, optional): The granularity of the aggregation
+              (e.g., 'day', 'week', 'month'). Defaults to 'day'.
+            - metrics (str, optional): Comma-separated metrics among 'count', 'users',
+              'sentiment', 'cumulative' and 'emotes'. Defaults to all of them.
+            - limit (int, optional): The number of emotes of the 'emotes' metric, up
+              to 100. Defaults to 10.
+            - transform (str, optional): A pipeline of transforms applied to every
+              metric, such as 'fill_gaps,moving_avg:7' (see transforms.parse_transforms).
+            - max_points (int, optional): The number of points to downsample every
+              metric to, keeping the lowest and highest of each bin of points.
+
+        Returns:
+            Response: A Django REST Framework Response object containing a dictionary
+                mapping each requested metric to its data, as returned by its own
+                endpoint. The 'emotes' metric is a list of the most used emotes, as
+                returned by popular_emotes_aggregate. The others are lists of
+                dictionaries with the following keys:
+                - 'date' (str): The date or period for which the metric is aggregated.
+                - 'value': The message count ('count'), the number of unique users
+                  ('users'), the average sentiment score, normalized to [-1, 1]
+                  ('sentiment'), or the running sum of message counts ('cumulative').
+        """
+        channel = request.query_params.get("channel", "")
+        start_date_str = request.query_params.get("start_date")
+        end_date_str = request.query_params.get("end_date")
+        granularity = request.query_params.get("granularity", "day")
+        metrics_str = request.query_params.get("metrics")
+
+        if not channel.isdigit():
+            return Response(
+                {"error": "A channel ID is required."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = parse_limit(request.query_params.get("limit"), DEFAULT_EMOTE_LIMIT)
+            transforms = parse_transforms(request.query_params.get("transform", ""))
+            max_points = parse_max_points(request.query_params.get("max_points"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        available = [*DASHBOARD_METRICS, *DASHBOARD_DERIVED_METRICS, "emotes"]
+        metrics = metrics_str.split(",") if metrics_str else available
+        if not set(metrics).issubset(available):
+            return Response(
+                {"error": f"Invalid metrics. Choose in {available}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        truncate_func = GRANULARITY.get(granularity)
+        if not truncate_func:
+            return Response(
+                {"error": f"Invalid granularity. Choose in {list(GRANULARITY)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            start_date, end_date = parse_dates(start_date_str, end_date_str)
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Aggregate every metric in a single pass over the messages, including those
+        # others derive from, but read those the rollups hold from the rollups instead
+        aggregated = {
+            DASHBOARD_DERIVED_METRICS.get(metric, metric) for metric in metrics
+        }.intersection(DASHBOARD_METRICS)
+        rollup_metrics = set()
+        if get_rollup_model(start_date, end_date, granularity):
+            rollup_metrics = aggregated.intersection(DASHBOARD_ROLLUP_METRICS)
+        message_metrics = aggregated - rollup_metrics
+
+        querysets = []
+        if rollup_metrics:
+            querysets.append((
+                get_rollup_model(start_date, end_date, granularity).objects.filter(
+                    bucket__range=[start_date, end_date], channel=channel, message_count__gt=0
+                )
+                .annotate(period=truncate_func("bucket"))
+                .values("period")
+                .annotate(**{metric: DASHBOARD_ROLLUP_METRICS[metric] for metric in rollup_metrics}),
+                rollup_metrics,
+            ))
+        if message_metrics:
+            querysets.append((
+                Message.objects.filter(
+                    timestamp__range=[start_date, end_date], channel=channel
+                )
+                .annotate(period=truncate_func("timestamp"))
+                .values("period")
+                .annotate(**{metric: DASHBOARD_METRICS[metric] for metric in message_metrics}),
+                message_metrics,
+            ))
+
+        # Both querysets cover the same periods: those with messages
+        series = {metric: [] for metric in aggregated}
+        for queryset, names in querysets:
+            for row in queryset.order_by("period"):
+                date = row["period"].isoformat()
+                for metric in names:
+                    series[metric].append({"date": date, "value": row[metric]})
+
+        # Shape each metric as its own endpoint does. The running sum comes after the
+        # requested transforms, as in aggregate_data.
+        if "sentiment" in series:
+            series["sentiment"] = normalize(series["sentiment"])
+        pipelines = {"cumulative": [*transforms, ("cumsum", None)]}
+        if "cumulative" in metrics:
+            series["cumulative"] = series["count"]
+
+        response_data = {}
+        for metric in metrics:
+            if metric == "emotes":
+                response_data[metric] = get_popular_emotes(
+                    channel, start_date, end_date, granularity, limit, transforms, max_points
+                )
+            else:
+                response_data[metric] = apply_transforms(
+                    series[metric], pipelines.get(metric, transforms), granularity, max_points
+                )
+        return Response(response_data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"])
+    @cached_analytics
     def sentiment_aggregate(self, request):
         """
         Retrieve the aggregated sentiment scores per 'period' 
@@ -509,6 +1256,10 @@ class MessageViewSet(viewsets.ModelViewSet):
             - granularity (str, optional): The granularity of the aggregation
               (e.g., 'day', 'week', 'month').
                 Defaults to 'day'.
+            - transform (str, optional): A pipeline of transforms applied to the
+              result, such as 'fill_gaps,moving_avg:7' (see transforms.parse_transforms).
+            - max_points (int, optional): The number of points to downsample the
+              result to, keeping the lowest and highest of each bin of points.
 
         Returns:
             Response: A Django REST Framework Response object containing a list of dictionaries,
@@ -518,4 +1269,6 @@ class MessageViewSet(viewsets.ModelViewSet):
             The aggregated data is normalized such that the maximum value is 1 and the
             minimum value is -1.
         """
-        return aggregate_data(request, Avg("sentiment_score"), "value", True)
+        return aggregate_data(
+            request, Avg("sentiment_score"), "value", True, rollup_func=SENTIMENT_ROLLUP_AVG
+        )
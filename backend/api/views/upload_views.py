@@ -0,0 +1,316 @@
+'''
+Module for resumable, chunked ChatFile uploads.
+
+An upload is started with the file's size and checksum, then its bytes are sent
+in PATCH requests carrying the offset they start at, in an Upload-Offset header.
+An interrupted upload resumes from the offset reported by a GET. If completing the
+upload fails after its last chunk, an empty chunk at its end retries completion.
+'''
+
+import hashlib
+import json
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from rest_framework import status, viewsets
+from rest_framework.request import HttpRequest
+from rest_framework.response import Response
+
+from ..models import Channel, ChatFile, ChunkedUpload, Task
+from ..serializers import ChatFileSerializer
+from ..tasks import preprocess_task
+
+# Constants
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+PREPROCESS_DEFAULTS = {
+    "format": "Chatterino",
+    "useSentiment": False,
+    "useEmotes": False,
+    "emoteSet": "",
+    "filterEmotes": False,
+    "minWords": 0,
+}
+
+
+class ChunkedUploadViewSet(viewsets.GenericViewSet):
+    """
+    View set for resumable uploads. Chunks are appended straight to a partial file
+    in storage, so no request holds more than one chunk, and the ChatFile is
+    created once the last chunk arrives and the checksum matches.
+    """
+
+    queryset = ChunkedUpload.objects.all()
+    lookup_field = "upload_id"
+
+    def create(self, request: HttpRequest, *args, **kwargs):
+        """
+        Start an upload.
+
+        Arguments:
+            request -- HttpRequest object containing the following fields:
+                - filename: str
+                - size: int, the total size of the file in bytes
+                - sha256: str, the hex digest of the whole file
+                - channel: int (optional), the id of the channel of the file
+                - preprocess: dict (optional), preprocessing options, as taken by
+                  the ChatFile preprocess action, to enqueue on completion
+
+        Returns:
+            Response object with status code 201 Created, containing 'upload_id',
+            'offset' and 'size' fields
+        """
+        filename = request.data.get("filename")
+        sha256 = str(request.data.get("sha256", "")).lower()
+        try:
+            size = int(request.data.get("size"))
+        except (TypeError, ValueError):
+            size = 0
+        if not filename or size <= 0 or len(sha256) != 64:
+            return Response(
+                {"error": "filename, size and sha256 are required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        channel = None
+        if request.data.get("channel"):
+            try:
+                channel = Channel.objects.get(id=request.data.get("channel"))
+            except (Channel.DoesNotExist, ValueError):
+                return Response(
+                    {"error": "Channel not found"}, status=status.HTTP_400_BAD_REQUEST
+                )
+
+        preprocess = request.data.get("preprocess")
+        if isinstance(preprocess, str):
+            try:
+                preprocess = json.loads(preprocess)
+            except ValueError:
+                return Response(
+                    {"error": "Invalid preprocess options"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        upload = ChunkedUpload.objects.create(
+            filename=os.path.basename(filename),
+            size=size,
+            sha256=sha256,
+            channel=channel,
+            preprocess=preprocess or None,
+        )
+        default_storage.save(upload.part_name, ContentFile(b""))
+
+        return Response(
+            {"upload_id": str(upload.upload_id), "offset": 0, "size": size},
+            status=status.HTTP_201_CREATED,
+        )
+
+    def retrieve(self, request: HttpRequest, *args, **kwargs):
+        """
+        Return the offset to resume an upload from.
+
+        Returns:
+            Response object with status code 200 OK, containing 'upload_id',
+            'offset', 'size' and 'chat_file' (null until complete) fields
+        """
+        upload = self.get_object()
+        return Response(
+            {
+                "upload_id": str(upload.upload_id),
+                "offset": upload.offset,
+                "size": upload.size,
+                "chat_file": upload.chat_file_id,
+            },
+            headers={"Upload-Offset": str(upload.offset)},
+        )
+
+    def partial_update(self, request: HttpRequest, *args, **kwargs):
+        """
+        Append the request body to an upload, at the offset given in the
+        Upload-Offset header. The upload is completed by its last chunk, or by an
+        empty chunk at its end if completing it failed before.
+
+        Returns:
+            Response object with status code 200 OK and the new 'offset', or 201
+            Created with the 'file' created (and a preprocessing 'ticket', if
+            requested) once complete. A 409 Conflict response carries the current
+            'offset' if the chunk doesn't start there, or the upload is complete.
+        """
+        try:
+            offset = int(request.headers.get("Upload-Offset"))
+            length = int(request.headers.get("Content-Length") or 0)
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "Upload-Offset header is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if length > MAX_CHUNK_SIZE:
+            return Response(
+                {"error": f"Chunks may be at most {MAX_CHUNK_SIZE} bytes"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        with transaction.atomic():
+            # Lock the upload, so concurrent chunks can't interleave
+            upload = self.get_queryset().select_for_update().get(pk=self.get_object().pk)
+            # Every byte arrived, but completing the upload failed: an empty chunk
+            # at the end retries it
+            retry = upload.is_complete and upload.chat_file_id is None and length == 0
+            if (upload.is_complete and not retry) or offset != upload.offset:
+                return Response(
+                    {"error": "Chunk doesn't start at the upload offset", "offset": upload.offset},
+                    status=status.HTTP_409_CONFLICT,
+                    headers={"Upload-Offset": str(upload.offset)},
+                )
+            if offset + length > upload.size:
+                return Response(
+                    {"error": "Chunk exceeds the upload size"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            if not retry:
+                with open(default_storage.path(upload.part_name), "r+b") as part:
+                    # Discard whatever a chunk interrupted before being recorded wrote
+                    part.seek(upload.offset)
+                    part.truncate()
+                    received = 0
+                    while request.stream is not None and received < length:
+                        data = request.stream.read(min(READ_SIZE, length - received))
+                        if not data:
+                            break
+                        part.write(data)
+                        received += len(data)
+
+                upload.offset += received
+                upload.save()
+
+            if not upload.is_complete:
+                return Response(
+                    {"offset": upload.offset}, headers={"Upload-Offset": str(upload.offset)}
+                )
+
+        # Verify the checksum before locking the upload again, so reading the whole
+        # file doesn't block its other requests. A complete upload takes no more
+        # bytes, so the file can't change meanwhile.
+        digest = self._hash_part(upload)
+        with transaction.atomic():
+            upload = self.get_queryset().select_for_update().get(pk=upload.pk)
+            # Complete the upload while it is locked, so retries can't complete it twice
+            if upload.chat_file_id is not None:
+                return Response(
+                    {"error": "Chunk doesn't start at the upload offset", "offset": upload.offset},
+                    status=status.HTTP_409_CONFLICT,
+                    headers={"Upload-Offset": str(upload.offset)},
+                )
+            return self._complete(upload, digest)
+
+    def destroy(self, request: HttpRequest, *args, **kwargs):
+        """
+        Abort an upload, removing the partially received file.
+        """
+        upload = self.get_object()
+        default_storage.delete(upload.part_name)
+        upload.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def _hash_part(self, upload: ChunkedUpload) -> str | None:
+        """
+        Return the SHA-256 hex digest of an upload's partial file, reading it once.
+
+        Returns:
+            str | None: The hex digest, or None if the file is missing.
+        """
+        hasher = hashlib.sha256()
+        try:
+            with open(default_storage.path(upload.part_name), "rb") as part:
+                while data := part.read(READ_SIZE):
+                    hasher.update(data)
+        except FileNotFoundError:
+            return None
+        return hasher.hexdigest()
+
+    def _store_part(self, part_path: str, chat_file: ChatFile, created: bool) -> None:
+        """
+        Move an upload's partial file to the ChatFile created for it, rather than
+        copying it, or remove it if the upload mapped to an existing ChatFile.
+        """
+        if not created:
+            if os.path.isfile(part_path):
+                os.remove(part_path)
+            return
+        try:
+            os.replace(part_path, chat_file.file.path)
+        except OSError:
+            # A record without its file can't be used. Removing it also clears the
+            # upload's chat_file, so an empty chunk retries the completion.
+            chat_file.delete()
+            raise
+
+    def _complete(self, upload: ChunkedUpload, digest: str | None) -> Response:
+        # Runs in the transaction locking the upload, with the digest of the partial
+        # file taken before locking it. The file is only moved once the transaction
+        # commits, so should it fail, the file is still in place for a retry.
+        part_path = default_storage.path(upload.part_name)
+        if digest is None or not default_storage.exists(upload.part_name):
+            upload.delete()
+            return Response(
+                {"error": "The uploaded file was lost, the upload must be restarted"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if digest != upload.sha256:
+            default_storage.delete(upload.part_name)
+            upload.delete()
+            return Response(
+                {"error": "Checksum mismatch, the upload must be restarted"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # A re-uploaded file maps to the existing record, as for plain uploads
+        chat_file = ChatFile.objects.filter(sha256=upload.sha256).first()
+        created = False
+        if not chat_file:
+            # Reserve the name with an empty file until the upload is moved over it.
+            # Left behind by a rollback, it is removed by collect_orphaned_media.
+            name = default_storage.save(
+                f"{ChatFile.file.field.upload_to}/{upload.filename}", ContentFile(b"")
+            )
+            chat_file = ChatFile(file=name, filename=upload.filename, sha256=upload.sha256)
+            if upload.channel:
+                chat_file.channel = upload.channel
+            try:
+                with transaction.atomic():
+                    chat_file.save()
+                created = True
+            except IntegrityError:
+                # The same file was uploaded concurrently and stored first
+                default_storage.delete(name)
+                chat_file = ChatFile.objects.get(sha256=upload.sha256)
+        # Registered before preprocessing is enqueued, so the file is in place first
+        transaction.on_commit(lambda: self._store_part(part_path, chat_file, created))
+
+        upload.chat_file = chat_file
+        upload.save()
+
+        data = {"offset": upload.offset, "file": ChatFileSerializer(chat_file).data}
+        if upload.preprocess:
+            options = {**PREPROCESS_DEFAULTS, **upload.preprocess}
+            task = Task.objects.create(status="PENDING")
+            # Enqueue once the ChatFile is committed, for the worker to find it
+            transaction.on_commit(
+                lambda: preprocess_task.delay(
+                    task.ticket,
+                    chat_file.id,
+                    chat_file.file.path,
+                    options["format"],
+                    options["useSentiment"],
+                    options["useEmotes"],
+                    options["emoteSet"],
+                    options["filterEmotes"],
+                    int(options["minWords"]),
+                )
+            )
+            data["ticket"] = str(task.ticket)
+
+        return Response(data, status=status.HTTP_201_CREATED)
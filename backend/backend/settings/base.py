@@ -17,9 +17,38 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 CELERY_BROKER_URL = "redis://redis:6379/0"
 CELERY_RESULT_BACKEND = "redis://redis:6379/0"
+CELERY_BEAT_SCHEDULE = {
+    # Keep stored 7TV emote sets in sync with their remote state
+    "sync-emote-sets": {
+        "task": "api.tasks.sync_all_emote_sets_task",
+        "schedule": 60 * 60,
+    },
+    # Remove chat files left on disk after their ChatFile was deleted, and abandoned uploads
+    "collect-orphaned-media": {
+        "task": "api.tasks.collect_orphaned_media_task",
+        "schedule": 24 * 60 * 60,
+    },
+}
+
+# Shared cache (outbound HTTP responses), on a separate Redis database from Celery
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://redis:6379/1",
+    }
+}
+
+# Store each distinct message text once, in api.models.MessageText, and have
+# messages reference it. Applies to logs preprocessed after it is enabled.
+DEDUPLICATE_MESSAGE_TEXT = False
 
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 102400
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760
+# Django's default handlers, also hashing each file as it is received
+FILE_UPLOAD_HANDLERS = [
+    "api.upload_handlers.Sha256MemoryFileUploadHandler",
+    "api.upload_handlers.Sha256TemporaryFileUploadHandler",
+]
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
 
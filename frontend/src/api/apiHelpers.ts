@@ -7,10 +7,12 @@ export function createMessageFromData(apiData: Message): Message {
   return {
     id: apiData.id,
     parent_log: apiData.parent_log,
+    channel: apiData.channel,
     timestamp: new Date(apiData.timestamp),
     username: apiData.username,
     message: apiData.message,
-    emotes: apiData.emotes,
+    emote_ids: apiData.emote_ids,
+    emote_counts: apiData.emote_counts,
     sentiment_score: apiData.sentiment_score,
   }
 }
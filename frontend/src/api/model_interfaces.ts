@@ -31,11 +31,13 @@ export interface ChatFile extends BaseRow {
 }
 
 export interface Message extends BaseRow {
-  parent_log: ChatFile
+  parent_log: number
+  channel: number | null
   timestamp: Date
   username: string
   message: string
-  emotes: Emote[]
+  emote_ids: number[] | null
+  emote_counts: number[] | null
   sentiment_score?: number
 }
 
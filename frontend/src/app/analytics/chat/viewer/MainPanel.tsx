@@ -3,7 +3,8 @@ import {
   Paper,
   Table,
   Text,
-  Pagination,
+  Button,
+  Group,
   Image,
   Tooltip,
   Stack,
@@ -19,6 +20,10 @@ import { Channel, Emote, Message, MESSAGES_URL } from '@/api'
 
 const PAGE_SIZE = 25
 
+// The cursor query parameter of a page link returned by the API
+const getCursor = (link: string | null): string | null =>
+  link ? new URL(link).searchParams.get('cursor') : null
+
 export default function MainPanel() {
   const today = new Date()
   const yesterday = new Date(today)
@@ -31,11 +36,18 @@ export default function MainPanel() {
   ])
   const [messages, setMessages] = useState<Message[]>([])
   const [emotes, setEmotes] = useState<Emote[]>([])
-  const [page, setPage] = useState(1)
-  const [totalPages, setTotalPages] = useState(1)
+  const [cursor, setCursor] = useState<string | null>(null)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [previousCursor, setPreviousCursor] = useState<string | null>(null)
+  const [count, setCount] = useState(0)
+
+  // Start over from the first page whenever the filters change
+  useEffect(() => {
+    setCursor(null)
+  }, [dateRange, channel])
 
   useEffect(() => {
-    const fetchMessages = async (page: number) => {
+    const fetchMessages = async (cursor: string | null) => {
       if (!dateRange[0] || !dateRange[1] || !channel) {
         return
       }
@@ -46,15 +58,18 @@ export default function MainPanel() {
         channel: channel.id,
         start_date: startDate,
         end_date: endDate,
-        page: page,
         page_size: PAGE_SIZE, // Adjust page size as needed
+        ...(cursor ? { cursor: cursor } : {}),
       })
-      const data = (await response.json()).results
-      setMessages(data.map(createMessageFromData)) // Assuming API returns a `results` field
-      setTotalPages(Math.ceil(data.count / PAGE_SIZE)) // Assuming API returns a `count` field
+      // Pages are linked by cursors, and the count is an estimate
+      const data = await response.json()
+      setMessages(data.results.map(createMessageFromData))
+      setNextCursor(getCursor(data.next))
+      setPreviousCursor(getCursor(data.previous))
+      setCount(data.count)
     }
-    fetchMessages(page)
-  }, [dateRange, channel, page, emotes])
+    fetchMessages(cursor)
+  }, [dateRange, channel, cursor, emotes])
 
   const buildMessage = (message: string, emotes: Emote[]): ReactElement => {
     // Create a mapping of emote names to image URLs
@@ -125,10 +140,23 @@ export default function MainPanel() {
             </Table.Thead>
             <Table.Tbody>{messages.map(buildItem)}</Table.Tbody>
           </Table>
-          <Pagination
-            onChange={(newPage) => setPage(newPage)}
-            total={totalPages}
-          />
+          <Group>
+            <Button
+              variant="default"
+              disabled={!previousCursor}
+              onClick={() => setCursor(previousCursor)}
+            >
+              Previous
+            </Button>
+            <Text size="sm">About {count.toLocaleString()} messages</Text>
+            <Button
+              variant="default"
+              disabled={!nextCursor}
+              onClick={() => setCursor(nextCursor)}
+            >
+              Next
+            </Button>
+          </Group>
         </Stack>
       </Paper>
     </main>